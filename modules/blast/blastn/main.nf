@@ -9,10 +9,10 @@ process BLAST_BLASTN {
     val ready   // Readiness flag
 
     output:
-    path("$params.blast_xml_filename"), emit: blast_output // BLAST XML output
+    path("${params.blast_output_format == 'tabular' ? params.blast_tabular_filename : params.blast_xml_filename}"), emit: blast_output // BLAST XML or tabular output
     path "versions.yml"           , emit: versions         // BLAST version info
 
-    publishDir "${params.outdir}", mode: 'copy', pattern: "$params.blast_xml_filename" // Publish BLAST XML to output directory
+    publishDir "${params.outdir}", mode: 'copy', pattern: "${params.blast_output_format == 'tabular' ? params.blast_tabular_filename : params.blast_xml_filename}" // Publish BLAST output to output directory
     
     when:
     task.ext.when == null || task.ext.when 
@@ -20,6 +20,10 @@ process BLAST_BLASTN {
     script:
     def is_compressed = fasta.getExtension() == "gz" ? true : false
     def fasta_name = is_compressed ? fasta.getBaseName() : fasta
+    // Tabular fields must match TABULAR_FIELDS in scripts/src/blast/parse_tabular.py
+    def is_tabular = params.blast_output_format == 'tabular'
+    def outfmt = is_tabular ? "'7 qseqid qlen sseqid sacc stitle slen length nident gaps qstart qend sstart send evalue bitscore qseq sseq'" : 5
+    def blast_output_filename = is_tabular ? params.blast_tabular_filename : params.blast_xml_filename
 
     """
     # Decompress input FASTA if it is gzipped
@@ -32,8 +36,8 @@ process BLAST_BLASTN {
         -num_threads ${task.cpus} \\
         -db ${file(params.blastdb)} \\
         -query ${fasta_name} \\
-        -outfmt 5 \\
-        -out $params.blast_xml_filename \\
+        -outfmt ${outfmt} \\
+        -out ${blast_output_filename} \\
         -task megablast \\
         -max_target_seqs 500 \\
         -evalue 0.05 \\
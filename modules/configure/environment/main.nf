@@ -22,6 +22,7 @@ process CONFIGURE_ENVIRONMENT {
     if [ ${params.candidates_phylogeny_fasta_filename} != null ]; then echo 'export PHYLOGENY_FASTA_FILENAME=${params.candidates_phylogeny_fasta_filename}' >> env_vars.sh; fi
     if [ ${params.candidates_json_filename} != null ]; then echo 'export CANDIDATES_JSON_FILENAME=${params.candidates_json_filename}' >> env_vars.sh; fi
     if [ ${params.candidates_sources_json_filename} != null ]; then echo 'export CANDIDATES_SOURCES_JSON_FILENAME=${params.candidates_sources_json_filename}' >> env_vars.sh; fi
+    if [ ${params.cache_dir} != null ]; then echo 'export CACHE_DIR=${params.cache_dir}' >> env_vars.sh; fi
     if [ ${params.db_coverage_toi_limit} != null ]; then echo 'export DB_COVERAGE_TOI_LIMIT=${params.db_coverage_toi_limit}' >> env_vars.sh; fi
     if [ ${params.db_cov_country_missing_a} != null ]; then echo 'export DB_COV_COUNTRY_MISSING_A=${params.db_cov_country_missing_a}' >> env_vars.sh; fi
     if [ ${params.db_cov_min_a} != null ]; then echo 'export DB_COV_MIN_A=${params.db_cov_min_a}' >> env_vars.sh; fi
@@ -30,8 +31,14 @@ process CONFIGURE_ENVIRONMENT {
     if [ ${params.db_cov_related_min_b} != null ]; then echo 'export DB_COV_RELATED_MIN_B=${params.db_cov_related_min_b}' >> env_vars.sh; fi
     if [ "${params.facility_name}" != null ]; then echo 'export FACILITY_NAME="${params.facility_name}"' >> env_vars.sh; fi
     if [ ${params.gbif_accepted_status} != null ]; then echo 'export GBIF_ACCEPTED_STATUS=${params.gbif_accepted_status}' >> env_vars.sh; fi
+    if [ ${params.gbif_cache_max_size_mb} != null ]; then echo 'export GBIF_CACHE_MAX_SIZE_MB=${params.gbif_cache_max_size_mb}' >> env_vars.sh; fi
+    if [ ${params.gbif_cache_ttl_days} != null ]; then echo 'export GBIF_CACHE_TTL_DAYS=${params.gbif_cache_ttl_days}' >> env_vars.sh; fi
     if [ ${params.gbif_limit_records} != null ]; then echo 'export GBIF_LIMIT_RECORDS=${params.gbif_limit_records}' >> env_vars.sh; fi
     if [ ${params.gbif_max_occurrence_records} != null ]; then echo 'export GBIF_MAX_OCCURRENCE_RECORDS=${params.gbif_max_occurrence_records}' >> env_vars.sh; fi
+    if [ ${params.gbif_occurrence_density_maps} != null ]; then echo 'export GBIF_OCCURRENCE_DENSITY_MAPS=${params.gbif_occurrence_density_maps}' >> env_vars.sh; fi
+    if [ ${params.genbank_count_cache_ttl_days} != null ]; then echo 'export GENBANK_COUNT_CACHE_TTL_DAYS=${params.genbank_count_cache_ttl_days}' >> env_vars.sh; fi
+    if [ ${params.genbank_sources_cache_max_size_mb} != null ]; then echo 'export GENBANK_SOURCES_CACHE_MAX_SIZE_MB=${params.genbank_sources_cache_max_size_mb}' >> env_vars.sh; fi
+    if [ ${params.genbank_sources_cache_ttl_days} != null ]; then echo 'export GENBANK_SOURCES_CACHE_TTL_DAYS=${params.genbank_sources_cache_ttl_days}' >> env_vars.sh; fi
     if [ ${params.hits_fasta_filename} != null ]; then echo 'export HITS_FASTA_FILENAME=${params.hits_fasta_filename}' >> env_vars.sh; fi
     if [ ${params.hits_json_filename} != null ]; then echo 'export HITS_JSON_FILENAME=${params.hits_json_filename}' >> env_vars.sh; fi
     if [ ${params.independent_sources_json_filename} != null ]; then echo 'export INDEPENDENT_SOURCES_JSON_FILENAME=${params.independent_sources_json_filename}' >> env_vars.sh; fi
@@ -6,7 +6,7 @@ process EXTRACT_HITS {
 
     input:
     path(env_var_file) // Environment variables file
-    path(blast_xml)    // BLAST XML results file
+    path(blast_output) // BLAST XML or tabular results file
 
     output:
     path(params.accessions_filename), emit: accessions // Output: accessions file
@@ -17,10 +17,11 @@ process EXTRACT_HITS {
         pattern:    "query_*/$params.hits_fasta_filename" // Publish hit FASTA files to output directory
     
     script:
+    def tabular_flag = params.blast_output_format == 'tabular' ? '--tabular' : ''
     """
     # Source environment variables
     source ${env_var_file}
     # Run the BLAST hit parsing Python script
-    python /app/scripts/p1_parse_blast.py ${blast_xml} --output_dir ./
+    python /app/scripts/p1_parse_blast.py ${blast_output} ${tabular_flag} --workers ${task.cpus} --output_dir ./
     """
 }
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Benchmark batched hit statistics against the per-hit functions.
+
+If no BLAST XML file is given, a 2000-hit record is assembled from the
+alignments in the integration test BLAST results.
+
+OUTCOME - on the 2000-hit record, calculate_hit_stats is ~2.3x faster than
+the per-hit functions (~19 ms -> ~8 ms), with identical output.
+
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from Bio.Blast import NCBIXML
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR / 'scripts'))
+
+from src.blast.hit_stats import calculate_hit_stats  # noqa: E402
+from src.blast.parse_xml import (  # noqa: E402
+    calculate_alignment_length,
+    calculate_hit_bitscore,
+    calculate_hit_e_value,
+    calculate_hit_identity,
+    calculate_hit_query_coverage,
+)
+
+INTEGRATION_DIR = ROOT_DIR / 'scripts/tests/test-data/integration/blast'
+N_HITS = 2000
+REPEATS = 20
+
+
+def main():
+    args = _parse_args()
+    if args.blast_xml:
+        with open(args.blast_xml) as f:
+            records = list(NCBIXML.parse(f))
+    else:
+        records = [_build_record(N_HITS)]
+    n_hits = sum(len(r.alignments) for r in records)
+    print(f"Benchmarking {len(records)} queries with {n_hits} hits...")
+
+    for record in records:
+        assert repr(per_hit_stats(record)) == repr(batched_stats(record)), (
+            f"Batched hit stats differ for query {record.query}")
+    print("Results are identical.")
+
+    for func in (per_hit_stats, batched_stats):
+        seconds = min(timeit.repeat(
+            lambda: [func(record) for record in records],
+            number=1,
+            repeat=REPEATS,
+        ))
+        print(f"{func.__name__}: {seconds * 1000:.1f} ms")
+
+
+def per_hit_stats(record):
+    stats = []
+    for alignment in record.alignments:
+        alignment_length = calculate_alignment_length(alignment.hsps)
+        stats.append({
+            "bitscore": calculate_hit_bitscore(alignment.hsps),
+            "e_value": calculate_hit_e_value(
+                alignment, record.effective_search_space),
+            "identity": calculate_hit_identity(alignment.hsps),
+            "alignment_length": alignment_length,
+            "query_coverage": calculate_hit_query_coverage(
+                alignment_length, record.query_length),
+        })
+    return stats
+
+
+def batched_stats(record):
+    return calculate_hit_stats(
+        record.alignments,
+        record.query_length,
+        record.effective_search_space,
+    )
+
+
+def _build_record(n_hits):
+    """Pool alignments from integration test results into one record."""
+    record = None
+    alignments = []
+    for path in sorted(INTEGRATION_DIR.glob('*/blast_result.xml')):
+        with open(path) as f:
+            for blast_record in NCBIXML.parse(f):
+                record = record or blast_record
+                alignments += blast_record.alignments
+        if len(alignments) >= n_hits:
+            break
+    record.alignments = alignments[:n_hits]
+    record.query_length = max(
+        max(hsp.query_end for hsp in alignment.hsps)
+        for alignment in record.alignments
+    )
+    return record
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'blast_xml',
+        nargs='?',
+        type=Path,
+        help='Path to a BLAST XML file to benchmark.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark occurrence map rendering with and without the cached basemap.
+
+Renders maps from random occurrences, first drawing the world basemap for
+each map (as before the basemap was cached) and then reusing the basemap
+figure for the process.
+
+OUTCOME - for 10 maps, reusing the basemap takes ~0.7 s per map against
+~1.0 s when the basemap is drawn for each map (~30% faster), with
+pixel-identical output. Most of the remaining time is PNG encoding at 300 dpi.
+
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageChops
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR / 'scripts'))
+
+from src.gbif import maps  # noqa: E402
+from matplotlib import pyplot as plt  # noqa: E402
+
+N_MAPS = 10
+N_OCCURRENCES = 5000
+SEED = 1
+
+
+def main():
+    args = _parse_args()
+    rng = np.random.default_rng(SEED)
+    occurrences = [
+        _random_occurrences(rng, args.occurrences)
+        for _ in range(args.maps - 1)
+    ]
+    occurrences.append(([], [], []))  # Also check the "no records" map
+    print(f"Rendering {len(occurrences)} maps...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        results = {}
+        for func in (uncached_render, cached_render):
+            out_dir = tmp / func.__name__
+            out_dir.mkdir()
+            start = time.perf_counter()
+            for i, (lats, lons, counts) in enumerate(occurrences):
+                func(lats, lons, out_dir / f"{i}.png", counts)
+            seconds = time.perf_counter() - start
+            results[func.__name__] = out_dir
+            print(
+                f"{func.__name__}: {seconds:.2f} s"
+                f" ({seconds / len(occurrences):.2f} s per map)")
+
+        for i in range(len(occurrences)):
+            with (
+                Image.open(results['uncached_render'] / f"{i}.png") as a,
+                Image.open(results['cached_render'] / f"{i}.png") as b,
+            ):
+                assert a.size == b.size and not ImageChops.difference(
+                    a.convert('RGBA'), b.convert('RGBA')).getbbox(), (
+                    f"Map {i} differs with the cached basemap")
+        print("Maps are identical.")
+
+
+def uncached_render(lats, lons, path, counts):
+    """Render with a fresh world basemap, as before it was cached."""
+    maps._load_world.cache_clear()
+    maps._get_basemap.cache_clear()
+    plt.close('all')
+    maps.render_occurrence_map(lats, lons, path, counts=counts)
+
+
+def cached_render(lats, lons, path, counts):
+    maps.render_occurrence_map(lats, lons, path, counts=counts)
+
+
+def _random_occurrences(rng, n):
+    """Clustered occurrences, as with records from a few regions."""
+    centres = rng.uniform([-60, -170], [70, 170], size=(5, 2))
+    points = centres[rng.integers(len(centres), size=n)]
+    points += rng.normal(scale=5, size=(n, 2))
+    lats = np.clip(points[:, 0], -89, 89).tolist()
+    lons = np.clip(points[:, 1], -179, 179).tolist()
+    counts = rng.integers(1, 50, size=n).tolist()
+    return lats, lons, counts
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--maps',
+        type=int,
+        default=N_MAPS,
+        help='Number of maps to render.')
+    parser.add_argument(
+        '--occurrences',
+        type=int,
+        default=N_OCCURRENCES,
+        help='Number of occurrence points per map.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
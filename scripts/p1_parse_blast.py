@@ -3,34 +3,62 @@
 import argparse
 import json
 import logging
+import math
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from Bio import SeqIO
 from pathlib import Path
 
-from src.blast.parse_xml import parse_blast_xml
+from src.blast.parse_tabular import iter_blast_tabular
+from src.blast.parse_xml import index_blast_xml, iter_blast_xml
 from src.utils import existing_path
 from src.utils.config import Config
 
 logger = logging.getLogger(__name__)
 config = Config()
 
+# Split queries into more chunks than workers to balance uneven hit counts
+CHUNKS_PER_WORKER = 4
+
 
 def main():
     args = _parse_args()
     config.configure(args.output_dir)
-    hits, fastas = parse_blast_xml(args.blast_xml_path)
-    _write_hits(hits)
-    _write_fastas(fastas)
-    _write_accessions(hits)
+    if args.tabular or args.workers < 2:
+        parse = iter_blast_tabular if args.tabular else iter_blast_xml
+        records = chain.from_iterable(
+            parse(path) for path in args.blast_xml_path)
+        accessions = _write_records(records)
+    else:
+        accessions = _parse_parallel(args.blast_xml_path, args.workers)
+    _write_accessions(accessions)
 
 
 def _parse_args():
     parser = argparse.ArgumentParser(
-        description="Parse BLAST XML output file."
+        description="Parse BLAST XML (or tabular) output file."
     )
     parser.add_argument(
         "blast_xml_path",
         type=existing_path,
-        help="Path to the BLAST XML file to parse.",
+        nargs="+",
+        help="Path to the BLAST XML file to parse. Multiple files (e.g. from"
+             " chunked BLAST runs) are numbered consecutively in the order"
+             " given.",
+    )
+    parser.add_argument(
+        "--tabular",
+        action="store_true",
+        help="Parse BLAST tabular output (outfmt 7) instead of XML. BLAST must"
+             " be run with -outfmt given by"
+             " src.blast.parse_tabular.TABULAR_OUTFMT.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes for parsing BLAST XML in parallel."
+             " Default: 1.",
     )
     parser.add_argument(
         "--output_dir",
@@ -42,41 +70,108 @@ def _parse_args():
     return parser.parse_args()
 
 
-def _write_hits(hits):
+def _parse_parallel(blast_xml_paths, workers):
+    """Parse chunks of queries from BLAST XML files in a process pool.
+
+    Each chunk writes its own query outputs, and query indices are assigned
+    from each chunk's position in the input files, so numbering is the same
+    as a serial run.
+    """
+    chunks = _split_queries(blast_xml_paths, workers)
+    logger.info(
+        f"Parsing {len(blast_xml_paths)} BLAST XML file(s) in"
+        f" {len(chunks)} chunks with {workers} workers")
+    accessions = set()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=config.configure,
+    ) as executor:
+        for chunk_accessions in executor.map(_parse_chunk, chunks):
+            accessions.update(chunk_accessions)
+    return accessions
+
+
+def _split_queries(blast_xml_paths, workers):
+    """Split queries into chunks of (path, byte_range, first_query_ix)."""
+    indexes = [index_blast_xml(path) for path in blast_xml_paths]
+    n_queries = sum(len(offsets) for offsets, _ in indexes)
+    chunk_size = max(
+        1, math.ceil(n_queries / (workers * CHUNKS_PER_WORKER)))
+    chunks = []
+    first_query_ix = 0
+    for path, (offsets, end) in zip(blast_xml_paths, indexes):
+        for i in range(0, len(offsets), chunk_size):
+            chunk_offsets = offsets[i:i + chunk_size + 1]
+            chunk_end = (
+                chunk_offsets[-1] if len(chunk_offsets) > chunk_size
+                else end
+            )
+            chunks.append((
+                path,
+                (chunk_offsets[0], chunk_end),
+                first_query_ix + i,
+            ))
+        first_query_ix += len(offsets)
+    return chunks
+
+
+def _parse_chunk(chunk):
+    path, byte_range, first_query_ix = chunk
+    records = iter_blast_xml(path, byte_range, first_query_ix)
+    return _write_records(records, first_query_ix)
+
+
+def _write_records(records, first_query_ix=0):
+    """Write outputs for each query and return the set of hit accessions."""
+    # Each stage writes one query at a time and passes it down the stream, so
+    # only a single query's hits are held in memory at once
+    records = _write_hits(records, first_query_ix)
+    records = _write_fastas(records, first_query_ix)
+    return _collect_accessions(records)
+
+
+def _write_hits(records, first_query_ix=0):
     """Write a JSON file of BLAST hits for each query sequence."""
-    for i, query_hits in enumerate(hits):
+    for i, (query_hits, fastas) in enumerate(records, start=first_query_ix):
         query_dir = config.create_query_dir(i, query_hits['query_title'])
         path = query_dir / config.HITS_JSON
         with path.open("w") as f:
             json.dump(query_hits, f, indent=2)
             logger.info(f"BLAST hits for query [{i}] written to {path}")
+        yield query_hits, fastas
 
 
-def _write_fastas(query_fastas):
+def _write_fastas(records, first_query_ix=0):
     """Write a fasta file of hit subjects for each query sequence."""
-    for i, fastas in enumerate(query_fastas):
-        if not fastas:
-            continue
-        path = config.get_query_dir(i) / config.HITS_FASTA
-        with open(path, "w") as f:
-            SeqIO.write(fastas, f, "fasta")
-            logger.info(
-                f"BLAST hit sequences for query [{i}] written to {path}")
-
-
-def _write_accessions(hits):
+    for i, (query_hits, fastas) in enumerate(records, start=first_query_ix):
+        if fastas:
+            path = config.get_query_dir(i) / config.HITS_FASTA
+            with open(path, "w") as f:
+                SeqIO.write(fastas, f, "fasta")
+                logger.info(
+                    f"BLAST hit sequences for query [{i}] written to {path}")
+        yield query_hits, fastas
+
+
+def _collect_accessions(records):
+    """Collect the unique hit accession IDs of all queries."""
+    all_accessions = set()
+    for query_hits, _ in records:
+        all_accessions.update(
+            hit["accession"]
+            for hit in query_hits["hits"]
+        )
+    return all_accessions
+
+
+def _write_accessions(all_accessions):
     """Write a unique list of BLAST hit accession IDs to a file.
 
     These will be used for extracting taxonomy data.
     """
     hit_accesssions_path = config.output_dir / config.ACCESSIONS_FILENAME
-    all_accessions = list({
-        hit["accession"]
-        for query in hits
-        for hit in query["hits"]
-    })
     with open(hit_accesssions_path, "w") as f:
-        f.write('\n'.join(all_accessions) + '\n')
+        f.write('\n'.join(sorted(all_accessions)) + '\n')
         logger.info(
             f"BLAST hit accession IDs written to {hit_accesssions_path}")
 
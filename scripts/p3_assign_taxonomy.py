@@ -95,7 +95,6 @@ def _parse_args():
 
 
 def _filter_hits(hits):
-    taxonomies = config.read_taxonomy_file()
     filtered_hits = [
         hit for hit in hits
         if (
@@ -104,6 +103,8 @@ def _filter_hits(hits):
             >= config.CRITERIA.ALIGNMENT_MIN_Q_COVERAGE
         )
     ]
+    taxonomies = config.read_taxonomy_file(
+        [hit["accession"] for hit in filtered_hits])
     for hit in filtered_hits:
         tax = taxonomies.get(hit["accession"])
         if tax:
@@ -0,0 +1,174 @@
+"""Calculate BLAST hit statistics for all hits of a query at once.
+
+This is a batched equivalent of the per-hit calculate_* functions in
+parse_xml.py. HSP coordinates and scores for all hits of a query are loaded
+into flat NumPy arrays, with each hit's HSPs in a contiguous segment, and the
+statistics are computed with segment-wise operations instead of per-hit
+Python loops.
+
+Results are identical to the per-hit functions, including floating point
+summation order, rounding and the types of the returned values.
+"""
+
+import numpy as np
+
+ROUND_DIGITS = 3
+
+
+def calculate_hit_stats(
+    alignments: list,
+    query_length: int,
+    effective_search_space: float,
+) -> list[dict]:
+    """Calculate statistics for each alignment (hit) of a BLAST record.
+
+    Returns a dict for each alignment with keys bitscore, e_value, identity,
+    alignment_length and query_coverage.
+    """
+    if not alignments:
+        return []
+    hsp_counts = np.fromiter(
+        (len(alignment.hsps) for alignment in alignments),
+        dtype=np.int64,
+        count=len(alignments),
+    )
+    hsps = [hsp for alignment in alignments for hsp in alignment.hsps]
+    hit_ix = np.repeat(np.arange(len(alignments)), hsp_counts)
+    offsets = np.concatenate(([0], np.cumsum(hsp_counts)[:-1]))
+
+    bits = _hsp_array(hsps, 'bits', float)
+    bitscores = _sequential_segment_sum(bits, offsets, hsp_counts)
+    e_values = _calculate_e_values(
+        hsps, bitscores, offsets, hsp_counts, effective_search_space)
+
+    identities = np.add.reduceat(
+        _hsp_array(hsps, 'identities', np.int64), offsets)
+    align_lengths = np.add.reduceat(
+        _hsp_array(hsps, 'align_length', np.int64), offsets)
+    identity = _round(identities / np.maximum(align_lengths, 1))
+
+    query_starts = _hsp_array(hsps, 'query_start', np.int64)
+    query_ends = _hsp_array(hsps, 'query_end', np.int64)
+    alignment_lengths = _calculate_alignment_lengths(
+        np.minimum(query_starts, query_ends),
+        np.maximum(query_starts, query_ends),
+        hit_ix,
+        offsets,
+    )
+    if query_length > 0:
+        query_coverage = _round(alignment_lengths / query_length)
+    else:
+        query_coverage = np.zeros(len(alignments))
+
+    return [
+        {
+            "bitscore": float(bitscores[i]),
+            "e_value": float(e_values[i]),
+            "identity": (
+                _min_one(identity[i]) if align_lengths[i] > 0 else 0
+            ),
+            "alignment_length": int(alignment_lengths[i]),
+            "query_coverage": (
+                _min_one(query_coverage[i]) if query_length > 0 else 0
+            ),
+        }
+        for i in range(len(alignments))
+    ]
+
+
+def _min_one(value):
+    """Equivalent to min(value, 1), which returns int 1 when value > 1."""
+    return 1 if value > 1 else float(value)
+
+
+def _hsp_array(hsps, attr, dtype) -> np.ndarray:
+    return np.fromiter(
+        (getattr(hsp, attr) for hsp in hsps),
+        dtype=dtype,
+        count=len(hsps),
+    )
+
+
+def _sequential_segment_sum(values, offsets, counts) -> np.ndarray:
+    """Sum values for each hit in HSP order, as Python's sum() does.
+
+    np.add.reduceat uses plain (and sometimes pairwise) summation, which does
+    not match Python >= 3.12's sum() of floats. Instead, the nth HSP of every
+    hit is added in the nth vectorized step, with the same Neumaier
+    compensation as sum().
+    """
+    totals = np.zeros(len(offsets))
+    compensation = np.zeros(len(offsets))
+    for n in range(int(counts.max())):
+        hits = np.flatnonzero(counts > n)
+        total = totals[hits]
+        x = values[offsets[hits] + n]
+        t = total + x
+        compensation[hits] += np.where(
+            np.abs(total) >= np.abs(x),
+            (total - t) + x,
+            (x - t) + total,
+        )
+        totals[hits] = t
+    correct = (compensation != 0) & np.isfinite(compensation)
+    totals[correct] += compensation[correct]
+    return totals
+
+
+def _calculate_e_values(
+    hsps,
+    bitscores,
+    offsets,
+    counts,
+    effective_search_space,
+) -> np.ndarray:
+    """Single-HSP hits take the HSP e-value, while multi-HSP hits are combined
+    from the summed bitscore.
+    """
+    e_values = _hsp_array(hsps, 'expect', float)[offsets]
+    multi_ix = np.flatnonzero(counts > 1)
+    if len(multi_ix):
+        # Python's float power is used as NumPy's may differ in the last bit
+        e_values[multi_ix] = [
+            effective_search_space * 2 ** (-bitscore)
+            for bitscore in bitscores[multi_ix].tolist()
+        ]
+    return e_values
+
+
+def _calculate_alignment_lengths(starts, ends, hit_ix, offsets):
+    """Calculate the length of merged query regions covered by each hit.
+
+    HSPs are sorted by start within each hit. Each HSP then adds the part of
+    its region that extends past the furthest end of the preceding HSPs.
+    """
+    order = np.lexsort((starts, hit_ix))
+    starts = starts[order]
+    ends = ends[order]
+    # Offset each hit's coordinates so that a running maximum does not carry
+    # over from one hit to the next
+    span = int(ends.max()) + 1
+    offset_ends = hit_ix * span + ends
+    prev_end = np.empty_like(offset_ends)
+    prev_end[0] = 0
+    prev_end[1:] = np.maximum.accumulate(offset_ends)[:-1]
+    prev_end = prev_end - hit_ix * span
+    prev_end[offsets] = 0
+    covered = np.maximum(ends - np.maximum(starts - 1, prev_end), 0)
+    return np.add.reduceat(covered, offsets)
+
+
+def _round(values: np.ndarray, ndigits: int = ROUND_DIGITS) -> np.ndarray:
+    """Round values in the same way as Python's round(x, ndigits).
+
+    NumPy rounds by scaling, which can differ from Python's correctly rounded
+    result when the scaled value is close to a tie. Those values are rounded
+    with Python's round() instead.
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), ndigits)
+    return rounded
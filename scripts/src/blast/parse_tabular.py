@@ -0,0 +1,186 @@
+"""Parse BLAST tabular output to JSON format and extract FASTA sequences.
+
+This is an alternative to parsing BLAST XML output, which is slow to parse
+and verbose when many target sequences are reported for each query. BLASTN
+must be run with the custom output format given by TABULAR_OUTFMT:
+
+    blastn ... -outfmt "7 qseqid qlen sseqid sacc stitle ..."
+
+Tabular rows are converted into the same record structure that NCBIXML
+produces, so that hits.json/hits.fasta are written with an identical contract
+to the XML parser. The comment lines of outfmt 7 are required to recover the
+full query title and to detect queries with no hits. Outfmt 6 (no comments)
+can be parsed, but queries with no hits will be missing from the results.
+Tabular output does not report the length of queries with no hits, so these
+are given a query_length of 0.
+
+Note that BLAST writes e-values and bitscores to tabular output with reduced
+precision, and does not report the effective search space. The search space
+is therefore estimated from HSP scores for the purpose of calculating the
+combined e-value of multi-HSP hits.
+"""
+
+import logging
+from typing import Iterator
+
+from Bio.Blast import NCBIXML
+from Bio.SeqRecord import SeqRecord
+
+from .parse_xml import parse_blast_record
+
+logger = logging.getLogger(__name__)
+
+TABULAR_FIELDS = [
+    "qseqid",
+    "qlen",
+    "sseqid",
+    "sacc",
+    "stitle",
+    "slen",
+    "length",
+    "nident",
+    "gaps",
+    "qstart",
+    "qend",
+    "sstart",
+    "send",
+    "evalue",
+    "bitscore",
+    "qseq",
+    "sseq",
+]
+TABULAR_OUTFMT = "7 " + " ".join(TABULAR_FIELDS)
+QUERY_COMMENT_PREFIX = "# Query:"
+
+
+def parse_blast_tabular(blast_tsv_path: str) -> tuple[
+    list[dict],
+    list[list[SeqRecord]],
+]:
+    """Parse BLAST tabular output file and extract alignment information."""
+    results = []
+    fasta_results = []
+    for query_record, fastas in iter_blast_tabular(blast_tsv_path):
+        results.append(query_record)
+        fasta_results.append(fastas)
+    return results, fasta_results
+
+
+def iter_blast_tabular(blast_tsv_path: str) -> Iterator[
+    tuple[dict, list[SeqRecord]]
+]:
+    """Yield a (query_record, fastas) tuple for each query in BLAST tabular
+    output. Only one query is held in memory at a time.
+    """
+    for i, blast_record in enumerate(_read_blast_records(blast_tsv_path)):
+        yield parse_blast_record(i, blast_record)
+
+
+def _read_blast_records(blast_tsv_path: str) -> Iterator[NCBIXML.Blast]:
+    """Read tabular rows into NCBIXML-like records, one per query."""
+    record = None
+    with open(blast_tsv_path, "r") as handle:
+        for line in handle:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if line.startswith(QUERY_COMMENT_PREFIX):
+                if record:
+                    yield _finalize_record(record)
+                record = _new_record(line[len(QUERY_COMMENT_PREFIX):].strip())
+                continue
+            if line.startswith("#"):
+                continue
+            row = dict(zip(TABULAR_FIELDS, line.split("\t")))
+            if len(row) != len(TABULAR_FIELDS):
+                raise ValueError(
+                    f"Unexpected number of fields in BLAST tabular output"
+                    f" (expected {len(TABULAR_FIELDS)}, got {len(row)})."
+                    f" BLAST must be run with -outfmt '{TABULAR_OUTFMT}'."
+                    f"\nLine: {line[:200]}")
+            if record is None or (
+                record.query_id is not None
+                and record.query_id != row["qseqid"]
+            ):
+                # Outfmt 6 - there are no comment lines to delimit queries
+                if record:
+                    yield _finalize_record(record)
+                record = _new_record(row["qseqid"])
+            _add_row(record, row)
+    if record:
+        yield _finalize_record(record)
+
+
+def _new_record(query_title: str) -> NCBIXML.Blast:
+    record = NCBIXML.Blast()
+    record.query = query_title
+    record.query_id = None
+    record.alignments = []
+    return record
+
+
+def _add_row(record: NCBIXML.Blast, row: dict[str, str]):
+    """Add a tabular row to the record as an HSP of the matching alignment."""
+    record.query_id = row["qseqid"]
+    record.query_length = int(row["qlen"])
+    if (
+        not record.alignments
+        or record.alignments[-1].hit_id != row["sseqid"]
+    ):
+        alignment = NCBIXML.Alignment()
+        alignment.hit_id = row["sseqid"]
+        alignment.hit_def = row["stitle"]
+        alignment.accession = row["sacc"]
+        alignment.length = int(row["slen"])
+        record.alignments.append(alignment)
+    record.alignments[-1].hsps.append(_row_to_hsp(row))
+
+
+def _row_to_hsp(row: dict[str, str]) -> NCBIXML.HSP:
+    hsp = NCBIXML.HSP()
+    hsp.bits = float(row["bitscore"])
+    hsp.expect = float(row["evalue"])
+    hsp.identities = int(row["nident"])
+    hsp.gaps = int(row["gaps"])
+    hsp.align_length = int(row["length"])
+    hsp.query_start = int(row["qstart"])
+    hsp.query_end = int(row["qend"])
+    hsp.sbjct_start = int(row["sstart"])
+    hsp.sbjct_end = int(row["send"])
+    hsp.strand = (
+        "Plus" if hsp.query_start <= hsp.query_end else "Minus",
+        "Plus" if hsp.sbjct_start <= hsp.sbjct_end else "Minus",
+    )
+    hsp.query = row["qseq"]
+    hsp.sbjct = row["sseq"]
+    return hsp
+
+
+def _finalize_record(record: NCBIXML.Blast) -> NCBIXML.Blast:
+    """Set the remaining record attributes once all rows have been read."""
+    if record.query_length is None:
+        # As with XML output, query_length must be an integer in hits.json
+        logger.debug(
+            f"No BLAST hits in tabular output for query [{record.query}] -"
+            " query length cannot be determined. Setting query_length=0.")
+        record.query_length = 0
+    record.effective_search_space = _estimate_search_space(record)
+    return record
+
+
+def _estimate_search_space(record: NCBIXML.Blast) -> float:
+    """Estimate effective search space from HSP scores (E = S' * 2^-bits).
+
+    The HSP with the highest e-value is used, because tabular e-values are
+    rounded and very small e-values are reported as zero.
+    """
+    hsps = [
+        hsp
+        for alignment in record.alignments
+        for hsp in alignment.hsps
+        if hsp.expect > 0
+    ]
+    if not hsps:
+        return 0
+    hsp = max(hsps, key=lambda x: x.expect)
+    return hsp.expect * 2 ** hsp.bits
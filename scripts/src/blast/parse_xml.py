@@ -1,13 +1,21 @@
 """Parse BLAST XML output to JSON format and extract FASTA sequences."""
 
+import io
 import logging
+from typing import Iterator
 
 from Bio.Blast import NCBIXML
 from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
 
+from .hit_stats import calculate_hit_stats
+
 logger = logging.getLogger(__name__)
 
+ITERATION_TAG = b"<Iteration>"
+ITERATIONS_END_TAG = b"</BlastOutput_iterations>"
+XML_FOOTER = b"</BlastOutput_iterations>\n</BlastOutput>\n"
+
 
 def calculate_hit_bitscore(hsps):
     """Calculate the total scores of all hsps for a hit."""
@@ -70,31 +78,29 @@ def calculate_alignment_length(hsps: list[NCBIXML.HSP]) -> int:
     )
 
 
-def _get_printed_alignment(hsp, length=80):
-    """Wrap query, subject and midline strings into a printable alignment."""
-    def string_chunk(sequence, chunk_size=10):
-        return " ".join(
-            sequence[i:i + chunk_size]
-            for i in range(0, len(sequence), chunk_size)
-        )
-
-    alignment_str = ""
-    for i in range(0, len(hsp.query), length):
-        digits = max(
-            len(str(hsp.query_start + i)),
-            len(str(hsp.sbjct_start + i)),
-        )
-        pad = digits + 8
-        query = string_chunk(hsp.query[i:i + length])
-        subject = string_chunk(hsp.sbjct[i:i + length])
-        midline = string_chunk(hsp.match[i:i + length])
-        alignment_str += (
-            f"Query  {str(hsp.query_start + i).rjust(digits)} {query}\n")
-        alignment_str += f"{' ' * pad}{midline}\n"
-        alignment_str += (
-            f"Sbjct  {str(hsp.sbjct_start + i).zfill(digits)} {subject}\n\n")
+def calculate_btop(query: str, sbjct: str) -> str:
+    """Encode aligned sequences as BLAST traceback operations (BTOP).
 
-    return alignment_str
+    Runs of identical positions are written as a count, and each mismatch or
+    gap is written as the query residue followed by the subject residue, e.g.
+    "12AG5-T3" for 12 matches, an A/G mismatch, 5 matches, a gap in the query
+    and 3 matches.
+    """
+    if query == sbjct:
+        return str(len(query))
+    btop = []
+    run = 0
+    for q, s in zip(query, sbjct):
+        if q == s:
+            run += 1
+            continue
+        if run:
+            btop.append(str(run))
+            run = 0
+        btop.append(q + s)
+    if run:
+        btop.append(str(run))
+    return "".join(btop)
 
 
 def parse_hit_def(hit_def: str) -> str:
@@ -106,90 +112,158 @@ def parse_blast_xml(blast_xml_path: str) -> tuple[
     list[dict],
     list[list[SeqRecord]],
 ]:
-    """Parse BLAST XML output file and extract information about alignments."""
-    with open(blast_xml_path, "r") as handle:
-        blast_records = NCBIXML.parse(handle)
-        results = []
-        fasta_results = []
-
-        for i, blast_record in enumerate(blast_records):
-            fastas = []
-            query_record = {
-                "query_title": blast_record.query,
-                "query_length": blast_record.query_length,
-                "hits": []
+    """Parse BLAST XML output file and extract information about alignments.
+
+    This collects results for all queries in memory - use iter_blast_xml() to
+    process queries one at a time.
+    """
+    results = []
+    fasta_results = []
+    for query_record, fastas in iter_blast_xml(blast_xml_path):
+        results.append(query_record)
+        fasta_results.append(fastas)
+    return results, fasta_results
+
+
+def iter_blast_xml(
+    blast_xml_path: str,
+    byte_range: tuple[int, int] = None,
+    first_query_ix: int = 0,
+) -> Iterator[
+    tuple[dict, list[SeqRecord]]
+]:
+    """Yield a (query_record, fastas) tuple for each query in BLAST XML output.
+
+    Records are parsed lazily, so only one query is held in memory at a time.
+    If byte_range is given, only the <Iteration> elements in that range of the
+    file are parsed (see index_blast_xml), and queries are numbered from
+    first_query_ix.
+    """
+    if byte_range:
+        handle = _read_blast_xml_chunk(blast_xml_path, *byte_range)
+    else:
+        handle = open(blast_xml_path, "r")
+    with handle:
+        for i, blast_record in enumerate(
+            NCBIXML.parse(handle),
+            start=first_query_ix,
+        ):
+            yield parse_blast_record(i, blast_record)
+
+
+def index_blast_xml(blast_xml_path: str) -> tuple[list[int], int]:
+    """Find the byte offset of each query (<Iteration> element) in BLAST XML.
+
+    Returns the offsets and the byte offset at which the iterations end, so
+    that the file can be split into chunks of queries that are parsed
+    independently.
+    """
+    offsets = []
+    end = None
+    position = 0
+    with open(blast_xml_path, "rb") as f:
+        for line in f:
+            stripped = line.lstrip()
+            if stripped.startswith(ITERATION_TAG):
+                offsets.append(position + len(line) - len(stripped))
+            elif stripped.startswith(ITERATIONS_END_TAG):
+                end = position + len(line) - len(stripped)
+            position += len(line)
+    return offsets, position if end is None else end
+
+
+def _read_blast_xml_chunk(blast_xml_path: str, start: int, end: int):
+    """Read a range of <Iteration> elements as a standalone BLAST XML file."""
+    header = []
+    with open(blast_xml_path, "rb") as f:
+        for line in f:
+            if line.lstrip().startswith(ITERATION_TAG):
+                break
+            header.append(line)
+        f.seek(start)
+        chunk = f.read(end - start)
+    return io.BytesIO(b"".join(header) + chunk + XML_FOOTER)
+
+
+def parse_blast_record(i: int, blast_record) -> tuple[
+    dict,
+    list[SeqRecord],
+]:
+    """Extract hits and hit subject sequences from a single BLAST record."""
+    fastas = []
+    # Aligned regions of the query sequence, which are stored once per query
+    # so that each HSP alignment can be stored as a compact BTOP string
+    query_seq = ["N"] * (blast_record.query_length or 0)
+    query_record = {
+        "query_title": blast_record.query,
+        "query_length": blast_record.query_length,
+        "hits": []
+    }
+    hit_stats = calculate_hit_stats(
+        blast_record.alignments,
+        blast_record.query_length,
+        blast_record.effective_search_space,
+    )
+
+    for alignment, stats in zip(blast_record.alignments, hit_stats):
+        hit_def_stripped = parse_hit_def(alignment.hit_def)
+        hit_record = {
+            "hit_id": alignment.hit_id,
+            "hit_subject": hit_def_stripped,
+            "accession": alignment.accession,
+            "alignment_length": stats["alignment_length"],
+            "subject_length": alignment.length,  # poor naming Bio?
+            "query_coverage": stats["query_coverage"],
+            "bitscore": stats["bitscore"],
+            "e_value": stats["e_value"],
+            "identity": stats["identity"],
+            "hsps": [],
+        }
+
+        for hsp in alignment.hsps:
+            hsp_record = {
+                "bitscore": hsp.bits,
+                "e_value": hsp.expect,
+                "identity": round(
+                    hsp.identities / hsp.align_length,
+                    3,
+                ),
+                "identities": hsp.identities,
+                "strand_query": hsp.strand[0],
+                "strand_subject": hsp.strand[1],
+                "gaps": hsp.gaps,
+                "query_start": hsp.query_start,
+                "query_end": hsp.query_end,
+                "subject_start": hsp.sbjct_start,
+                "subject_end": hsp.sbjct_end,
+                "alignment_length": hsp.align_length,
+                # Printable alignment is rendered on demand by the report
+                "btop": calculate_btop(hsp.query, hsp.sbjct),
             }
-            effective_search_space = blast_record.effective_search_space
-
-            for alignment in blast_record.alignments:
-                hit_score = calculate_hit_bitscore(alignment.hsps)
-                hit_e_value = calculate_hit_e_value(
-                    alignment,
-                    effective_search_space)
-                hit_identity = calculate_hit_identity(
-                    alignment.hsps
-                )
-                alignment_length = calculate_alignment_length(alignment.hsps)
-                hit_query_coverage = calculate_hit_query_coverage(
-                    alignment_length,
-                    blast_record.query_length,
-                )
-                hit_def_stripped = parse_hit_def(alignment.hit_def)
-                hit_record = {
-                    "hit_id": alignment.hit_id,
-                    "hit_subject": hit_def_stripped,
-                    "accession": alignment.accession,
-                    "alignment_length": alignment_length,
-                    "subject_length": alignment.length,  # poor naming Bio?
-                    "query_coverage": hit_query_coverage,
-                    "bitscore": hit_score,
-                    "e_value": hit_e_value,
-                    "identity": hit_identity,
-                    "hsps": [],
-                }
-
-                for hsp in alignment.hsps:
-                    hsp_record = {
-                        "bitscore": hsp.bits,
-                        "e_value": hsp.expect,
-                        "identity": round(
-                            hsp.identities / hsp.align_length,
-                            3,
-                        ),
-                        "identities": hsp.identities,
-                        "strand_query": hsp.strand[0],
-                        "strand_subject": hsp.strand[1],
-                        "gaps": hsp.gaps,
-                        "query_start": hsp.query_start,
-                        "query_end": hsp.query_end,
-                        "subject_start": hsp.sbjct_start,
-                        "subject_end": hsp.sbjct_end,
-                        "alignment_length": hsp.align_length,
-                        "alignment": _get_printed_alignment(hsp),
-                    }
-                    hit_record["hsps"].append(hsp_record)
-
-                fastas.append(SeqRecord(
-                    Seq(hsp.sbjct),
-                    id=alignment.accession,
-                    description=hit_def_stripped))
-                query_record["hits"].append(hit_record)
-
-            if not query_record["hits"]:
-                logger.info(
-                    "No BLAST hits found for query"
-                    f" [{query_record['query_title']}]"
-                )
-
-            # Re-order hits by identity
-            query_record["hits"].sort(
-                key=lambda x: x["identity"],
-                reverse=True,
-            )
+            query_seq[hsp.query_start - 1:hsp.query_end] = (
+                hsp.query.replace("-", ""))
+            hit_record["hsps"].append(hsp_record)
 
-            logger.info(f"Query [{i}] - collected {len(query_record["hits"])}"
-                        f" BLAST hits")
-            fasta_results.append(fastas)
-            results.append(query_record)
+        fastas.append(SeqRecord(
+            Seq(hsp.sbjct),
+            id=alignment.accession,
+            description=hit_def_stripped))
+        query_record["hits"].append(hit_record)
 
-    return results, fasta_results
+    query_record["query_seq"] = "".join(query_seq)
+
+    if not query_record["hits"]:
+        logger.info(
+            "No BLAST hits found for query"
+            f" [{query_record['query_title']}]"
+        )
+
+    # Re-order hits by identity
+    query_record["hits"].sort(
+        key=lambda x: x["identity"],
+        reverse=True,
+    )
+
+    logger.info(f"Query [{i}] - collected {len(query_record["hits"])}"
+                f" BLAST hits")
+    return query_record, fastas
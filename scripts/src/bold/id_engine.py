@@ -7,18 +7,17 @@ import csv
 import logging
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
 from xml.etree import ElementTree
 
 from Bio import SeqIO
 from Bio.Seq import Seq
 
-import requests
-
 from src.gbif.taxonomy import fetch_kingdom
-from src.utils import errors
+from src.utils import aio, errors
 from src.utils.orient import orientate
-from src.utils.throttle import ENDPOINTS, Throttle
+from src.utils.throttle import ENDPOINTS, get_throttle
 
 logger = logging.getLogger(__name__)
 BOLD_DATABASE = "COX1_SPECIES_PUBLIC"
@@ -138,7 +137,6 @@ class BoldSearch:
         and the sequence which returns BOLD hits is used.
         """
         def submit_sequence(sequence, i, n_sequences: int):
-            throttle = Throttle(ENDPOINTS.BOLD)
             logger.debug(
                 f"Submitting sequence {i + 1}/{n_sequences}"
                 f": {sequence.id}"
@@ -147,10 +145,7 @@ class BoldSearch:
                 "sequence": str(sequence.seq),
                 "db": db
             }
-            response = throttle.with_retry(
-                requests.get,
-                args=[ID_ENGINE_URL],
-                kwargs={"params": params})
+            response = aio.http_get(ID_ENGINE_URL, params=params)
             response.raise_for_status()
 
             sequence_hits = self._parse_bold_xml(response)
@@ -169,57 +164,53 @@ class BoldSearch:
         # If multiple seq IDs, only keep the one with hits
         # (the correct orientation)
         # Submit all sequences concurrently
-        with ThreadPoolExecutor(max_workers=15) as executor:
-            future_to_seq = {
-                executor.submit(
-                    submit_sequence,
-                    sequence,
-                    i,
-                    n_sequences
-                ): sequence
+        results = aio.gather(
+            ENDPOINTS.BOLD,
+            [
+                partial(submit_sequence, sequence, i, n_sequences)
                 for i, sequence in enumerate(sequences)
-            }
-
-            # Collect results as they complete
-            for future in as_completed(future_to_seq):
-                sequence = future_to_seq[future]
-                sequence_id, sequence_hits = future.result()
-                if (
-                    sequence_id not in hits
-                    or sequence_hits
-                ):
-                    hits[sequence_id] = {
-                        'query_index': seqids.index(sequence_id),
-                        'query_id': sequence_id,
-                        'query_title': sequence.description,
-                        'query_length': len(sequence.seq),
-                        'query_frame': sequence.annotations.get(
-                            "frame"
-                        ),
-                        'query_strand': (
-                            '+'
-                            if sequence.annotations.get(
-                                "forward", True
-                            )
-                            else '-'
-                        ),
-                        'query_sequence': str(sequence.seq),
-                        'query_orientation': (
-                            'HMMSearch'
-                            if sequence.annotations.get(
-                                "oriented"
-                            )
-                            else 'BOLD ID Engine'
-                        ),
-                        'hits': sequence_hits,
-                    }
+            ],
+        )
+        for sequence, result in zip(sequences, results):
+            if isinstance(result, Exception):
+                raise result
+            sequence_id, sequence_hits = result
+            if (
+                sequence_id not in hits
+                or sequence_hits
+            ):
+                hits[sequence_id] = {
+                    'query_index': seqids.index(sequence_id),
+                    'query_id': sequence_id,
+                    'query_title': sequence.description,
+                    'query_length': len(sequence.seq),
+                    'query_frame': sequence.annotations.get(
+                        "frame"
+                    ),
+                    'query_strand': (
+                        '+'
+                        if sequence.annotations.get(
+                            "forward", True
+                        )
+                        else '-'
+                    ),
+                    'query_sequence': str(sequence.seq),
+                    'query_orientation': (
+                        'HMMSearch'
+                        if sequence.annotations.get(
+                            "oriented"
+                        )
+                        else 'BOLD ID Engine'
+                    ),
+                    'hits': sequence_hits,
+                }
 
-            ordered_hits = {
-                seq.id: hits[seq.id]
-                for seq in sequences
-            }
+        ordered_hits = {
+            seq.id: hits[seq.id]
+            for seq in sequences
+        }
 
-            return ordered_hits
+        return ordered_hits
 
     def _fetch_hit_metadata(self, hits) -> dict[str, list]:
         """Fetch metadata by calling BOLD public API with accessions."""
@@ -228,12 +219,7 @@ class BoldSearch:
                 "ids": "|".join(batch_ids),
                 "format": "tsv",
             }
-            throttle = Throttle(ENDPOINTS.BOLD)
-            response = throttle.with_retry(
-                requests.get,
-                args=[FULL_DATA_URL],
-                kwargs={"params": params},
-            )
+            response = aio.http_get(FULL_DATA_URL, params=params)
             if response.status_code >= MIN_HTTP_CODE_ERROR:
                 response.raise_for_status()
             lines = response.text.splitlines()
@@ -253,17 +239,22 @@ class BoldSearch:
         )
         metadata = {}
 
-        with ThreadPoolExecutor(max_workers=15) as executor:
-            futures = []
+        batches = [
+            hit_record_ids[i:i + METADATA_REQUEST_BATCH_SIZE]
             for i in range(
                 0,
                 len(hit_record_ids),
                 METADATA_REQUEST_BATCH_SIZE,
-            ):
-                batch = hit_record_ids[i:i + METADATA_REQUEST_BATCH_SIZE]
-                futures.append(executor.submit(_fetch_batch, batch))
-            for future in as_completed(futures):
-                metadata.update(future.result())
+            )
+        ]
+        results = aio.gather(
+            ENDPOINTS.BOLD,
+            [partial(_fetch_batch, batch) for batch in batches],
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+            metadata.update(result)
 
         hits_with_metadata = {
             query_title: {
@@ -351,9 +342,9 @@ class BoldSearch:
             "taxon": taxa_param,
             "format": "tsv"
         }
-        throttle = Throttle(ENDPOINTS.BOLD)
+        throttle = get_throttle(ENDPOINTS.BOLD)
         response = throttle.with_retry(
-                requests.get,
+                aio.http_get,
                 args=[FULL_DATA_URL],
                 kwargs={"params": params})
         if response.status_code <= MIN_HTTP_CODE_ERROR:
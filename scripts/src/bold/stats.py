@@ -4,10 +4,12 @@ API Docs: https://v4.boldsystems.org/index.php/resources/api
 """
 
 import logging
+from functools import partial
 
 import requests
 
-from src.utils.throttle import ENDPOINTS, Throttle
+from src.utils import aio
+from src.utils.throttle import ENDPOINTS, get_throttle
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,52 @@ def fetch_bold_records_count(taxon: str, rank=None) -> dict:
     Consider returning NA if rank is higher than family level.
 
     """
+    if not _is_countable_rank(rank):
+        return None
+    try:
+        throttle = get_throttle(ENDPOINTS.BOLD)
+        res = throttle.with_retry(_stats_request(taxon, rank))
+        return _parse_records_count(res, taxon, rank)
+    except requests.RequestException as e:
+        logger.error(f"Error fetching records for {taxon}: {e}")
+        return None
+
+
+def fetch_bold_records_counts(
+    taxa: list[str],
+    rank=None,
+) -> tuple[dict[str, int], list[tuple[str, Exception]]]:
+    """Fetch record counts for many taxa from BOLD API concurrently.
+
+    Returns a dict of {taxon: count} and a list of (taxon, exception) for
+    taxa that could not be counted, which have a count of None.
+    """
+    results = {}
+    errors = []
+    if not _is_countable_rank(rank):
+        return {taxon: None for taxon in taxa}, errors
+    responses = aio.gather(
+        ENDPOINTS.BOLD,
+        [_stats_request(taxon, rank) for taxon in taxa],
+    )
+    for taxon, res in zip(taxa, responses):
+        if isinstance(res, Exception):
+            logger.error(
+                f"Error fetching BOLD record count for taxon '{taxon}':"
+                f"\n{res}")
+            results[taxon] = None
+            errors.append((taxon, res))
+            continue
+        try:
+            results[taxon] = _parse_records_count(res, taxon, rank)
+        except Exception as e:
+            logger.error(f"Error fetching records for {taxon}: {e}")
+            results[taxon] = None
+            errors.append((taxon, e))
+    return results, errors
+
+
+def _is_countable_rank(rank) -> bool:
     if rank and rank.lower() not in (
         'species',
         'genus',
@@ -31,54 +79,50 @@ def fetch_bold_records_count(taxon: str, rank=None) -> dict:
             f'Cannot retrieve BOLD record count for taxon at rank={rank}.'
             'Rank must be at family level or lower.'
         )
-        return None
+        return False
+    return True
+
 
+def _stats_request(taxon: str, rank=None):
+    """Return a function that requests record stats for the taxon."""
     logger.debug(f'Fetching BOLD record count for taxon "{taxon}" at'
                  f' rank={rank}')
     params = {
         "taxon": taxon,
         "format": "json",
     }
-    try:
-        throttle = Throttle(ENDPOINTS.BOLD)
-        res = throttle.with_retry(
-            requests.get,
-            args=[STATS_URL],
-            kwargs={
-                'params': params,
-            },
+    return partial(aio.http_get, STATS_URL, params=params)
+
+
+def _parse_records_count(res: requests.Response, taxon: str, rank=None):
+    """Return the record count for the taxon from a stats response."""
+    res.raise_for_status()
+    data = res.json()
+    if data['records_with_species_name'] == 0:
+        logger.debug(f'No BOLD records found for taxon "{taxon}".'
+                     ' Returning count=0.')
+        return 0
+    if rank:
+        # Pull out the query taxon at the given rank
+        taxa_at_rank = (
+            data.get(rank.lower(), {})
+            .get('drill_down', {})
+            .get('entity', [])
         )
-        res.raise_for_status()
-        data = res.json()
-        if data['records_with_species_name'] == 0:
-            logger.debug(f'No BOLD records found for taxon "{taxon}".'
-                         ' Returning count=0.')
-            return 0
-        if rank:
-            # Pull out the query taxon at the given rank
-            taxa_at_rank = (
-                data.get(rank.lower(), {})
-                .get('drill_down', {})
-                .get('entity', [])
-            )
-            taxon_records = [
-                t for t in taxa_at_rank
-                if t['name'].lower() == taxon.lower()
-            ]
-            if taxon_records:
-                count = int(taxon_records[0]['records'])
-                logger.debug(f'Returning {rank}-level BOLD record count for'
-                             f' taxon "{taxon}": {count}')
-                return count
-            logger.warning(f'No {rank}-level BOLD record count found for'
-                           f' taxon "{taxon}". Returning count=0.')
-            return 0
-
-        count = int(data['records_with_species_name'])
-        logger.debug(f'Returning generic BOLD record count for'
-                     f' taxon "{taxon}": {count}')
-        return count
+        taxon_records = [
+            t for t in taxa_at_rank
+            if t['name'].lower() == taxon.lower()
+        ]
+        if taxon_records:
+            count = int(taxon_records[0]['records'])
+            logger.debug(f'Returning {rank}-level BOLD record count for'
+                         f' taxon "{taxon}": {count}')
+            return count
+        logger.warning(f'No {rank}-level BOLD record count found for'
+                       f' taxon "{taxon}". Returning count=0.')
+        return 0
 
-    except requests.RequestException as e:
-        logger.error(f"Error fetching records for {taxon}: {e}")
-        return None
+    count = int(data['records_with_species_name'])
+    logger.debug(f'Returning generic BOLD record count for'
+                 f' taxon "{taxon}": {count}')
+    return count
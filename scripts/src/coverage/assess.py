@@ -6,12 +6,21 @@ file is used to limit the number of concurrent requests.
 """
 
 import logging
+import multiprocessing
+import os
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from pprint import pformat
 
-from src.gbif.maps import draw_occurrence_map
+from src.gbif.maps import fetch_occurrences, render_occurrence_map
 from src.utils import errors
 from src.utils.config import Config
 from src.utils.flags import FLAGS, Flag
+from src.utils.memo import reset_memo
 
 from .fetch import (
     get_related_country_coverage,
@@ -25,6 +34,7 @@ logger = logging.getLogger(__name__)
 config = Config()
 
 MODULE_NAME = "Database Coverage"
+MAX_MAP_RENDER_PROCESSES = 2
 
 
 def assess_coverage(query_dir, is_bold) -> dict[str, dict[str, dict]]:
@@ -36,6 +46,7 @@ def assess_coverage(query_dir, is_bold) -> dict[str, dict[str, dict]]:
         elif func == get_related_country_coverage:
             return func, target, locus, country, query_dir, is_bold
 
+    memo = reset_memo()
     locus = config.get_locus_for_query(query_dir)
     country = config.get_country_for_query(query_dir, code=True)
     candidate_list, toi_list, pmi = get_targets(query_dir)
@@ -65,7 +76,7 @@ def assess_coverage(query_dir, is_bold) -> dict[str, dict[str, dict]]:
         f"  - PMI: {pmi}"
     )
     logger.debug(
-        "Taxids for targets (extracted by taxonkit):\n"
+        "Taxids for targets (extracted from the taxdump index):\n"
         + pformat(target_taxids, indent=2)
     )
 
@@ -79,7 +90,7 @@ def assess_coverage(query_dir, is_bold) -> dict[str, dict[str, dict]]:
         and t not in higher_taxon_targets
     })
 
-    _draw_occurrence_maps(
+    maps = _start_occurrence_maps(
         target_gbif_taxa,
         higher_taxon_targets,
         query_dir,
@@ -124,6 +135,9 @@ def assess_coverage(query_dir, is_bold) -> dict[str, dict[str, dict]]:
         toi_list,
         pmi,
     )
+    # Only waited for on success, so that a map error can't replace an error
+    # from the coverage tasks
+    maps.result()
     for taxon in unknown_taxa:
         for target_type, targets in {
             'candidate': candidate_list,
@@ -137,44 +151,113 @@ def assess_coverage(query_dir, is_bold) -> dict[str, dict[str, dict]]:
                     'country': None,
                 }
     _set_flags(results, query_dir, higher_taxon_targets)
+    logger.info(memo.summary())
     return results, is_error
 
 
+def _start_occurrence_maps(
+    target_gbif_taxa,
+    higher_taxon_targets,
+    query_dir,
+) -> Future:
+    """Start drawing occurrence maps in the background.
+
+    Maps are drawn while coverage tasks are running, so that coverage takes as
+    long as the slower of the two rather than their sum. The returned future
+    completes when all maps have been written.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=1,
+        thread_name_prefix='occurrence_maps',
+    )
+    future = executor.submit(
+        _draw_occurrence_maps,
+        target_gbif_taxa,
+        higher_taxon_targets,
+        query_dir,
+    )
+    executor.shutdown(wait=False)
+    return future
+
+
+def _get_available_cpus() -> int:
+    """Return the number of CPUs that this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
 def _draw_occurrence_maps(
     target_gbif_taxa,
     higher_taxon_targets,
     query_dir,
 ):
-    """Fetch occurrence data and draw world maps showing taxon distribution."""
+    """Fetch occurrence data and draw world maps showing taxon distribution.
+
+    Occurrences are fetched one target at a time (the GBIF occurrence
+    endpoint is slow), and each map is rendered in a process pool while the
+    next target's occurrences are fetched. Rendering in separate processes
+    keeps matplotlib from holding the GIL while coverage tasks run. Each
+    render process uses ~300 MB, so the pool is kept small and no larger
+    than the number of CPUs available to this process.
+    """
+    def handle_error(target, exc):
+        msg = ("Taxon distribution map could not be generated due to an"
+               " error in the GBIF occurrence.")
+        logger.error(f'{msg} Target: "{target}" Exception: {exc}')
+        errors.write(
+            errors.LOCATIONS.DB_COVERAGE,
+            msg,
+            exc=exc,
+            context={'target': target},
+        )
+
     taxa = {
         **target_gbif_taxa,
         **higher_taxon_targets,
     }
-    for target, gbif_target in taxa.items():
-        if not gbif_target.key:
-            logger.warning(
-                f"No GBIF taxon key found for target"
-                f" '{target}'. Occurrence map will not be generated for this"
-                " target.")
-            continue
-        path = query_dir / config.get_map_filename_for_target(target)
-        logger.info(
-            f"Writing occurrence map for"
-            f" '{target}' (taxon key: {gbif_target.key}) to file"
-            f" '{path}'..."
-        )
-        try:
-            draw_occurrence_map(gbif_target.key, path)
-        except Exception as e:
-            msg = ("Taxon distribution map could not be generated due to an"
-                   " error in the GBIF occurrence.")
-            logger.error(f'{msg} Target: "{target}" Exception: {e}')
-            errors.write(
-                errors.LOCATIONS.DB_COVERAGE,
-                msg,
-                exc=e,
-                context={'target': target},
+    if not taxa:
+        return
+    render_futures = {}
+    with ProcessPoolExecutor(
+        max_workers=min(
+            len(taxa),
+            MAX_MAP_RENDER_PROCESSES,
+            _get_available_cpus(),
+        ),
+        mp_context=multiprocessing.get_context('spawn'),
+    ) as executor:
+        for target, gbif_target in taxa.items():
+            if not gbif_target.key:
+                logger.warning(
+                    f"No GBIF taxon key found for target"
+                    f" '{target}'. Occurrence map will not be generated for"
+                    " this target.")
+                continue
+            path = query_dir / config.get_map_filename_for_target(target)
+            logger.info(
+                f"Writing occurrence map for"
+                f" '{target}' (taxon key: {gbif_target.key}) to file"
+                f" '{path}'..."
             )
+            try:
+                lats, lons, counts = fetch_occurrences(gbif_target.key)
+                future = executor.submit(
+                    render_occurrence_map,
+                    lats,
+                    lons,
+                    path,
+                    counts=counts,
+                )
+                render_futures[future] = target
+            except Exception as exc:
+                handle_error(target, exc)
+
+        for future in as_completed(render_futures):
+            try:
+                future.result()
+            except Exception as exc:
+                handle_error(render_futures[future], exc)
 
 
 def _set_flags(db_coverage, query_dir, higher_taxon_targets):
@@ -1,15 +1,19 @@
 """docstring"""
 
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 
-from src.bold.stats import fetch_bold_records_count
+from src.bold.stats import (
+    fetch_bold_records_count,
+    fetch_bold_records_counts,
+)
 from src.entrez import genbank
 from src.gbif.relatives import RANK
 from src.taxonomy import extract
 from src.utils import errors
 from src.utils.config import Config
 from src.utils.flags import FLAGS
+from src.utils.memo import MEMOS, get_memo
 
 logger = logging.getLogger(__name__)
 config = Config()
@@ -18,8 +22,22 @@ MODULE_NAME = "Database Coverage"
 
 
 def get_target_coverage(taxid, gbif_target, locus, is_bold):
-    """Return a count of the number of accessions for the given target."""
-    # TODO: potential for caching gb count result here
+    """Return a count of the number of accessions for the given target.
+
+    Counts are memoized by taxid for the current run.
+    """
+    return get_memo().get(
+        MEMOS.TARGET_COUNT,
+        (taxid, locus, is_bold),
+        _fetch_target_count,
+        taxid,
+        gbif_target,
+        locus,
+        is_bold,
+    )
+
+
+def _fetch_target_count(taxid, gbif_target, locus, is_bold):
     db_name = 'BOLD' if is_bold else 'Entrez'
     logger.info(
         f"Fetching {db_name} records for target taxid:"
@@ -33,15 +51,21 @@ def get_target_coverage(taxid, gbif_target, locus, is_bold):
     return genbank.fetch_gb_records(locus, taxid, count=True)
 
 
-def get_related_coverage(gbif_target, locus, query_dir, is_bold):
+def get_related_coverage(
+    gbif_target,
+    locus,
+    query_dir,
+    is_bold,
+    species_counts=None,
+):
     """Return a count of the number of related species (same genus) and the
     number of species which have at least one accession in the database.
+
+    If species_counts is given, records are counted through it so that
+    species shared with other targets are only counted once.
     """
     db_name = 'BOLD' if is_bold else 'Entrez'
-    species_names = list({
-        r["canonicalName"]
-        for r in gbif_target.relatives
-    })
+    species_names = get_related_species(gbif_target)
     if not species_names:
         return {}
     logger.info(
@@ -49,14 +73,13 @@ def get_related_coverage(gbif_target, locus, query_dir, is_bold):
         f" '{gbif_target.taxon}' (locus: '{locus}') - {len(species_names)}"
         f" related species..."
     )
-    # TODO: potential for caching GBIF related taxa here
-    if is_bold:
-        results, err = _fetch_bold_records_for_species(
-            species_names,
-            rank=RANK.to_string(gbif_target.rank),
-        )
-    else:
-        results, err = _fetch_gb_records_for_species(species_names, locus)
+    species_counts = species_counts or SpeciesCounts()
+    results, err = species_counts.get(
+        species_names,
+        locus,
+        is_bold,
+        rank=get_count_rank(gbif_target, is_bold),
+    )
     if err:
         for species, exc in err:
             msg = (
@@ -78,30 +101,26 @@ def get_related_country_coverage(
     country,
     query_dir,
     is_bold,
+    species_counts=None,
 ):
     db_name = 'BOLD' if is_bold else 'Entrez'
     if not country:
         return FLAGS.NA
-    species_names = [
-        r["canonicalName"]
-        for r in gbif_target.for_country(country)
-    ]
+    species_names = get_related_country_species(gbif_target, country)
     if not species_names:
         return {}
-    # TODO: potential for caching GBIF related/country taxa here
     logger.info(
         f"Fetching {db_name} records for target"
         f" '{gbif_target.taxon}' (locus: '{locus}'; country: '{country}')"
         f" - {len(species_names)} related species"
     )
-
-    if is_bold:
-        results, err = _fetch_bold_records_for_species(
-            species_names,
-            rank=RANK.to_string(gbif_target.rank),
-        )
-    else:
-        results, err = _fetch_gb_records_for_species(species_names, locus)
+    species_counts = species_counts or SpeciesCounts()
+    results, err = species_counts.get(
+        species_names,
+        locus,
+        is_bold,
+        rank=get_count_rank(gbif_target, is_bold),
+    )
     if err:
         for species, exc in err:
             msg = (
@@ -117,11 +136,166 @@ def get_related_country_coverage(
     return results
 
 
+def get_related_species(gbif_target) -> list[str]:
+    """Return names of species in the same genus as the target."""
+    return list({
+        r["canonicalName"]
+        for r in gbif_target.relatives
+    })
+
+
+def get_related_country_species(gbif_target, country) -> list[str]:
+    """Return names of species in the same genus as the target that occur in
+    the given country.
+    """
+    return [
+        r["canonicalName"]
+        for r in gbif_target.for_country(country)
+    ]
+
+
+class SpeciesCounts:
+    """Database record counts for related species, shared between targets.
+
+    Species are added for each target and then counted together, so that a
+    species shared between targets (e.g. a candidate and a taxon of interest
+    in the same genus) is only counted once. Counts are kept separately for
+    each (locus, database, rank), since these change the count.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._counts = {}
+        self._errors = {}
+        # Batches that failed outright - raised for every species in them
+        self._batch_errors = {}
+        self._lock = threading.Lock()
+        # Held while counting, so that get() waits for species that another
+        # thread is already counting
+        self._fetch_lock = threading.Lock()
+
+    def add(self, species_names, locus, is_bold, rank=None):
+        """Add species to be counted by the next call to fetch.
+
+        Species that have already been added are counted as memo hits.
+        """
+        hits = self._add(species_names, (locus, is_bold, rank))
+        get_memo().record(
+            MEMOS.SPECIES_COUNT,
+            hits=hits,
+            misses=len(species_names) - hits,
+        )
+
+    def _add(self, species_names, key) -> int:
+        """Add species to pending and return the number already added."""
+        hits = 0
+        with self._lock:
+            pending = self._pending.setdefault(key, {})
+            for species in species_names:
+                if (
+                    species in pending
+                    or (key, species) in self._counts
+                    or (key, species) in self._errors
+                    or (key, species) in self._batch_errors
+                ):
+                    hits += 1
+                else:
+                    pending[species] = None
+        return hits
+
+    def fetch(self):
+        """Count records for all pending species, with one batch of requests
+        per (locus, database, rank).
+        """
+        with self._fetch_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+            self._fetch_pending(pending)
+
+    def _fetch_pending(self, pending):
+        for key, species_names in pending.items():
+            if not species_names:
+                continue
+            locus, is_bold, rank = key
+            db_name = 'BOLD' if is_bold else 'Entrez'
+            logger.info(
+                f"Fetching {db_name} records for {len(species_names)}"
+                f" unique related species (locus: '{locus}')..."
+            )
+            try:
+                if is_bold:
+                    results, err = _fetch_bold_records_for_species(
+                        list(species_names), rank=rank)
+                else:
+                    results, err = _fetch_gb_records_for_species(
+                        list(species_names), locus)
+            except Exception as exc:
+                logger.error(
+                    f"Error fetching {db_name} records for related species:"
+                    f" {exc}")
+                with self._lock:
+                    for species in species_names:
+                        self._batch_errors[(key, species)] = exc
+                continue
+            with self._lock:
+                for species, count in results.items():
+                    self._counts[(key, species)] = count
+                for species, exc in err:
+                    self._errors[(key, species)] = exc
+
+    def get(self, species_names, locus, is_bold, rank=None):
+        """Return counts for the given species, counting any that have not
+        been fetched yet.
+
+        Returns a dict of {species: count} and a list of (species, exception)
+        for species that could not be counted.
+        """
+        key = (locus, is_bold, rank)
+        self._add(species_names, key)
+        self.fetch()
+        results = {}
+        errors = []
+        with self._lock:
+            for species in species_names:
+                if (key, species) in self._batch_errors:
+                    raise self._batch_errors[(key, species)]
+                if (key, species) in self._errors:
+                    errors.append((species, self._errors[(key, species)]))
+                if (key, species) in self._counts:
+                    results[species] = self._counts[(key, species)]
+        return results, errors
+
+
+def get_count_rank(gbif_target, is_bold):
+    """Return the rank at which related species are counted.
+
+    BOLD counts are taken at the target's rank, while Genbank counts do not
+    depend on rank.
+    """
+    if is_bold:
+        return RANK.to_string(gbif_target.rank)
+    return None
+
+
+def get_species_taxids(species_names) -> dict[str, str]:
+    """Return the NCBI taxid of each species (None if not found).
+
+    Taxids are memoized by name for the current run, and names that have not
+    been seen yet are looked up together.
+    """
+    return get_memo().get_many(
+        MEMOS.SPECIES_TAXID,
+        species_names,
+        extract.taxids,
+    )
+
+
 def _fetch_gb_records_for_species(species_names, locus):
     """Fetch a count of the number of Genbank accessions for each species in
     the list.
     """
-    taxids = extract.taxids(species_names)
+    taxids = get_species_taxids(species_names)
     species_without_taxid = [
         k for k, v in taxids.items()
         if v is None
@@ -131,30 +305,15 @@ def _fetch_gb_records_for_species(species_names, locus):
         for k, v in taxids.items()
         if v is not None
     }
-    tasks = [
-        (locus, taxid)
-        for taxid in taxids.values()
-        if taxid is not None
+    results, taxid_errors = genbank.fetch_gb_records_counts(
+        locus,
+        list(taxid_to_species),
+    )
+    errors = [
+        (taxid_to_species[taxid], exc)
+        for taxid, exc in taxid_errors
     ]
 
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        future_to_task = {
-            executor.submit(genbank.fetch_gb_records, *task, count=True): task
-            for task in tasks
-        }
-
-    results = {}
-    errors = []
-    for future in as_completed(future_to_task):
-        locus, taxid = future_to_task[future]
-        try:
-            results[taxid] = future.result()
-        except Exception as exc:
-            logger.error(
-                f"Error processing fetch_gb_records for"
-                f" taxid {taxid}:\n{exc}")
-            errors.append((taxid_to_species[taxid], exc))
-
     species_counts = {
         taxid_to_species[taxid]: count
         for taxid, count in results.items()
@@ -163,7 +322,6 @@ def _fetch_gb_records_for_species(species_names, locus):
         species: 0
         for species in species_without_taxid
     })
-    # TODO: potential for caching related species counts here
     return species_counts, errors
 
 
@@ -171,21 +329,4 @@ def _fetch_bold_records_for_species(taxa, rank):
     """Fetch a count of the number of BOLD accessions for each species in
     the list.
     """
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_task = {
-            executor.submit(fetch_bold_records_count, taxon, rank=rank): taxon
-            for taxon in taxa
-        }
-        results = {}
-        errors = []
-        for future in as_completed(future_to_task):
-            taxon = future_to_task[future]
-            try:
-                results[taxon] = future.result()
-            except Exception as exc:
-                logger.error(
-                    f"Error processing"
-                    f" fetch_bold_records_count for taxon '{taxon}':\n{exc}")
-                results[taxon] = None
-                errors.append((taxon, exc))
-    return results, errors
+    return fetch_bold_records_counts(taxa, rank=rank)
@@ -4,9 +4,11 @@ import logging
 from pprint import pformat
 
 from src.gbif.relatives import GBIFRecordNotFound, RANK, RelatedTaxaGBIF
-from src.taxonomy import extract
 from src.utils import errors
 from src.utils.config import Config
+from src.utils.memo import MEMOS, get_memo
+
+from .fetch import get_species_taxids
 
 logger = logging.getLogger(__name__)
 config = Config()
@@ -51,10 +53,10 @@ def get_targets(query_dir):
 
 
 def get_taxids(targets, query_dir):
-    target_taxids = extract.taxids(targets)
+    target_taxids = get_species_taxids(targets)
     if not all(target_taxids.values()):
         msg = (
-            "Taxonkit failed to produce taxids for this taxon."
+            "No taxid was found for this taxon in the NCBI taxdump."
             " Database coverage for this taxon is assumed to be zero, since"
             " this likely means it is not represented in the reference"
             " database.")
@@ -74,11 +76,22 @@ def get_taxids(targets, query_dir):
 
 
 def fetch_target_taxa(targets, query_dir):
+    """Fetch a GBIF record for each target taxon.
+
+    Records are memoized by taxon name for the current run, so a taxon that
+    appears in more than one target list is only looked up once.
+    """
     target_gbif_taxa = {}
     higher_taxon_targets = {}  # Taxa at rank 'family' or higher
+    memo = get_memo()
     for target in targets:
         try:
-            gbif_target = RelatedTaxaGBIF(target)
+            gbif_target = memo.get(
+                MEMOS.GBIF_TAXON,
+                target,
+                RelatedTaxaGBIF,
+                target,
+            )
         except GBIFRecordNotFound as exc:
             msg = (f"No GBIF record found for target taxon '{target}'."
                    " This target could not be evaluated.")
@@ -10,8 +10,13 @@ from src.utils.config import Config
 from src.utils.flags import TARGETS
 
 from .fetch import (
+    SpeciesCounts,
+    get_count_rank,
     get_related_country_coverage,
+    get_related_country_species,
     get_related_coverage,
+    get_related_species,
+    get_species_taxids,
     get_target_coverage,
 )
 
@@ -31,60 +36,91 @@ def parallel_process_tasks(
     toi_list,
     pmi,
 ):
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        results = {
-            get_target_coverage.__name__: {},
-            get_related_coverage.__name__: {},
-            get_related_country_coverage.__name__: {},
-        }
-        logger.debug(
-            f"Threading {len(tasks)} tasks..."
+    """Run coverage tasks for all targets and collect the results.
+
+    Related species are counted with one shared SpeciesCounts, rather than
+    each task counting its own species:
+
+    1. Target counts and the related species of each target are fetched
+       concurrently.
+    2. Taxids are looked up (for Genbank) and records are counted for the
+       union of related species from all tasks, so that a species shared
+       between targets is only looked up and counted once.
+    3. The counts are fanned back out to each related coverage task.
+    """
+    def handle_error(task, exc):
+        _handle_task_error(
+            task,
+            exc,
+            query_dir,
+            taxid_to_taxon,
+            candidate_list,
+            toi_list,
         )
-        future_to_task = {
-            executor.submit(*task): task
-            for task in tasks
-        }
+
+    results = {
+        get_target_coverage.__name__: {},
+        get_related_coverage.__name__: {},
+        get_related_country_coverage.__name__: {},
+    }
+    species_counts = SpeciesCounts()
+    related_tasks = []
+    genbank_species = {}
+    logger.debug(
+        f"Threading {len(tasks)} tasks..."
+    )
+    with ThreadPoolExecutor(max_workers=15) as executor:
+        future_to_task = {}
+        for task in tasks:
+            if task[0] == get_target_coverage:
+                future = executor.submit(*task)
+            else:
+                future = executor.submit(_list_species, *task)
+            future_to_task[future] = task
         for future in as_completed(future_to_task):
-            func, target = future_to_task[future][:2]
-            logger.info(f"Task completed: {func.__name__} on target"
-                        f" '{target}'")
+            task = future_to_task[future]
+            func, target = task[:2]
             try:
-                results[func.__name__][target] = future.result()
+                result = future.result()
             except Exception as exc:
-                species_name = target
-                if isinstance(target, RelatedTaxaGBIF):
-                    species_name = target.taxon
-                elif isinstance(target, str):
-                    species_name = taxid_to_taxon[target]
-                target_source = (
-                    "candidate" if species_name in candidate_list
-                    else "taxon of interest" if species_name in toi_list
-                    else "preliminary ID"
+                handle_error(task, exc)
+                continue
+            if func == get_target_coverage:
+                logger.info(f"Task completed: {func.__name__} on target"
+                            f" '{target}'")
+                results[func.__name__][target] = result
+            else:
+                locus, is_bold = task[2], task[-1]
+                species_counts.add(
+                    result,
+                    locus,
+                    is_bold,
+                    rank=get_count_rank(target, is_bold),
                 )
-                msg = (
-                    f"Error processing {func.__name__} for target taxon"
-                    f" '{species_name}' ({target_source}). This target could"
-                    f" not be evaluated."
-                    f" Exception: {type(exc).__name__}: {exc}")
-                logger.error(f"{msg}")
-                errors.write(
-                    errors.LOCATIONS.DB_COVERAGE,
-                    msg,
-                    exc=exc,
-                    query_dir=query_dir,
-                    context={'target': species_name})
-                if isinstance(exc, urllib.error.URLError):
-                    raise errors.APIError(
-                        f"Fatal error fetching data from Entrez API: '{exc}'"
-                        " This error occurred multiple times and indicates a"
-                        " network issue - please resume this"
-                        " job at a later time when network issues have"
-                        " resolved. If this issue persists, you may need to"
-                        " contact the development team to diagnose the"
-                        " issue. You can check the status of the Entrez API"
-                        " by visiting"
-                        " https://eutils.ncbi.nlm.nih.gov"
-                        "/entrez/eutils/efetch.fcgi in your browser.")
+                related_tasks.append(task)
+                if not is_bold:
+                    genbank_species.update(dict.fromkeys(result))
+
+    if genbank_species:
+        try:
+            get_species_taxids(list(genbank_species))
+        except Exception as exc:
+            # Not memoized, so this is raised again for each task that counts
+            # these species
+            logger.warning(
+                f"Failed to look up taxids for related species: {exc}")
+    species_counts.fetch()
+    for task in related_tasks:
+        func, target = task[:2]
+        try:
+            results[func.__name__][target] = func(
+                *task[1:],
+                species_counts=species_counts,
+            )
+            logger.info(f"Task completed: {func.__name__} on target"
+                        f" '{target}'")
+        except Exception as exc:
+            handle_error(task, exc)
 
     logger.debug("Results collected from tasks:")
     for func, result in results.items():
@@ -101,6 +137,61 @@ def parallel_process_tasks(
     )
 
 
+def _list_species(func, gbif_target, locus, *args):
+    """Return the related species that a related coverage task will count."""
+    if func == get_related_coverage:
+        return get_related_species(gbif_target)
+    country = args[0]
+    if not country:
+        return []
+    return get_related_country_species(gbif_target, country)
+
+
+def _handle_task_error(
+    task,
+    exc,
+    query_dir,
+    taxid_to_taxon,
+    candidate_list,
+    toi_list,
+):
+    func, target = task[:2]
+    species_name = target
+    if isinstance(target, RelatedTaxaGBIF):
+        species_name = target.taxon
+    elif isinstance(target, str):
+        species_name = taxid_to_taxon[target]
+    target_source = (
+        "candidate" if species_name in candidate_list
+        else "taxon of interest" if species_name in toi_list
+        else "preliminary ID"
+    )
+    msg = (
+        f"Error processing {func.__name__} for target taxon"
+        f" '{species_name}' ({target_source}). This target could"
+        f" not be evaluated."
+        f" Exception: {type(exc).__name__}: {exc}")
+    logger.error(f"{msg}")
+    errors.write(
+        errors.LOCATIONS.DB_COVERAGE,
+        msg,
+        exc=exc,
+        query_dir=query_dir,
+        context={'target': species_name})
+    if isinstance(exc, urllib.error.URLError):
+        raise errors.APIError(
+            f"Fatal error fetching data from Entrez API: '{exc}'"
+            " This error occurred multiple times and indicates a"
+            " network issue - please resume this"
+            " job at a later time when network issues have"
+            " resolved. If this issue persists, you may need to"
+            " contact the development team to diagnose the"
+            " issue. You can check the status of the Entrez API"
+            " by visiting"
+            " https://eutils.ncbi.nlm.nih.gov"
+            "/entrez/eutils/efetch.fcgi in your browser.")
+
+
 def _collect_results(
     results,
     target_taxids,
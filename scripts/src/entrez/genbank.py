@@ -1,22 +1,30 @@
 """Use Entrez module from Biopython to fetch sequence data
 from NCBI/Genbank."""
 
+import io
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from xml.etree import ElementTree as ET
 
 from Bio import Entrez
 
+from src.utils import aio
+from src.utils.cache import CACHES, get_cache
 from src.utils.config import Config
 from src.utils.locus import Locus
-from src.utils.throttle import ENDPOINTS, Throttle
+from src.utils.throttle import ENDPOINTS, get_throttle
 
 config = Config()
 logger = logging.getLogger(__name__)
 
 DEBUG_REQUESTS = True
 EFETCH_BATCH_SIZE = 10
+ESEARCH_COUNT_BATCH_SIZE = 64
 AUTOMATED_ANNOTATION_TAG = '##Genome-Annotation-Data-START##'
+STREAM_CHUNK_BYTES = 64 * 1024
+# GBSeq elements from here to the end of the record are not parsed
+SKIP_FROM_TAGS = (b'<GBSeq_feature-table>', b'<GBSeq_sequence>')
+RECORD_END_TAG = b'</GBSeq>'
 
 Entrez.email = config.USER_EMAIL
 if config.NCBI_API_KEY:
@@ -38,6 +46,7 @@ class GbRecordSource:
 
     def __init__(self, accession: str):
         self.accession = accession
+        self.accession_version = None
         self.is_automated = False
         self._publications = []
 
@@ -65,6 +74,15 @@ class GbRecordSource:
             'publications': self.publications,
         }
 
+    @classmethod
+    def from_json(cls, data: dict) -> 'GbRecordSource':
+        source = cls(data['accession'])
+        source.accession_version = data.get('accession_version')
+        source.is_automated = data['is_automated']
+        for publication in data['publications']:
+            source.add_publication(**publication)
+        return source
+
     def add_publication(
         self,
         authors: list[str] = None,
@@ -125,40 +143,51 @@ class GbRecordSource:
 def fetch_entrez(
     endpoint=Entrez.efetch,
     db='nuccore',
-    truncate_metadata=False,
+    read_func=None,
     **kwargs,
-) -> str:
+):
     """Fetch data from NCBI Entrez database.
     Throttle requests to avoid rate limits and retry on failure.
-    If truncate_metadata is set, the response will be truncated before sequence
-    data begins to avoid downloading large amounts of surplus data.
+    If read_func is given, it is called with the response handle to read the
+    response, e.g. to stream it into a parser without holding the full
+    response. The handle is closed once read_func returns.
+    """
+    throttle = get_throttle(ENDPOINTS.ENTREZ)
+    return throttle.with_retry(entrez_request(
+        endpoint=endpoint,
+        db=db,
+        read_func=read_func,
+        **kwargs,
+    ))
+
+
+def entrez_request(
+    endpoint=Entrez.efetch,
+    db='nuccore',
+    read_func=None,
+    **kwargs,
+):
+    """Return a function that sends an Entrez request and reads the response.
+
+    The request is not throttled - the function should be sent with the
+    ENTREZ throttle, or scheduled with aio.gather. See fetch_entrez for args.
     """
     def read(handle):
+        if read_func:
+            return read_func(handle)
         if endpoint == Entrez.efetch:
-            if truncate_metadata:
-                data = b""
-                for line in handle:
-                    if (
-                        b'<GBSeq_feature-table>' in line
-                        or b'<GBSeq_sequence>' in line
-                    ):
-                        break
-                    data += line
-                data += b"\n</GBSeq></GBSet>"
-                return data
             return handle.read()
         return Entrez.read(handle)
 
-    Entrez.local_cache = config.entrez_cache_dir
-    handle = None
-    kwargs.update({
-        "db": db,
-    })
-    throttle = Throttle(ENDPOINTS.ENTREZ)
-    handle = throttle.with_retry(endpoint, kwargs=kwargs)
-    data = read(handle)
-    handle.close()
-    return data
+    def send():
+        Entrez.local_cache = config.entrez_cache_dir
+        handle = endpoint(db=db, **kwargs)
+        try:
+            return read(handle)
+        finally:
+            handle.close()
+
+    return send
 
 
 def fetch_fasta(identifier, **kwargs):
@@ -170,31 +199,54 @@ def fetch_fasta(identifier, **kwargs):
     )
 
 
-def fetch_sources(accessions: list, **kwargs) -> dict[str, GbRecordSource]:
-    def fetch_and_parse(accession: str):
-        """Fetch Genbank metadata for the given accession."""
-        logger.debug(f"Fetching Genbank metadata for accession {accession}")
-        metadata_xml = fetch_entrez(
-            id=accession,
+def fetch_sources(
+    accessions: list,
+    batch_size: int = EFETCH_BATCH_SIZE,
+    **kwargs,
+) -> dict[str, GbRecordSource]:
+    """Fetch Genbank metadata for the given accessions.
+
+    Sources are cached across runs, so only accessions that have not been
+    seen before are fetched, in batches of batch_size per efetch request.
+    """
+    def efetch_metadata(batch: list[str]):
+        """Return a request for Genbank metadata for a batch of accessions."""
+        logger.debug(
+            f"Fetching Genbank metadata for {len(batch)} accessions:"
+            f" {', '.join(batch)}")
+        return entrez_request(
+            id=','.join(batch),
             rettype="gb",
             retmode="xml",
-            truncate_metadata=True,
+            read_func=lambda handle: stream_metadata(
+                handle,
+                n_records=len(batch),
+            ),
             **kwargs,
-        ).decode('utf-8')
-        return parse_metadata(metadata_xml)
-
-    accession_sources = {}
-    with ThreadPoolExecutor(max_workers=15) as executor:
-        futures = [
-            executor.submit(
-                fetch_and_parse,
-                acc,
-            )
-            for acc in accessions
-        ]
-        for future in as_completed(futures):
-            sources = future.result()
-            accession_sources.update(sources)
+        )
+
+    unique_accessions = list(dict.fromkeys(accessions))
+    accession_sources = _get_cached_sources(unique_accessions)
+    uncached_accessions = [
+        accession for accession in unique_accessions
+        if accession not in accession_sources
+    ]
+    logger.info(
+        f"Fetching Genbank metadata for {len(uncached_accessions)} accessions"
+        f" ({len(accession_sources)} more were cached)...")
+    batches = [
+        uncached_accessions[i:i + batch_size]
+        for i in range(0, len(uncached_accessions), batch_size)
+    ]
+    results = aio.gather(
+        ENDPOINTS.ENTREZ,
+        [efetch_metadata(batch) for batch in batches],
+    )
+    for sources in results:
+        if isinstance(sources, Exception):
+            raise sources
+        _cache_sources(sources)
+        accession_sources.update(sources)
 
     missing_accessions = set(accessions) - set(accession_sources.keys())
     if missing_accessions:
@@ -209,28 +261,145 @@ def fetch_sources(accessions: list, **kwargs) -> dict[str, GbRecordSource]:
     return accession_sources
 
 
+def _get_sources_cache():
+    return get_cache(
+        CACHES.GENBANK_SOURCES,
+        ttl_days=config.GENBANK_SOURCES_CACHE_TTL_DAYS,
+        max_size_mb=config.GENBANK_SOURCES_CACHE_MAX_SIZE_MB,
+    )
+
+
+def _get_cached_sources(accessions: list[str]) -> dict[str, GbRecordSource]:
+    """Return cached sources for the given accessions.
+
+    Sources are cached by accession and record the accession.version that was
+    fetched. A versioned accession is only returned from the cache if its
+    version matches.
+    """
+    cache = _get_sources_cache()
+    sources = {}
+    for accession in accessions:
+        data = cache.get(accession.split('.')[0])
+        if data is None:
+            continue
+        if '.' in accession and data.get('accession_version') != accession:
+            continue
+        sources[accession] = GbRecordSource.from_json(data)
+    return sources
+
+
+def _cache_sources(sources: dict[str, GbRecordSource]):
+    _get_sources_cache().set_many({
+        source.accession: {
+            **source.to_json(),
+            'accession_version': source.accession_version,
+        }
+        for source in sources.values()
+        if source.accession
+    })
+
+
 def parse_metadata(xml_str: str) -> dict[str, GbRecordSource]:
-    root = ET.fromstring(xml_str)
-    records = {}
-    for record in root.findall('.//GBSeq'):
-        accession = getattr(
-            record.find('GBSeq_primary-accession'), 'text', None)
-        source = GbRecordSource(accession)
-        for ref in record.findall('.//GBReference'):
-            authors = [
-                x.text for x in ref.findall('.//GBAuthor')
-            ]
-            title = getattr(ref.find('GBReference_title'), 'text', None)
-            journal = getattr(ref.find('GBReference_journal'), 'text', None)
-            source.add_publication(
-                authors=authors,
-                title=title,
-                journal=journal,
+    return stream_metadata(io.BytesIO(xml_str.encode('utf-8')))
+
+
+def stream_metadata(
+    handle,
+    n_records: int = None,
+) -> dict[str, GbRecordSource]:
+    """Parse source metadata for each record in a GenBank XML (GBSet) stream.
+
+    The stream is read in chunks and fed to an incremental parser, but the
+    feature table and sequence of each record are skipped without parsing.
+    If n_records is given, reading stops as soon as the metadata of that many
+    records has been parsed, so that the rest of the response (i.e. the
+    features and sequence of the last record) is not downloaded.
+    """
+    parser = _GbMetadataParser()
+    buffer = b''
+    skip = False
+    # Keep enough bytes to match a tag that is split between chunks
+    keep_bytes = max(len(tag) for tag in SKIP_FROM_TAGS + (RECORD_END_TAG,))
+    while True:
+        chunk = handle.read(STREAM_CHUNK_BYTES)
+        buffer += chunk
+        while buffer:
+            if skip:
+                ix = buffer.find(RECORD_END_TAG)
+                if ix < 0:
+                    buffer = buffer[-keep_bytes:]
+                    break
+                buffer = buffer[ix:]
+                skip = False
+            ix = min(
+                (i for i in (buffer.find(tag) for tag in SKIP_FROM_TAGS)
+                 if i >= 0),
+                default=-1,
             )
-        if AUTOMATED_ANNOTATION_TAG in ET.tostring(record).decode('utf-8'):
-            source.is_automated = True
-        records[accession] = source
-    return records
+            if ix < 0:
+                if chunk:
+                    parser.feed(buffer[:-keep_bytes])
+                    buffer = buffer[-keep_bytes:]
+                else:
+                    parser.feed(buffer)
+                    buffer = b''
+                break
+            parser.feed(buffer[:ix])
+            parser.end_record()
+            if n_records and parser.n_records >= n_records:
+                return parser.records
+            buffer = buffer[ix:]
+            skip = True
+        if not chunk:
+            return parser.records
+
+
+class _GbMetadataParser:
+    """Incrementally parse accession, references and automated annotation
+    from GBSeq records.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self.records = {}
+        self.n_records = 0
+        self._source = None
+
+    def feed(self, data: bytes):
+        self._parser.feed(data)
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if elem.tag == 'GBSeq':
+                    self._source = GbRecordSource(None)
+                continue
+            if self._source is None:
+                continue
+            if elem.tag == 'GBSeq_primary-accession':
+                self._source.accession = elem.text
+            elif elem.tag == 'GBSeq_accession-version':
+                self._source.accession_version = elem.text
+            elif elem.tag == 'GBReference':
+                self._source.add_publication(
+                    authors=[x.text for x in elem.findall('.//GBAuthor')],
+                    title=getattr(
+                        elem.find('GBReference_title'), 'text', None),
+                    journal=getattr(
+                        elem.find('GBReference_journal'), 'text', None),
+                )
+            elif elem.tag == 'GBSeq':
+                self.end_record()
+                elem.clear()
+                continue
+            if elem.text and AUTOMATED_ANNOTATION_TAG in elem.text:
+                self._source.is_automated = True
+
+    def end_record(self):
+        """Store the current record, if it has not been stored already."""
+        if self._source is None:
+            return
+        self.records[self._source.accession] = self._source
+        self.n_records += 1
+        self._source = None
 
 
 def fetch_gb_records(
@@ -241,11 +410,17 @@ def fetch_gb_records(
     '''Find matching GenBank records.
 
     If count, returns a count of matching records, otherwise returns a list
-    of matching accessions IDs.
+    of matching accessions IDs. Counts are cached across queries and runs.
     '''
     query = f'txid{taxid}[Organism])'
     if locus:
         query += f' AND ({locus.genbank_query_str})'
+    if count:
+        cache = _get_count_cache()
+        cache_key = _count_cache_key(locus, taxid)
+        cached_count = cache.get(cache_key)
+        if cached_count is not None:
+            return cached_count
     max_results = 1 if count else 100
     logger.debug(f"Submitting Entrez query: <<{query}>>")
     results = fetch_entrez(
@@ -254,10 +429,103 @@ def fetch_gb_records(
         retmax=max_results,
     )
     if count:
-        return int(results["Count"])
+        result_count = int(results["Count"])
+        cache.set(cache_key, result_count)
+        return result_count
     return results["IdList"]
 
 
+def fetch_gb_records_counts(
+    locus: Locus,
+    taxids: list[int],
+) -> tuple[dict[int, int], list[tuple[int, Exception]]]:
+    '''Count matching GenBank records for each taxid.
+
+    Rather than one request per taxid, taxids are counted in groups with an
+    OR-combined query. A group with no records gives a count of zero for all
+    of its taxids, while a group with records is split in half and each half
+    is counted again, down to single taxids. Since many species have no
+    records, most taxids are resolved without a request of their own.
+
+    Returns a dict of {taxid: count} and a list of (taxid, exception) for
+    taxids that could not be counted.
+    '''
+    cache = _get_count_cache()
+    counts = {}
+    uncached_taxids = []
+    for taxid in dict.fromkeys(taxids):
+        cached_count = cache.get(_count_cache_key(locus, taxid))
+        if cached_count is None:
+            uncached_taxids.append(taxid)
+        else:
+            counts[taxid] = cached_count
+
+    n_cached = len(counts)
+    groups = [
+        uncached_taxids[i:i + ESEARCH_COUNT_BATCH_SIZE]
+        for i in range(0, len(uncached_taxids), ESEARCH_COUNT_BATCH_SIZE)
+    ]
+    errors = []
+    n_requests = 0
+    while groups:
+        results = aio.gather(
+            ENDPOINTS.ENTREZ,
+            [partial(_fetch_group_count, locus, group) for group in groups],
+        )
+        n_requests += len(groups)
+        next_groups = []
+        for group, group_count in zip(groups, results):
+            if isinstance(group_count, Exception):
+                logger.error(
+                    "Error counting Genbank records for taxids"
+                    f" {group}:\n{group_count}")
+                errors += [(taxid, group_count) for taxid in group]
+            elif group_count == 0 or len(group) == 1:
+                for taxid in group:
+                    counts[taxid] = group_count
+                    cache.set(_count_cache_key(locus, taxid), group_count)
+            else:
+                half = len(group) // 2
+                next_groups += [group[:half], group[half:]]
+        groups = next_groups
+
+    logger.info(
+        f"Counted Genbank records for {len(uncached_taxids)} taxids in"
+        f" {n_requests} requests ({n_cached} more taxids were cached).")
+    return counts, errors
+
+
+def _fetch_group_count(locus: Locus, taxids: list[int]) -> int:
+    """Count Genbank records matching any of the given taxids.
+
+    The request is not throttled - see fetch_gb_records_counts.
+    """
+    query = '(' + ' OR '.join(
+        f'txid{taxid}[Organism]'
+        for taxid in taxids
+    ) + ')'
+    if locus:
+        query += f' AND ({locus.genbank_query_str})'
+    logger.debug(f"Submitting Entrez query: <<{query}>>")
+    results = entrez_request(
+        endpoint=Entrez.esearch,
+        term=query,
+        retmax=0,
+    )()
+    return int(results["Count"])
+
+
+def _get_count_cache():
+    return get_cache(
+        CACHES.GENBANK_COUNT,
+        ttl_days=config.GENBANK_COUNT_CACHE_TTL_DAYS,
+    )
+
+
+def _count_cache_key(locus: Locus, taxid: int) -> str:
+    return f"{taxid}|{locus.genbank_query_str if locus else ''}"
+
+
 if __name__ == '__main__':
     from pathlib import Path
     accessions = Path(
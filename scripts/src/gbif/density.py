@@ -0,0 +1,224 @@
+"""Fetch occurrence density from the GBIF maps API.
+
+Rather than paging through occurrence records, the GBIF maps API returns
+occurrence counts that have already been binned by location. At zoom level 0
+in the EPSG:4326 projection the world is covered by two tiles (west and east),
+so two requests are enough for any taxon, regardless of how many occurrences
+it has.
+
+Tiles are returned as Mapbox Vector Tiles (protobuf), where each feature is a
+point (a pixel of the tile) with a 'total' count of occurrences. Only the
+subset of the format needed to read these points is decoded here.
+
+API Docs: https://techdocs.gbif.org/en/openapi/v2/maps
+"""
+
+import logging
+import struct
+from functools import partial
+
+from src.utils import aio
+from src.utils.throttle import ENDPOINTS
+
+logger = logging.getLogger(__name__)
+
+DENSITY_TILE_URL = (
+    "https://api.gbif.org/v2/map/occurrence/density/{z}/{x}/{y}.mvt")
+TILE_SRS = 'EPSG:4326'
+TILE_ZOOM = 0
+TILES = ((0, 0), (1, 0))  # (x, y) of the western and eastern tiles
+TILE_DEGREES = 180
+OCCURRENCE_LAYER = 'occurrence'
+COUNT_PROPERTY = 'total'
+DEFAULT_EXTENT = 4096
+
+# Protobuf wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+# Geometry command IDs
+MOVE_TO = 1
+
+
+def fetch_occurrence_density(
+    taxon_key: str,
+) -> tuple[list[float], list[float], list[int]]:
+    """Fetch binned occurrence counts for the taxon from the GBIF maps API.
+
+    Returns lists of latitudes, longitudes and occurrence counts, with one
+    entry for each bin that has occurrences.
+    """
+    params = {
+        'taxonKey': taxon_key,
+        'srs': TILE_SRS,
+    }
+    responses = aio.gather(
+        ENDPOINTS.GBIF_FAST,
+        [
+            partial(
+                aio.http_get,
+                DENSITY_TILE_URL.format(z=TILE_ZOOM, x=x, y=y),
+                params=params,
+            )
+            for x, y in TILES
+        ],
+    )
+    lats, lons, counts = [], [], []
+    for (x, y), res in zip(TILES, responses):
+        if isinstance(res, Exception):
+            raise res
+        res.raise_for_status()
+        extent, points = decode_density_tile(res.content)
+        for px, py, count in points:
+            if not (0 <= px < extent and 0 <= py < extent):
+                # Points in the tile buffer are counted by the next tile
+                continue
+            lons.append(-180 + (x + (px + 0.5) / extent) * TILE_DEGREES)
+            lats.append(90 - (y + (py + 0.5) / extent) * TILE_DEGREES)
+            counts.append(count)
+    logger.debug(
+        f"Fetched occurrence density for taxon key {taxon_key}:"
+        f" {sum(counts)} occurrences in {len(counts)} bins")
+    return lats, lons, counts
+
+
+def decode_density_tile(data: bytes) -> tuple[int, list[tuple[int, int, int]]]:
+    """Read point features from the occurrence layer of a vector tile.
+
+    Returns the tile extent and a list of (x, y, count) in tile pixels.
+    """
+    for field, _, value in _iter_fields(data):
+        if field == 3:  # Tile.layers
+            extent, points = _decode_layer(value)
+            if extent is not None:
+                return extent, points
+    return DEFAULT_EXTENT, []
+
+
+def _decode_layer(data):
+    name = None
+    extent = DEFAULT_EXTENT
+    keys = []
+    values = []
+    features = []
+    for field, _, value in _iter_fields(data):
+        if field == 1:
+            name = value.decode()
+        elif field == 2:
+            features.append(value)
+        elif field == 3:
+            keys.append(value.decode())
+        elif field == 4:
+            values.append(_decode_value(value))
+        elif field == 5:
+            extent = value
+    if name != OCCURRENCE_LAYER:
+        return None, []
+
+    points = []
+    for feature in features:
+        tags = []
+        geometry = []
+        for field, _, value in _iter_fields(feature):
+            if field == 2:
+                tags = _read_packed_varints(value)
+            elif field == 4:
+                geometry = _read_packed_varints(value)
+        properties = {
+            keys[tags[i]]: values[tags[i + 1]]
+            for i in range(0, len(tags) - 1, 2)
+        }
+        count = int(properties.get(COUNT_PROPERTY, 0))
+        for px, py in _decode_points(geometry):
+            points.append((px, py, count))
+    return extent, points
+
+
+def _decode_points(geometry):
+    """Decode MoveTo commands of a point geometry into pixel coordinates."""
+    points = []
+    x = y = 0
+    i = 0
+    while i < len(geometry):
+        command = geometry[i]
+        command_id = command & 0x7
+        count = command >> 3
+        i += 1
+        if command_id != MOVE_TO:
+            # Not a point geometry
+            return []
+        for _ in range(count):
+            x += _zigzag(geometry[i])
+            y += _zigzag(geometry[i + 1])
+            points.append((x, y))
+            i += 2
+    return points
+
+
+def _decode_value(data):
+    for field, _, value in _iter_fields(data):
+        if field == 1:
+            return value.decode()
+        if field == 2:
+            return struct.unpack('<f', value)[0]
+        if field == 3:
+            return struct.unpack('<d', value)[0]
+        if field in (4, 5):
+            return value
+        if field == 6:
+            return _zigzag(value)
+        if field == 7:
+            return bool(value)
+    return None
+
+
+def _iter_fields(data):
+    """Yield (field number, wire type, value) for each field of a message."""
+    i = 0
+    while i < len(data):
+        key, i = _read_varint(data, i)
+        field = key >> 3
+        wire_type = key & 0x7
+        if wire_type == VARINT:
+            value, i = _read_varint(data, i)
+        elif wire_type == LENGTH_DELIMITED:
+            length, i = _read_varint(data, i)
+            value = data[i:i + length]
+            i += length
+        elif wire_type == FIXED64:
+            value = data[i:i + 8]
+            i += 8
+        elif wire_type == FIXED32:
+            value = data[i:i + 4]
+            i += 4
+        else:
+            raise ValueError(
+                f"Unsupported protobuf wire type {wire_type} in vector tile")
+        yield field, wire_type, value
+
+
+def _read_varint(data, i):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, i
+        shift += 7
+
+
+def _read_packed_varints(data):
+    values = []
+    i = 0
+    while i < len(data):
+        value, i = _read_varint(data, i)
+        values.append(value)
+    return values
+
+
+def _zigzag(n):
+    return (n >> 1) ^ -(n & 1)
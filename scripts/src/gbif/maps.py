@@ -1,15 +1,19 @@
 """Fetch GBIF occurrence data and plot on a world map."""
 
+import functools
 import logging
+import threading
 from pathlib import Path
 
 import fsspec
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 from pygbif import occurrences
 
+from src.gbif.density import fetch_occurrence_density
 from src.utils.config import Config
-from src.utils.throttle import ENDPOINTS, Throttle
+from src.utils.throttle import ENDPOINTS, get_throttle
 
 logging.getLogger('matplotlib').setLevel(logging.WARNING)
 from matplotlib import pyplot as plt  # noqa:E402
@@ -25,9 +29,38 @@ NATURALEARTH_LOWRES_URL = (
 
 def draw_occurrence_map(taxon_key: str, path: Path):
     '''Fetch GBIF API to get species world map by using taxonomy ID.'''
+    lats, lons, counts = fetch_occurrences(taxon_key)
+    render_occurrence_map(lats, lons, path, counts=counts)
+
+
+def fetch_occurrences(
+    taxon_key: str,
+) -> tuple[list[float], list[float], list[int]]:
+    """Fetch occurrence coordinates for the taxon from GBIF API.
+
+    By default, occurrences are binned by the GBIF maps API (see density.py).
+    If config.GBIF_OCCURRENCE_DENSITY_MAPS is disabled, occurrence records are
+    paged instead, up to config.GBIF_MAX_OCCURRENCE_RECORDS.
+
+    Returns lists of latitudes, longitudes and the number of occurrences at
+    each location.
+    """
+    if config.GBIF_OCCURRENCE_DENSITY_MAPS:
+        return fetch_occurrence_density(taxon_key)
+    lats, lons = _fetch_occurrence_records(taxon_key)
+    return lats, lons, [1] * len(lats)
+
+
+def _fetch_occurrence_records(
+    taxon_key: str,
+) -> tuple[list[float], list[float]]:
+    """Page occurrence records for the taxon from GBIF API.
+
+    Returns lists of latitudes and longitudes.
+    """
     all_results = []
     offset = 0
-    throttle = Throttle(ENDPOINTS.GBIF_SLOW)
+    throttle = get_throttle(ENDPOINTS.GBIF_SLOW)
     while True:
         res = throttle.with_retry(
             occurrences.search,
@@ -52,57 +85,115 @@ def draw_occurrence_map(taxon_key: str, path: Path):
     lons = [record['decimalLongitude']
             for record in all_results
             if 'decimalLongitude' in record]
+    return lats, lons
 
-    df = pd.DataFrame({'latitude': lats, 'longitude': lons})
 
-    with fsspec.open(f"simplecache::{NATURALEARTH_LOWRES_URL}") as file:
-        world = gpd.read_file(file)
-
-    fig, ax = plt.subplots(figsize=(16, 12))
-    fig.patch.set_facecolor('#0d1017')
-    ax.set_facecolor('#0d1017')
-    world.plot(ax=ax, color='#32363c')
-    if lats:
-        ax.text(
-            0.95, 0.95,
-            f"n={len(lats)} occurrences",
-            color="white",
-            fontsize=12,
-            ha="right",
-            va="top",
-            transform=ax.transAxes,
-        )
-        hb = ax.hexbin(
-            x=df['longitude'],
-            y=df['latitude'],
-            gridsize=(150, 30),
-            cmap='autumn_r',
-            mincnt=1,
-            alpha=0.8,
-            norm=LogNorm(),
-        )
-        # Add a colorbar to show density scale
-        cb = fig.colorbar(
-            hb,
-            ax=ax,
-            orientation='vertical',
-            shrink=0.7,
-            aspect=60,
-        )
-        cb.set_label("Density of Occurrences")
-    else:
-        ax.text(
-            0.5, 0.15,
-            "No occurrence records returned from GBIF",
-            color="white",
-            fontsize=16,
-            ha="center",
-            va="bottom",
-            transform=ax.transAxes,
-        )
-        hb = None
+def render_occurrence_map(
+    lats: list[float],
+    lons: list[float],
+    path: Path,
+    counts: list[int] = None,
+):
+    """Draw occurrence coordinates on a world map and write to path.
 
-    ax.set_axis_off()
+    If given, counts are the number of occurrences at each location, which
+    are summed in each hexagon. This only uses local data, so it can be run in
+    a separate process.
 
-    plt.savefig(path, bbox_inches='tight', dpi=300)
-    plt.close()
+    The basemap figure is drawn once per process and reused for each map (see
+    _get_basemap). Artists added for this map are removed after it is saved.
+    """
+    if counts is None:
+        counts = [1] * len(lats)
+    df = pd.DataFrame({
+        'latitude': lats,
+        'longitude': lons,
+        'count': counts,
+    })
+
+    basemap = _get_basemap()
+    fig, ax = basemap.fig, basemap.ax
+    with basemap.lock:
+        artists = []
+        try:
+            if lats:
+                artists.append(ax.text(
+                    0.95, 0.95,
+                    f"n={sum(counts)} occurrences",
+                    color="white",
+                    fontsize=12,
+                    ha="right",
+                    va="top",
+                    transform=ax.transAxes,
+                ))
+                hb = ax.hexbin(
+                    x=df['longitude'],
+                    y=df['latitude'],
+                    C=df['count'],
+                    reduce_C_function=np.sum,
+                    gridsize=(150, 30),
+                    cmap='autumn_r',
+                    mincnt=1,
+                    alpha=0.8,
+                    norm=LogNorm(),
+                )
+                artists.append(hb)
+                # Add a colorbar to show density scale
+                cb = fig.colorbar(
+                    hb,
+                    ax=ax,
+                    orientation='vertical',
+                    shrink=0.7,
+                    aspect=60,
+                )
+                artists.append(cb)
+                cb.set_label("Density of Occurrences")
+            else:
+                artists.append(ax.text(
+                    0.5, 0.15,
+                    "No occurrence records returned from GBIF",
+                    color="white",
+                    fontsize=16,
+                    ha="center",
+                    va="bottom",
+                    transform=ax.transAxes,
+                ))
+
+            fig.savefig(path, bbox_inches='tight', dpi=300)
+        finally:
+            for artist in reversed(artists):
+                artist.remove()
+            basemap.reset()
+
+
+class _Basemap:
+    """A world map figure that occurrences are drawn on."""
+
+    def __init__(self, world: gpd.GeoDataFrame):
+        self.fig, self.ax = plt.subplots(figsize=(16, 12))
+        self.fig.patch.set_facecolor('#0d1017')
+        self.ax.set_facecolor('#0d1017')
+        world.plot(ax=self.ax, color='#32363c')
+        self.ax.set_axis_off()
+        self.data_lim = self.ax.dataLim.frozen()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """Restore data limits after artists have been removed, so that the
+        next map is scaled as if drawn on a new figure.
+        """
+        self.ax.dataLim.set(self.data_lim)
+        self.ax.autoscale_view()
+
+
+@functools.cache
+def _get_basemap() -> _Basemap:
+    """Return the basemap figure for this process, drawing it if required."""
+    return _Basemap(_load_world())
+
+
+@functools.cache
+def _load_world() -> gpd.GeoDataFrame:
+    """Read Natural Earth country polygons once per process."""
+    with fsspec.open(f"simplecache::{NATURALEARTH_LOWRES_URL}") as file:
+        return gpd.read_file(file)
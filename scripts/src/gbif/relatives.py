@@ -6,7 +6,9 @@ from functools import cached_property
 import pygbif
 
 from src.utils import config
-from src.utils.throttle import ENDPOINTS, Throttle
+from src.utils.cache import CACHES, get_cache
+from src.utils.memo import MEMOS, get_memo
+from src.utils.throttle import ENDPOINTS, get_throttle
 
 logger = logging.getLogger(__name__)
 config = config.Config()
@@ -94,7 +96,7 @@ class RelatedTaxaGBIF:
         if canonical_taxon := CANONICAL_TAXA.get(taxon.lower()):
             kwargs["q"] = canonical_taxon['canonical_name']
             kwargs['rank'] = canonical_taxon['rank']
-        throttle = Throttle(ENDPOINTS.GBIF_FAST)
+        throttle = get_throttle(ENDPOINTS.GBIF_FAST)
         res = throttle.with_retry(
             pygbif.species.name_suggest,
             kwargs=kwargs,
@@ -124,9 +126,54 @@ class RelatedTaxaGBIF:
             and 'canonicalName' in r
         ]
 
+    def _get_cache(self, name):
+        return get_cache(
+            name,
+            ttl_days=config.GBIF_CACHE_TTL_DAYS,
+            max_size_mb=config.GBIF_CACHE_MAX_SIZE_MB,
+        )
+
+    def _cache_key(self, *args) -> str:
+        """Cache key for results from self.genus_key.
+
+        Accepted statuses are included because they determine which records
+        are returned.
+        """
+        return '|'.join(str(x) for x in (
+            self.genus_key,
+            *args,
+            ','.join(config.GBIF_ACCEPTED_STATUS),
+            int(self.INCLUDE_EXTINCT),
+        ))
+
     @cached_property
     def relatives(self):
-        """Fetch related species with self.genus_key."""
+        """Fetch related species with self.genus_key.
+
+        Results are memoized by genus key for the current run, and cached
+        across queries and runs. Taxa without a genus key are not memoized,
+        as the key would be shared by all of them.
+        """
+        if self.genus_key is None:
+            return self._get_relatives()
+        return get_memo().get(
+            MEMOS.GBIF_RELATIVES,
+            self._cache_key(),
+            self._get_relatives,
+        )
+
+    def _get_relatives(self):
+        if self.genus_key is None:
+            return self._fetch_relatives()
+        cache = self._get_cache(CACHES.GBIF_RELATIVES)
+        cache_key = self._cache_key()
+        records = cache.get(cache_key)
+        if records is None:
+            records = self._fetch_relatives()
+            cache.set(cache_key, records)
+        return records
+
+    def _fetch_relatives(self):
         i = 0
         end_of_records = False
         records = []
@@ -139,7 +186,7 @@ class RelatedTaxaGBIF:
         previous_first_name = None
         while not end_of_records:
             kwargs['offset'] = i * config.GBIF_LIMIT_RECORDS
-            throttle = Throttle(ENDPOINTS.GBIF_SLOW)
+            throttle = get_throttle(ENDPOINTS.GBIF_SLOW)
             res = throttle.with_retry(
                 pygbif.species.name_lookup,
                 kwargs=kwargs,
@@ -163,6 +210,43 @@ class RelatedTaxaGBIF:
         return records
 
     def for_country(self, country_code):
+        """Return related species that have occurrences in the given country.
+
+        Results are memoized by (genus key, country) for the current run, and
+        species keys are cached across queries and runs, unless the taxon has
+        no genus key.
+        """
+        if self.genus_key is None:
+            return self._get_country_relatives(country_code)
+        return get_memo().get(
+            MEMOS.GBIF_COUNTRY_RELATIVES,
+            self._cache_key(country_code),
+            self._get_country_relatives,
+            country_code,
+        )
+
+    def _get_country_relatives(self, country_code):
+        if self.genus_key is None:
+            species_keys = self._fetch_species_keys_for_country(country_code)
+        else:
+            cache = self._get_cache(CACHES.GBIF_COUNTRY_SPECIES)
+            cache_key = self._cache_key(country_code)
+            species_keys = cache.get(cache_key)
+            if species_keys is None:
+                species_keys = self._fetch_species_keys_for_country(
+                    country_code)
+                cache.set(cache_key, species_keys)
+
+        species_keys = set(species_keys)
+        return [
+            r for r in self.relatives
+            if r['speciesKey'] in species_keys
+        ]
+
+    def _fetch_species_keys_for_country(self, country_code) -> list[int]:
+        """Fetch keys of species in self.genus_key with occurrence records in
+        the given country.
+        """
         i = 0
         end_of_records = False
         records = []
@@ -175,7 +259,7 @@ class RelatedTaxaGBIF:
                 'offset': i * config.GBIF_LIMIT_RECORDS,
                 'limit': 1,  # don't need every occurence for each species
             }
-            throttle = Throttle(ENDPOINTS.GBIF_FAST)
+            throttle = get_throttle(ENDPOINTS.GBIF_FAST)
             res = throttle.with_retry(
                 pygbif.occurrences.search,
                 kwargs=kwargs,
@@ -203,7 +287,4 @@ class RelatedTaxaGBIF:
             if species_key:
                 species_keys.append(int(species_key))
 
-        return [
-            r for r in self.relatives
-            if r['speciesKey'] in species_keys
-        ]
+        return species_keys
@@ -2,7 +2,7 @@
 
 import pygbif
 
-from src.utils.throttle import ENDPOINTS, Throttle
+from src.utils.throttle import ENDPOINTS, get_throttle
 
 
 def fetch_kingdom(phylum: str) -> str:
@@ -12,7 +12,7 @@ def fetch_kingdom(phylum: str) -> str:
         'rank': 'phylum',
         'limit': 1,
     }
-    throttle = Throttle(ENDPOINTS.GBIF_FAST)
+    throttle = get_throttle(ENDPOINTS.GBIF_FAST)
     res = throttle.with_retry(
         pygbif.species.name_suggest,
         kwargs=kwargs,
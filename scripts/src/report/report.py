@@ -97,7 +97,8 @@ def _get_img_src(path):
 def _get_report_context(query_ix, bold, params_json, versions_yml):
     """Build the context for the report template."""
     query_fasta_str = config.read_query_fasta(query_ix).format('fasta')
-    hits = config.read_hits_json(query_ix)['hits']
+    hits_json = config.read_hits_json(query_ix)
+    hits = hits_json['hits']
     html_title = (
         'BOLD - ' + config.REPORT.TITLE
         if bold
@@ -120,6 +121,7 @@ def _get_report_context(query_ix, bold, params_json, versions_yml):
         'input_fasta': query_fasta_str,
         'conclusions': _draw_conclusions(query_ix),
         'hits': hits,
+        'hits_query_seq': hits_json.get('query_seq'),
         'candidates': _get_candidates(query_ix),
         'hits_taxonomy': (
             _load_taxonomies_bold(hits) if bold else _load_taxonomies(hits)
@@ -325,7 +327,8 @@ def _get_candidates(query_ix):
 
 
 def _load_taxonomies(hits):
-    run_taxonomies = config.read_taxonomy_file()
+    run_taxonomies = config.read_taxonomy_file(
+        [hit['accession'] for hit in hits])
     return {
         hit['accession']: run_taxonomies.get(hit['accession'])
         for hit in hits
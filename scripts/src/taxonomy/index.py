@@ -0,0 +1,307 @@
+"""In-process lookups against the NCBI taxdump.
+
+The taxdump files (nodes.dmp, names.dmp, merged.dmp and delnodes.dmp in
+TAXONKIT_DATA) are compiled once into a compact binary index in the cache
+dir, which is then memory-mapped by each process. This means that lineage and
+name lookups do not need to re-read the taxdump, which takes several seconds
+each time (e.g. for each taxonkit command).
+
+The index is a set of arrays indexed by taxid, plus a hash table for names:
+
+- status: the taxonkit status code for each taxid - the taxid itself if
+  valid, the new taxid if merged, -1 if deleted and 0 if not found.
+- parents: the parent taxid of each node.
+- ranks: a code for the rank of each node (rank names are listed in meta.json).
+- name_starts/name_ends: position of each node's scientific name in
+  names.bin.
+- name_hashes/name_taxids: sorted 64-bit hashes of all names (lowercase),
+  with the taxid that each name belongs to. Taxids for the same name are
+  kept in taxdump order.
+
+An index is built for each distinct set of taxdump files (by path, size and
+mtime), so updating the taxdump builds a new index on next use. The index is
+shared by all callers in a process, and lookups are batched and memoized for
+the most recently used taxids and names, as the same species are often looked
+up many times in a run.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+
+import numpy as np
+from filelock import FileLock
+
+from src.utils.config import Config
+from src.utils.memo import LRUMemo
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+INDEX_VERSION = 1
+INDEX_DIRNAME = 'taxonomy_index'
+TAXDUMP_FILES = ('nodes.dmp', 'names.dmp', 'merged.dmp', 'delnodes.dmp')
+ROOT_TAXID = 1
+STATUS_DELETED = -1
+STATUS_NOT_FOUND = 0
+MEMO_SIZE = 100000
+ARRAYS = (
+    'status',
+    'parents',
+    'ranks',
+    'name_starts',
+    'name_ends',
+    'name_hashes',
+    'name_taxids',
+)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_taxonomy_index(data_dir: Path = None) -> 'TaxonomyIndex':
+    """Return the process-wide index for the taxdump in data_dir, building
+    it if required.
+    """
+    data_dir = Path(data_dir or config.TAXONKIT_DATA).resolve()
+    with _indexes_lock:
+        if data_dir not in _indexes:
+            _indexes[data_dir] = TaxonomyIndex(data_dir)
+        return _indexes[data_dir]
+
+
+class TaxonomyIndex:
+    """Lineage and name lookups from a memory-mapped taxdump index."""
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self.path = self._get_index_path()
+        if not (self.path / 'meta.json').exists():
+            self._build()
+        self._load()
+        self._lineage_memo = LRUMemo(MEMO_SIZE)
+        self._name_memo = LRUMemo(MEMO_SIZE)
+
+    def lineages(
+        self,
+        taxids: list[str],
+    ) -> dict[str, tuple[str, tuple[str], tuple[str]]]:
+        """Return the status code, lineage names and lineage ranks of each
+        taxid, as given by 'taxonkit lineage -c -R'.
+
+        The lineage runs from the top of the tree to the taxon (excluding the
+        root node). Lineages are empty for deleted or unknown taxids.
+        """
+        return self._lineage_memo.get_many(taxids, self._lookup_lineages)
+
+    def name2taxids(self, names: list[str]) -> dict[str, tuple[str]]:
+        """Return taxids with each name (of any name class, ignoring case),
+        as given by 'taxonkit name2taxid'.
+        """
+        return self._name_memo.get_many(names, self._lookup_names)
+
+    def _lookup_lineages(self, taxids):
+        return {taxid: self._lineage(taxid) for taxid in taxids}
+
+    def _lineage(self, taxid):
+        status = self._status(taxid)
+        if status <= 0:
+            return str(status), (), ()
+        names = []
+        ranks = []
+        node = status
+        while True:
+            names.append(self._name(node))
+            ranks.append(self.rank_names[self.ranks[node]])
+            parent = int(self.parents[node])
+            if parent == node or parent == ROOT_TAXID:
+                break
+            node = parent
+        return str(status), tuple(names[::-1]), tuple(ranks[::-1])
+
+    def _lookup_names(self, names):
+        """Look up all names with one search of the sorted name hashes."""
+        name_hashes = np.array(
+            [_hash_name(name) for name in names],
+            dtype=np.uint64,
+        )
+        starts = np.searchsorted(self.name_hashes, name_hashes, side='left')
+        ends = np.searchsorted(self.name_hashes, name_hashes, side='right')
+        return {
+            name: tuple(dict.fromkeys(
+                str(taxid) for taxid in self.name_taxids[start:end]))
+            for name, start, end in zip(names, starts, ends)
+        }
+
+    def _status(self, taxid) -> int:
+        try:
+            taxid = int(str(taxid).strip())
+        except ValueError:
+            return STATUS_NOT_FOUND
+        if not 0 < taxid < len(self.status):
+            return STATUS_NOT_FOUND
+        return int(self.status[taxid])
+
+    def _name(self, taxid: int) -> str:
+        start = self.name_starts[taxid]
+        end = self.name_ends[taxid]
+        return self._names[start:end].decode()
+
+    def _get_index_path(self) -> Path:
+        """Return a path that is unique to this version of the taxdump."""
+        fingerprint = [INDEX_VERSION, str(self.data_dir)]
+        for filename in TAXDUMP_FILES:
+            path = self.data_dir / filename
+            if not path.exists():
+                raise FileNotFoundError(
+                    f"NCBI taxdump file {filename} not found in"
+                    f" {self.data_dir}. Please check the TAXONKIT_DATA"
+                    " directory.")
+            stat = path.stat()
+            fingerprint.append((filename, stat.st_size, stat.st_mtime_ns))
+        key = hashlib.sha1(json.dumps(fingerprint).encode()).hexdigest()
+        return config.cache_dir / INDEX_DIRNAME / key[:16]
+
+    def _load(self):
+        for name in ARRAYS:
+            setattr(
+                self,
+                name,
+                np.load(self.path / f'{name}.npy', mmap_mode='r'),
+            )
+        with open(self.path / 'meta.json') as f:
+            self.rank_names = json.load(f)['ranks']
+        with open(self.path / 'names.bin', 'rb') as f:
+            self._names = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.fstat(f.fileno()).st_size
+                else b''
+            )
+
+    def _build(self):
+        """Compile the taxdump into an index, unless another process has
+        already done so.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(f'{self.path}.lock'):
+            if (self.path / 'meta.json').exists():
+                return
+            logger.info(
+                f"Building taxonomy index for {self.data_dir}"
+                f" at {self.path}...")
+            build_dir = Path(tempfile.mkdtemp(
+                dir=self.path.parent,
+                prefix=f'{self.path.name}.tmp',
+            ))
+            try:
+                _write_index(self.data_dir, build_dir)
+                os.replace(build_dir, self.path)
+            except BaseException:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                raise
+            logger.info("Taxonomy index built.")
+
+
+def _write_index(data_dir: Path, out_dir: Path):
+    taxids = array('i')
+    parent_taxids = array('i')
+    rank_ids = array('B')
+    rank_codes = {}
+    for fields in _read_dmp(data_dir / 'nodes.dmp'):
+        rank = fields[2]
+        if rank not in rank_codes:
+            rank_codes[rank] = len(rank_codes)
+        taxids.append(int(fields[0]))
+        parent_taxids.append(int(fields[1]))
+        rank_ids.append(rank_codes[rank])
+    merged = [
+        (int(fields[0]), int(fields[1]))
+        for fields in _read_dmp(data_dir / 'merged.dmp')
+    ]
+    deleted = [
+        int(fields[0])
+        for fields in _read_dmp(data_dir / 'delnodes.dmp')
+    ]
+
+    size = max([
+        max(taxids, default=0),
+        *(old_taxid for old_taxid, _ in merged),
+        *deleted,
+        ROOT_TAXID,
+    ]) + 1
+    taxids = np.frombuffer(taxids, dtype=np.int32)
+    status = np.zeros(size, dtype=np.int32)
+    parents = np.zeros(size, dtype=np.int32)
+    ranks = np.zeros(size, dtype=np.uint8)
+    status[taxids] = taxids
+    parents[taxids] = np.frombuffer(parent_taxids, dtype=np.int32)
+    ranks[taxids] = np.frombuffer(rank_ids, dtype=np.uint8)
+    status[deleted] = STATUS_DELETED
+    for old_taxid, new_taxid in merged:
+        status[old_taxid] = new_taxid
+
+    name_starts = np.zeros(size, dtype=np.int64)
+    name_ends = np.zeros(size, dtype=np.int64)
+    name_hashes = array('Q')
+    name_taxids = array('i')
+    with open(out_dir / 'names.bin', 'wb') as f:
+        offset = 0
+        for fields in _read_dmp(data_dir / 'names.dmp'):
+            taxid = int(fields[0])
+            name = fields[1]
+            if fields[3] == 'scientific name':
+                name_starts[taxid] = offset
+                offset += f.write(name.encode())
+                name_ends[taxid] = offset
+            name_hashes.append(int(_hash_name(name)))
+            name_taxids.append(taxid)
+
+    name_hashes = np.frombuffer(name_hashes, dtype=np.uint64)
+    order = np.argsort(name_hashes, kind='stable')
+    arrays = {
+        'status': status,
+        'parents': parents,
+        'ranks': ranks,
+        'name_starts': name_starts,
+        'name_ends': name_ends,
+        'name_hashes': name_hashes[order],
+        'name_taxids': np.frombuffer(name_taxids, dtype=np.int32)[order],
+    }
+    for name, values in arrays.items():
+        np.save(out_dir / f'{name}.npy', values)
+    with open(out_dir / 'meta.json', 'w') as f:
+        json.dump({
+            'version': INDEX_VERSION,
+            'data_dir': str(data_dir),
+            'ranks': list(rank_codes),
+        }, f)
+
+
+def _read_dmp(path: Path):
+    """Yield the fields of each row of a taxdump .dmp file."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n').rstrip('\t|')
+            if line:
+                yield line.split('\t|\t')
+
+
+def _hash_name(name: str) -> np.uint64:
+    """Hash a taxon name for case-insensitive lookups.
+
+    With 64-bit hashes, a collision between two of the few million names in
+    the taxdump is vanishingly unlikely, so names are not stored for
+    comparison.
+    """
+    digest = hashlib.blake2b(
+        name.strip().lower().encode(),
+        digest_size=8,
+    ).digest()
+    return np.uint64(int.from_bytes(digest, 'little'))
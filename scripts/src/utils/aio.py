@@ -0,0 +1,146 @@
+"""Schedule throttled API requests on a shared event loop.
+
+The API clients used in this package (requests, pygbif and Bio.Entrez) are
+synchronous, so requests are sent from a shared pool of worker threads. All
+requests are scheduled from a single asyncio event loop, which runs in a
+background thread for the life of the process:
+
+- Throttle waits and retry delays are awaited on the event loop, so requests
+  that are waiting for a throttle slot do not hold a worker thread.
+- Requests in flight are bounded per endpoint (the endpoint's
+  'max_concurrency'), no matter how many threads are submitting requests.
+- HTTP requests sent with http_get reuse a keep-alive connection pool for
+  each host.
+
+Requests can be submitted from any thread except the event loop thread.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .throttle import get_throttle
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 32
+DEFAULT_MAX_CONCURRENCY = 5
+HTTP_POOL_SIZE = 16
+
+_state = threading.local()
+_lock = threading.Lock()
+_loop = None
+_executor = None
+_pid = None
+_semaphores = {}
+_sessions = {}
+
+
+def gather(endpoint: dict, calls: list) -> list:
+    """Send requests concurrently and return their results in order.
+
+    Each call is a function without arguments that sends one request to the
+    endpoint (e.g. a functools.partial). As with
+    asyncio.gather(return_exceptions=True), an exception that is raised by a
+    call after all retries is returned in place of its result.
+    """
+    if not calls:
+        return []
+    return run(_gather(endpoint, calls))
+
+
+def run(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    loop = _get_loop()
+    if getattr(_state, 'is_loop_thread', False):
+        raise RuntimeError(
+            "Cannot wait for requests from the event loop thread.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+async def request(endpoint: dict, func, args=[], kwargs={}):
+    """Send a throttled request with retries, bounded by the endpoint's
+    max concurrency.
+    """
+    throttle = get_throttle(endpoint)
+    async with _get_semaphore(endpoint):
+        return await throttle.with_retry_async(
+            func,
+            args=args,
+            kwargs=kwargs,
+            executor=_executor,
+        )
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """Send a GET request through a keep-alive session for the URL's host."""
+    return _get_session(url).get(url, **kwargs)
+
+
+async def _gather(endpoint, calls):
+    return await asyncio.gather(
+        *(request(endpoint, call) for call in calls),
+        return_exceptions=True,
+    )
+
+
+def _get_semaphore(endpoint) -> asyncio.Semaphore:
+    """Return the endpoint's semaphore. Only called on the event loop."""
+    name = endpoint['name']
+    if name not in _semaphores:
+        _semaphores[name] = asyncio.Semaphore(
+            endpoint.get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+    return _semaphores[name]
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting it if required.
+
+    A new loop is started in a forked process, as the parent's loop thread
+    does not exist there.
+    """
+    global _loop, _executor, _pid, _semaphores
+    with _lock:
+        if _loop is None or _pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS,
+                thread_name_prefix='api_request',
+            )
+            _semaphores = {}
+            _pid = os.getpid()
+            threading.Thread(
+                target=_run_loop,
+                args=(_loop,),
+                name='api_event_loop',
+                daemon=True,
+            ).start()
+        return _loop
+
+
+def _run_loop(loop):
+    _state.is_loop_thread = True
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def _get_session(url) -> requests.Session:
+    host = urlparse(url).netloc
+    key = (host, os.getpid())
+    with _lock:
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=HTTP_POOL_SIZE,
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+        return _sessions[key]
@@ -0,0 +1,235 @@
+"""Persistent key-value cache for API results that are shared across queries
+and runs (e.g. GenBank record counts).
+
+Values are stored as JSON in a SQLite3 database in the cache dir, with one
+table per cache name. Entries expire after the cache's TTL, and expired
+entries are deleted as new entries are written. Note that the default cache
+dir is in the temp dir, which is removed by Config.cleanup after
+TEMP_CLEAN_AFTER_DAYS without use, so set CACHE_DIR to keep entries for
+longer than this.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .config import Config
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class CACHES:
+    GENBANK_COUNT = 'genbank_count'
+    GBIF_RELATIVES = 'gbif_relatives'
+    GBIF_COUNTRY_SPECIES = 'gbif_country_species'
+    GENBANK_SOURCES = 'genbank_sources'
+
+
+def get_cache(
+    name: str,
+    ttl_days: float,
+    max_size_mb: float = None,
+) -> 'Cache':
+    """Return the process-wide Cache with this name.
+
+    As with throttles, caches should be fetched from here so that the DB
+    schema is only initialized once per process and each thread can reuse
+    its DB connection.
+    """
+    key = (name, str(config.cache_sqlite_path))
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = Cache(name, ttl_days, max_size_mb=max_size_mb)
+        return _caches[key]
+
+
+class Cache:
+    """A persistent key-value cache with expiry.
+
+    Keys are strings and values must be JSON serializable. A TTL of zero
+    disables the cache, so that all lookups miss and nothing is written.
+    If max_size_mb is given, expired entries and then the least recently used
+    entries are evicted when the total size of cached values exceeds this.
+
+    Expired entries are deleted on the first write by each process, and then
+    every EVICT_INTERVAL_SECONDS.
+
+    Measuring the size of the cache scans the whole table, so this is not
+    done on every write. Instead, each process adds the size of the values
+    that it writes to the size last measured, and only evicts entries when
+    this exceeds max_size_mb or every EVICT_INTERVAL_SECONDS (to account for
+    writes by other processes). Entries are then evicted down to
+    EVICT_TO_FRACTION of the max size, so that eviction isn't repeated on
+    every write once the cache is full.
+    """
+
+    DB_TIMEOUT_SECONDS = 60
+    EVICT_INTERVAL_SECONDS = 60
+    EVICT_TO_FRACTION = 0.9
+
+    def __init__(
+        self,
+        name: str,
+        ttl_days: float,
+        max_size_mb: float = None,
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_days * 86400
+        self.max_size_bytes = (
+            int(max_size_mb * 1024 ** 2) if max_size_mb else None)
+        self.db_path = config.cache_sqlite_path
+        self._select_sql = (
+            f"SELECT value, created FROM {self.name} WHERE key = ?")
+        self._insert_sql = (
+            f"INSERT OR REPLACE INTO {self.name}"
+            " (key, value, created, accessed) VALUES (?, ?, ?, ?)")
+        self._touch_sql = (
+            f"UPDATE {self.name} SET accessed = ? WHERE key = ?")
+        self._delete_expired_sql = (
+            f"DELETE FROM {self.name} WHERE created < ?")
+        self._total_size_sql = (
+            f"SELECT COALESCE(SUM(LENGTH(value)), 0) FROM {self.name}")
+        self._oldest_sql = (
+            f"SELECT key, LENGTH(value) FROM {self.name} ORDER BY accessed")
+        self._delete_sql = f"DELETE FROM {self.name} WHERE key = ?"
+        self._local = threading.local()
+        self._size_lock = threading.Lock()
+        self._size_estimate = None
+        self._last_evicted = 0
+        if self.enabled:
+            self._initialize_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _initialize_db(self):
+        if not self.db_path.exists():
+            logger.info(f"Creating cache SQLite DB file: {self.db_path}")
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(
+            self.db_path,
+            timeout=self.DB_TIMEOUT_SECONDS,
+        ) as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.name} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    created REAL,
+                    accessed REAL
+                )
+            """)
+            for column in ('created', 'accessed'):
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.name}_{column}"
+                    f" ON {self.name} ({column})")
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.commit()
+
+    def _get_connection(self):
+        """Return a long-lived DB connection for the current thread."""
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.conn = sqlite3.connect(
+                self.db_path,
+                isolation_level=None,
+                timeout=self.DB_TIMEOUT_SECONDS,
+            )
+            self._local.pid = pid
+        return self._local.conn
+
+    def get(self, key: str):
+        """Return the cached value for key, or None if missing or expired."""
+        if not self.enabled:
+            return None
+        conn = self._get_connection()
+        row = conn.execute(self._select_sql, (key,)).fetchone()
+        if not row:
+            return None
+        value, created = row
+        now = time.time()
+        if now - created > self.ttl_seconds:
+            return None
+        logger.debug(f"Cache hit ({self.name}): {key}")
+        if self.max_size_bytes:
+            conn.execute(self._touch_sql, (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value):
+        self.set_many({key: value})
+
+    def set_many(self, items: dict):
+        """Cache each (key, value) in items, in one transaction."""
+        if not self.enabled or not items:
+            return
+        conn = self._get_connection()
+        now = time.time()
+        rows = [
+            (key, json.dumps(value, separators=(',', ':')), now, now)
+            for key, value in items.items()
+        ]
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(self._insert_sql, rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self._written(conn, sum(len(row[1]) for row in rows))
+
+    def _written(self, conn, size: int):
+        """Add the size of written values to the estimated cache size, and
+        evict entries if they may have expired or the cache may be too large.
+        """
+        with self._size_lock:
+            if not self.max_size_bytes:
+                if (
+                    time.monotonic() - self._last_evicted
+                    > self.EVICT_INTERVAL_SECONDS
+                ):
+                    self._delete_expired(conn)
+                    self._last_evicted = time.monotonic()
+                return
+            if self._size_estimate is not None:
+                self._size_estimate += size
+            if (
+                self._size_estimate is None
+                or self._size_estimate > self.max_size_bytes
+                or time.monotonic() - self._last_evicted
+                > self.EVICT_INTERVAL_SECONDS
+            ):
+                self._size_estimate = self._evict(conn)
+                self._last_evicted = time.monotonic()
+
+    def _evict(self, conn) -> int:
+        """Evict expired entries, and then least recently used entries if
+        the cache exceeds max size. Returns the size of the cache.
+        """
+        self._delete_expired(conn)
+        size = conn.execute(self._total_size_sql).fetchone()[0]
+        if size <= self.max_size_bytes:
+            return size
+        excess = size - int(self.max_size_bytes * self.EVICT_TO_FRACTION)
+        evict_keys = []
+        for key, key_size in conn.execute(self._oldest_sql):
+            evict_keys.append((key,))
+            excess -= key_size
+            size -= key_size
+            if excess <= 0:
+                break
+        logger.debug(
+            f"Evicting {len(evict_keys)} entries from cache {self.name}")
+        conn.executemany(self._delete_sql, evict_keys)
+        return size
+
+    def _delete_expired(self, conn):
+        conn.execute(
+            self._delete_expired_sql,
+            (time.time() - self.ttl_seconds,))
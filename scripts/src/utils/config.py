@@ -19,6 +19,7 @@ from Bio import SeqIO
 from . import countries
 from .locus import Locus
 from .log import get_logging_config
+from .taxonomy_store import get_taxonomy_store
 from .utils import path_safe_str
 
 logger = logging.getLogger(__name__)
@@ -106,6 +107,8 @@ class Config:
     GBIF_LIMIT_RECORDS = int(os.getenv("GBIF_LIMIT_RECORDS", 500))
     GBIF_MAX_OCCURRENCE_RECORDS = int(
         os.getenv("GBIF_MAX_OCCURRENCE_RECORDS", 5000))
+    GBIF_OCCURRENCE_DENSITY_MAPS = os.getenv(
+        "GBIF_OCCURRENCE_DENSITY_MAPS") not in ("0", "false")
     GBIF_ACCEPTED_STATUS = os.getenv(
         "GBIF_ACCEPTED_STATUS",
         'accepted,doubtful',
@@ -114,9 +117,21 @@ class Config:
     QUERY_LOG_FILENAME = 'query.log'
     ENTREZ_CACHE_DIRNAME = 'entrez_cache'
     THROTTLE_SQLITE_FILE = 'throttle.sqlite'
+    CACHE_SQLITE_FILE = 'cache.sqlite'
+    TAXONOMY_STORE_DIRNAME = 'taxonomy_store'
+    CACHE_DIR = os.getenv("CACHE_DIR")
+    GENBANK_COUNT_CACHE_TTL_DAYS = float(
+        os.getenv("GENBANK_COUNT_CACHE_TTL_DAYS", 30))
+    GENBANK_SOURCES_CACHE_TTL_DAYS = float(
+        os.getenv("GENBANK_SOURCES_CACHE_TTL_DAYS", 90))
+    GENBANK_SOURCES_CACHE_MAX_SIZE_MB = float(
+        os.getenv("GENBANK_SOURCES_CACHE_MAX_SIZE_MB", 200))
+    GBIF_CACHE_TTL_DAYS = float(os.getenv("GBIF_CACHE_TTL_DAYS", 30))
+    GBIF_CACHE_MAX_SIZE_MB = float(os.getenv("GBIF_CACHE_MAX_SIZE_MB", 200))
     PLACEHOLDER_IMG_PATH = (
         Path(__file__).parents[1] / 'report/static/img/placeholder.png')
     MAX_API_RETRIES = 3
+    THROTTLE_ADAPTIVE = os.getenv("THROTTLE_ADAPTIVE") not in ("0", "false")
     ERRORS_DIR = 'errors'
     TEMP_DIR_NAME = 'biosecurity'
     TEMP_CLEAN_AFTER_DAYS = 7
@@ -326,6 +341,21 @@ class Config:
     def throttle_sqlite_path(self):
         return self.user_tempdir / self.THROTTLE_SQLITE_FILE
 
+    @property
+    def cache_dir(self):
+        """Persistent API cache, shared across queries and runs.
+
+        The default is in the user temp dir, which cleanup() removes after
+        TEMP_CLEAN_AFTER_DAYS without use, regardless of the cache TTLs.
+        """
+        if self.CACHE_DIR:
+            return Path(self.CACHE_DIR)
+        return self.user_tempdir / 'cache'
+
+    @property
+    def cache_sqlite_path(self):
+        return self.cache_dir / self.CACHE_SQLITE_FILE
+
     @property
     def start_time(self) -> datetime:
         path = self.output_dir / self.TIMESTAMP_FILENAME
@@ -482,8 +512,22 @@ class Config:
         path = query_dir / self.HITS_FASTA
         return self.read_fasta(path)
 
-    def read_taxonomy_file(self) -> dict[str, dict[str, str]]:
-        """Read taxonomy from CSV file."""
+    def read_taxonomy_file(
+        self,
+        accessions: list[str] = None,
+    ) -> dict[str, dict[str, str]]:
+        """Read taxonomy from CSV file.
+
+        If accessions are given, only rows for those accessions are read from
+        an indexed copy of the CSV (see taxonomy_store.py), which is kept in
+        the output dir as it is specific to this run.
+        """
+        if accessions is not None:
+            store = get_taxonomy_store(
+                self.taxonomy_path,
+                self.output_dir / self.TAXONOMY_STORE_DIRNAME,
+            )
+            return store.get(accessions)
         taxonomies = {}
         with self.taxonomy_path.open() as f:
             for row in csv.DictReader(f):
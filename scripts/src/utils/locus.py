@@ -34,8 +34,14 @@ class Locus:
         return self.name != 'na'
 
     def __eq__(self, value):
+        if isinstance(value, Locus):
+            return value.name == self.name
         return value.strip().lower() == self.name
 
+    def __hash__(self):
+        """Loci with the same name are the same key (e.g. for memos)."""
+        return hash(self.name)
+
     def __contains__(self, synonym: str) -> bool:
         return synonym.lower().strip() in self.synonyms
 
@@ -0,0 +1,179 @@
+"""In-memory memoization of API results within a single run.
+
+Targets in a run often overlap - e.g. a candidate and the PMI are frequently
+in the same genus - so the same GBIF lookups and record counts would
+otherwise be requested once per target. Unlike the persistent cache (see
+cache.py), results are only held for the current run and are always used,
+even when caching is disabled.
+
+Calls are deduplicated while in flight, so a thread asking for a result that
+another thread is already fetching waits for that result instead of sending
+the same request. Hits are counted per namespace to show how many calls were
+saved.
+"""
+
+import logging
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_memo = None
+_memo_lock = threading.Lock()
+
+
+class MEMOS:
+    GBIF_TAXON = 'gbif_taxon'
+    GBIF_RELATIVES = 'gbif_relatives'
+    GBIF_COUNTRY_RELATIVES = 'gbif_country_relatives'
+    TARGET_COUNT = 'target_count'
+    SPECIES_COUNT = 'species_count'
+    SPECIES_TAXID = 'species_taxid'
+
+
+def get_memo() -> 'Memo':
+    """Return the Memo for the current run."""
+    global _memo
+    with _memo_lock:
+        if _memo is None:
+            _memo = Memo()
+        return _memo
+
+
+def reset_memo() -> 'Memo':
+    """Start a new run with an empty Memo."""
+    global _memo
+    with _memo_lock:
+        _memo = Memo()
+        return _memo
+
+
+class Memo:
+    """Memoize function results by (namespace, key) for the current run.
+
+    Exceptions are raised to all callers waiting on the result, but are not
+    memoized, so that the next call is sent again.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def get(self, namespace: str, key, func, *args, **kwargs):
+        """Return the memoized result for key, or call func to get it."""
+        with self._lock:
+            future = self._results.get((namespace, key))
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._results[(namespace, key)] = future
+                self.misses[namespace] += 1
+            else:
+                self.hits[namespace] += 1
+        if is_owner:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as exc:
+                with self._lock:
+                    del self._results[(namespace, key)]
+                future.set_exception(exc)
+        return future.result()
+
+    def get_many(self, namespace: str, keys: list, func) -> dict:
+        """Return memoized results for keys, calling func(missing_keys) once
+        to get the results of keys that are not memoized.
+
+        func must return a dict of results, where the result of any key that
+        is missing from the dict is None.
+        """
+        futures = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in futures:
+                    continue
+                future = self._results.get((namespace, key))
+                if future is None:
+                    future = Future()
+                    self._results[(namespace, key)] = future
+                    missing.append(key)
+                    self.misses[namespace] += 1
+                else:
+                    self.hits[namespace] += 1
+                futures[key] = future
+        if missing:
+            try:
+                results = func(missing)
+            except Exception as exc:
+                with self._lock:
+                    for key in missing:
+                        del self._results[(namespace, key)]
+                for key in missing:
+                    futures[key].set_exception(exc)
+            else:
+                for key in missing:
+                    futures[key].set_result(results.get(key))
+        return {key: future.result() for key, future in futures.items()}
+
+    def record(self, namespace: str, hits: int = 0, misses: int = 0):
+        """Count hits and misses for results that are memoized elsewhere."""
+        with self._lock:
+            self.hits[namespace] += hits
+            self.misses[namespace] += misses
+
+    def summary(self) -> str:
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        if not namespaces:
+            return "No memoized calls."
+        return "Calls saved by memoization: " + ", ".join(
+            f"{namespace} {self.hits[namespace]}/"
+            f"{self.hits[namespace] + self.misses[namespace]}"
+            for namespace in namespaces
+        )
+
+
+class LRUMemo:
+    """Memoize results of a batch lookup for the most recently used keys.
+
+    Unlike Memo, this is for lookups that are cheap but repeated many times
+    (e.g. taxonomy lookups for the same species names), so entries are held
+    for the life of the process up to maxsize, and misses are looked up
+    together in one call.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: list, func) -> dict:
+        """Return results for keys (in order), calling func(missing_keys) to
+        look up keys that are not memoized. func must return a dict with a
+        result for each key that it is given.
+        """
+        results = {}
+        missing = {}
+        with self._lock:
+            for key in keys:
+                if key in results:
+                    continue
+                if key in self._results:
+                    self._results.move_to_end(key)
+                    results[key] = self._results[key]
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = None
+                    self.misses += 1
+        if missing:
+            found = func(list(missing))
+            results.update(found)
+            with self._lock:
+                self._results.update(found)
+                while len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+        return {key: results[key] for key in keys}
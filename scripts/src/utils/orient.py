@@ -1,46 +1,18 @@
-"""Translate a DNA sequence.
-
-# Search for COX1 domain:
-hmmsearch --tblout out.tbl --noali pf00115.hmm query.fasta
-
-# Fields in out.tbl:
-
-target name                forward_frame_1
-accession                  -
-query name                 COX1
-accession                  PF00115.25
-
---- full sequence: ---
-E-value                    4.8e-59
-score                      188.9
-bias                       21.7
-
---- best 1 domain: ---
-E-value                    5.3e-59
-score                      188.7
-bias                       21.7
-
---- domain number estimation: ---
-exp                        1.0
-reg                        1
-clu                        0
-ov                         0
-env                        1
-dom                        1
-rep                        1
-inc                        1
-description of target      -
+"""Orient query sequences by their COX1 domain.
 
+Each query is translated in all six frames, and the frames are searched for
+the COX1 profile HMMs in ref_data/hmm with hmmsearch (run in-process with
+pyhmmer). A query is oriented by the frame that matches a profile.
 """
 
+import functools
+import itertools
 import logging
-import os
-import subprocess
-import tempfile
 from dataclasses import dataclass
 from pathlib import Path
 
-from Bio import SeqIO
+import numpy as np
+import pyhmmer
 from Bio.Data import CodonTable
 from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
@@ -51,6 +23,15 @@ config = Config()
 logger = logging.getLogger(__name__)
 
 HMM_PROFILE_DIR = Path(__file__).parent / "ref_data/hmm"
+AMINO_ALPHABET = pyhmmer.easel.Alphabet.amino()
+# Queries are translated with the vertebrate mitochondrial code
+MITO_CODON_TABLE = CodonTable.ambiguous_dna_by_id[2]
+NUCLEOTIDES = 'ACGTRYSWKMBDHVN'
+# Codes for NUCLEOTIDES, then one code for any other character
+N_NUCLEOTIDE_CODES = len(NUCLEOTIDES) + 1
+NUCLEOTIDE_CODES = np.full(256, len(NUCLEOTIDES), dtype=np.intp)
+for _code, _nucleotide in enumerate(NUCLEOTIDES):
+    NUCLEOTIDE_CODES[ord(_nucleotide)] = _code
 
 
 @dataclass
@@ -89,8 +70,9 @@ def orientate(queries: list[SeqRecord]) -> list[SeqRecord]:
         seq.id: seq
         for seq in queries
     }
-    for seq in query_index.values():
-        frames = translate(seq.seq)
+    query_frames = translate_all(
+        [seq.seq for seq in query_index.values()])
+    for seq, frames in zip(query_index.values(), query_frames):
         for i, s in enumerate(frames):
             frame = ix_to_frame(i)
             aa_frames.append(
@@ -148,29 +130,68 @@ def orientate(queries: list[SeqRecord]) -> list[SeqRecord]:
     return oriented_seqs
 
 
-def translate(raw_seq: str) -> dict[str, list[str]]:
+def translate(raw_seq: str) -> list[Seq]:
     """Translate a DNA sequence into six forward/reverse frames."""
-    trim_nt = len(raw_seq) % 3
-    trimmed_seq = raw_seq[:-trim_nt] if trim_nt else raw_seq
-    seq = Seq(trimmed_seq.upper().replace("-", "").replace("\n", ""))
-    strands = [
-        seq,
-        seq.reverse_complement(),
-    ]
-    mito_tables = [
-        CodonTable.ambiguous_dna_by_id[2],   # vertebrate mt
-        CodonTable.ambiguous_dna_by_id[5],   # invertebrate mt
-    ]
+    return translate_all([raw_seq])[0]
+
+
+def translate_all(raw_seqs: list[str]) -> list[list[Seq]]:
+    """Translate DNA sequences into six forward/reverse frames.
+
+    All strands of all sequences are translated together: nucleotides are
+    encoded as a single NumPy array, and every codon is translated with one
+    lookup in a table of all codons (see _get_codon_lookup). Sequences with
+    codons that the table can't translate are translated with Biopython
+    instead, which gives the same result (or error).
+    """
+    strands = []
+    for raw_seq in raw_seqs:
+        trim_nt = len(raw_seq) % 3
+        trimmed_seq = raw_seq[:-trim_nt] if trim_nt else raw_seq
+        seq = Seq(trimmed_seq.upper().replace("-", "").replace("\n", ""))
+        strands += [
+            seq,
+            seq.reverse_complement(),
+        ]
+    strand_bytes = [bytes(seq) for seq in strands]
+    offsets = np.cumsum([0] + [len(seq) for seq in strand_bytes])
+    codes = NUCLEOTIDE_CODES[
+        np.frombuffer(b''.join(strand_bytes), dtype=np.uint8)]
+    # Index of the codon that starts at each position. Codons that span two
+    # strands are never used.
+    n = N_NUCLEOTIDE_CODES
+    codon_ix = codes[:-2] * n * n + codes[1:-1] * n + codes[2:]
+    amino_acids = _get_codon_lookup()[codon_ix]
+
     translated = []
-    for seq in strands:
+    for seq, start, end in zip(strands, offsets[:-1], offsets[1:]):
         for frame in range(3):
-            for table in mito_tables:
-                aa = seq[frame:].translate(table, to_stop=False)
-                if aa:
-                    break
-            translated.append(aa)
+            aa = amino_acids[start + frame:max(end - 2, start):3]
+            if aa.all():
+                translated.append(Seq(aa.tobytes().decode()))
+            else:
+                translated.append(seq[frame:].translate(MITO_CODON_TABLE))
+    return [
+        translated[i:i + 6]
+        for i in range(0, len(translated), 6)
+    ]
 
-    return translated
+
+@functools.cache
+def _get_codon_lookup() -> np.ndarray:
+    """Return the amino acid (as a byte) encoded by each codon of nucleotide
+    codes, with zero for codons that can't be translated.
+    """
+    n = N_NUCLEOTIDE_CODES
+    lookup = np.zeros(n ** 3, dtype=np.uint8)
+    for codon in itertools.product(range(len(NUCLEOTIDES)), repeat=3):
+        try:
+            aa = Seq(''.join(NUCLEOTIDES[i] for i in codon)).translate(
+                MITO_CODON_TABLE)
+        except CodonTable.TranslationError:
+            continue
+        lookup[codon[0] * n * n + codon[1] * n + codon[2]] = ord(str(aa))
+    return lookup
 
 
 def search_cox_profile(seqlist: list[SeqRecord]) -> list[SeqRecord]:
@@ -193,7 +214,7 @@ def search_cox_profile(seqlist: list[SeqRecord]) -> list[SeqRecord]:
         for i, seq in enumerate(seqlist)
     ]
 
-    for profile in HMM_PROFILE_DIR.glob("*.hmm"):
+    for profile in sorted(HMM_PROFILE_DIR.glob("*.hmm")):
         filtered_seqids = {
             s.id for s in filtered_seqs
         }
@@ -206,75 +227,51 @@ def search_cox_profile(seqlist: list[SeqRecord]) -> list[SeqRecord]:
     return filtered_seqs
 
 
-def hmmsearch(seqlist: list[SeqRecord], profile: Path) -> list[SeqRecord]:
+def hmmsearch(
+    seqlist: list[SeqRecord],
+    profile: Path,
+) -> list[HMMSearchResult]:
     """Run hmmsearch against the COX1 profile and return matching sequences.
     The profile should be the path to a HMM profile file.
+
+    The search is run in-process with pyhmmer, on sequences held in memory,
+    so no temp files or subprocesses are needed. E-values are the same as
+    those reported by the hmmsearch command for the same sequences.
     """
+    hmm = _read_profile(profile)
+    sequences = pyhmmer.easel.TextSequenceBlock(
+        pyhmmer.easel.TextSequence(
+            name=seq.id,
+            sequence=str(seq.seq),
+        )
+        for seq in seqlist
+    ).digitize(AMINO_ALPHABET)
+    hits = next(iter(pyhmmer.hmmsearch(
+        [hmm],
+        sequences,
+        cpus=1,
+        Z=len(seqlist),
+    )))
     matches = []
-    tmp_name = None
-    tmp_out_name = None
-    try:
-        with (
-            tempfile.NamedTemporaryFile(
-                prefix="hmmsearch_",
-                suffix=".fasta",
-                mode='w',
-                delete=False,
-                delete_on_close=False,
-            ) as tmp,
-            tempfile.NamedTemporaryFile(
-                mode='r',
-                delete=False,
-                prefix="hmmsearch_",
-                suffix=".tbl",
-            ) as tmp_out
-        ):
-            tmp_name = tmp.name
-            SeqIO.write(seqlist, tmp, "fasta")
-            tmp.close()
-            tmp_out_name = tmp_out.name
-            subprocess.run([
-                    "hmmsearch",
-                    "--tblout",
-                    tmp_out.name,
-                    "--noali",
-                    profile,
-                    tmp_name,
-                ],
-                check=True,
-                capture_output=True,
-                text=True,
-            )
-            lines = tmp_out.readlines()
-            for line in lines:
-                if line.startswith("#"):
-                    continue
-                fields = line.split()
-                if not fields:
-                    continue
-                result = HMMSearchResult(
-                    query_id=fields[0],
-                    accession=fields[1],
-                    query_name=fields[2],
-                    query_accession=fields[3],
-                    evalue=float(fields[4]),
-                )
-                if result.evalue < config.HMMSEARCH_MIN_EVALUE:
-                    matches.append(result)
+    for hit in hits:
+        result = HMMSearchResult(
+            query_id=hit.name,
+            accession=hit.accession or '-',
+            query_name=hmm.name,
+            query_accession=hmm.accession,
+            evalue=hit.evalue,
+        )
+        if result.evalue < config.HMMSEARCH_MIN_EVALUE:
+            matches.append(result)
 
-    except subprocess.CalledProcessError as e:
-        logger.error(
-            "HMMSearch: Error running HMMSearch. Please check the input"
-            " sequences and the HMM profile.")
-        logger.error(e.stderr)
-        raise
+    return matches
 
-    finally:
-        for path in (tmp_name, tmp_out_name):
-            if path and os.path.exists(path):
-                os.remove(path)
 
-    return matches
+@functools.cache
+def _read_profile(path: Path) -> pyhmmer.plan7.HMM:
+    """Read a HMM profile once per process."""
+    with pyhmmer.plan7.HMMFile(path) as f:
+        return f.read()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+"""Indexed lookups of hit taxonomy by accession.
+
+The taxonomy CSV written by p2_extract_taxonomy.py has a row for every
+accession in the run, but each query process only needs the rows for its own
+hits. Rather than parsing the whole CSV in every process, the CSV is loaded
+once into a SQLite DB in the run's output dir, keyed by accession, from which
+each process selects only the accessions that it needs.
+
+A store is built for each version of the CSV (by path, size and mtime), and
+for each STORE_VERSION, so that a new taxonomy file is never read from a
+stale store. Stores for other versions are removed when a new store is built.
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+from filelock import FileLock
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+SELECT_BATCH_SIZE = 500
+DB_TIMEOUT_SECONDS = 60
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_taxonomy_store(csv_path: Path, store_dir: Path) -> 'TaxonomyStore':
+    """Return the process-wide store for the taxonomy CSV, building it if
+    required.
+    """
+    csv_path = Path(csv_path).resolve()
+    stat = csv_path.stat()
+    key = (str(csv_path), stat.st_size, stat.st_mtime_ns, str(store_dir))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = TaxonomyStore(csv_path, store_dir)
+        return _stores[key]
+
+
+class TaxonomyStore:
+    """Taxonomy CSV rows, keyed by accession (without version)."""
+
+    def __init__(self, csv_path: Path, store_dir: Path):
+        self.csv_path = Path(csv_path).resolve()
+        self.db_path = Path(store_dir) / f'{self._get_key()}.sqlite'
+        if not self.db_path.exists():
+            self._build()
+        self._local = threading.local()
+
+    def get(self, accessions: list[str]) -> dict[str, dict[str, str]]:
+        """Return the taxonomy row for each accession that has one.
+
+        Rows are identical to those read from the CSV with csv.DictReader.
+        """
+        accessions = list(dict.fromkeys(
+            accession.split('.')[0] for accession in accessions))
+        conn = self._get_connection()
+        taxonomies = {}
+        for i in range(0, len(accessions), SELECT_BATCH_SIZE):
+            batch = accessions[i:i + SELECT_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            for accession, row in conn.execute(
+                "SELECT accession, row FROM taxonomy"
+                f" WHERE accession IN ({placeholders})",
+                batch,
+            ):
+                taxonomies[accession] = json.loads(row)
+        return taxonomies
+
+    def _get_key(self) -> str:
+        stat = self.csv_path.stat()
+        fingerprint = [
+            STORE_VERSION,
+            str(self.csv_path),
+            stat.st_size,
+            stat.st_mtime_ns,
+        ]
+        return hashlib.sha1(json.dumps(fingerprint).encode()).hexdigest()
+
+    def _get_connection(self):
+        """Return a read-only DB connection for the current thread."""
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.conn = sqlite3.connect(
+                f'file:{self.db_path}?mode=ro',
+                uri=True,
+                timeout=DB_TIMEOUT_SECONDS,
+            )
+            self._local.pid = pid
+        return self._local.conn
+
+    def _build(self):
+        """Load the CSV into a new DB, unless another process has already
+        done so.
+        """
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(f'{self.db_path}.lock'):
+            if self.db_path.exists():
+                return
+            logger.info(
+                f"Building taxonomy store for {self.csv_path}"
+                f" at {self.db_path}...")
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.db_path.parent,
+                prefix=f'{self.db_path.name}.tmp',
+            )
+            os.close(fd)
+            try:
+                with (
+                    self.csv_path.open() as f,
+                    sqlite3.connect(tmp_path) as conn,
+                ):
+                    # The DB is only used once complete, so is written
+                    # without a journal
+                    conn.execute("PRAGMA journal_mode=OFF;")
+                    conn.execute("PRAGMA synchronous=OFF;")
+                    conn.execute("""
+                        CREATE TABLE taxonomy (
+                            accession TEXT PRIMARY KEY,
+                            row TEXT
+                        ) WITHOUT ROWID
+                    """)
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO taxonomy (accession, row)"
+                        " VALUES (?, ?)",
+                        (
+                            (
+                                row["accession"].split('.')[0],
+                                json.dumps(row, separators=(',', ':')),
+                            )
+                            for row in csv.DictReader(f)
+                        ),
+                    )
+                conn.close()
+                os.replace(tmp_path, self.db_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._remove_stale_stores()
+
+    def _remove_stale_stores(self):
+        """Remove stores that were built for other versions of the CSV."""
+        for path in self.db_path.parent.glob('*.sqlite'):
+            if path == self.db_path:
+                continue
+            logger.info(f"Removing stale taxonomy store {path}")
+            for stale_path in (path, Path(f'{path}.lock')):
+                try:
+                    stale_path.unlink()
+                except FileNotFoundError:
+                    pass
@@ -1,7 +1,12 @@
+import asyncio
 import logging
+import os
 import random
 import sqlite3
+import threading
 import time
+from email.utils import parsedate_to_datetime
+from functools import partial
 from pprint import pformat
 
 from .config import Config
@@ -10,27 +15,50 @@ from .errors import APIError
 config = Config()
 logger = logging.getLogger(__name__)
 
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+HTTP_TOO_MANY_REQUESTS = 429
+
 
 class ENDPOINTS:
     GBIF_SLOW = {
         'requests_per_second': 1,
+        'max_concurrency': 2,
         'name': 'gbif_slow',
     }
     GBIF_FAST = {
         'requests_per_second': 10,
+        'max_concurrency': 10,
         'name': 'gbif_fast',
     }
     ENTREZ = {
         'requests_per_second': 10,
+        'max_concurrency': 10,
         'name': 'entrez',
     }
     BOLD = {
         'requests_per_second': 5,
         'requests_per_minute': 50,
+        'max_concurrency': 5,
         'name': 'bold',
     }
 
 
+def get_throttle(endpoint: dict) -> 'Throttle':
+    """Return the process-wide Throttle for this endpoint.
+
+    Throttles should be fetched from here rather than constructed per request,
+    so that the DB schema is only initialized once per process and each thread
+    can reuse its DB connection.
+    """
+    key = (endpoint['name'], str(config.throttle_sqlite_path))
+    with _throttles_lock:
+        if key not in _throttles:
+            _throttles[key] = Throttle(endpoint)
+        return _throttles[key]
+
+
 class Throttle:
     """Use SQLite3 database to coordinate throttling of API requests.
 
@@ -44,16 +72,44 @@ class Throttle:
           'requests_per_second': int,  # Max requests per second
           // AND/OR
           'requests_per_minute': int,  # Max requests per minute
+          'max_concurrency': int,      # Max requests in flight (optional,
+                                       # see src.utils.aio)
           'name': str,                 # Name to identify this endpoint
         }
 
-    To be conservative, the throttle will limit per-second requests in 2-second
-    blocks and per-minute requests in 90-second blocks.
+    Each limit acts as a bucket of tokens, where each token is returned to
+    the bucket one block after it was granted. To be conservative, the
+    throttle will limit per-second requests in 2-second blocks and per-minute
+    requests in 12-second blocks.
+
+    Rather than polling until a token becomes available, each request is
+    granted the earliest time slot that satisfies all limits in a single
+    transaction, and then sleeps until that time. Grants are handed out in
+    order of request, across all threads and processes sharing the DB.
+
+    In adaptive mode (config.THROTTLE_ADAPTIVE), a rate limit response (HTTP
+    429) halves the endpoint's request rate (by lengthening its blocks) and
+    pauses all grants until the time given by the Retry-After header. The
+    rate then recovers linearly back to the configured limits. This state is
+    written to the RATES_TABLE, so all processes sharing the DB back off
+    together.
     """
 
     FIELD_NAME = 'timestamp'
+    RATES_TABLE = 'throttle_rates'
     PER_SECOND_BLOCK_MS = 2000
     PER_MINUTE_BLOCK_MS = 12000
+    DB_TIMEOUT_SECONDS = 60
+    # Adaptive mode
+    RATE_DECREASE_FACTOR = 0.5
+    MIN_RATE_FACTOR = 1 / 16
+    RATE_RECOVERY_PER_MINUTE = 0.1
+    DEFAULT_RETRY_AFTER_SECONDS = 60
+    MAX_RETRY_AFTER_SECONDS = 600
+    BACKOFF_BASE_SECONDS = 1
+    BACKOFF_MAX_SECONDS = 60
+    # Legacy mode
+    RATE_LIMIT_SLEEP_SECONDS = 600
 
     def __init__(
         self,
@@ -68,23 +124,44 @@ class Throttle:
             )
         self.per_second_limit = bool(self.rps)
         self.per_minute_limit = bool(self.rpm)
-        self.window_length_ms = (
-            self.PER_MINUTE_BLOCK_MS
-            if self.rpm
-            else self.PER_SECOND_BLOCK_MS
-        )
+        # (max requests, block length) for each limit
+        self.limits = []
+        if self.per_second_limit:
+            self.limits.append((self.rps, self.PER_SECOND_BLOCK_MS))
+        if self.per_minute_limit:
+            self.limits.append((self.rpm, self.PER_MINUTE_BLOCK_MS))
+        self.window_length_ms = max(block for _, block in self.limits)
         self.db_path = config.throttle_sqlite_path
         self.name = endpoint['name']
+        # SQL is built once so that each connection's statement cache is hit
+        self._delete_sql = (
+            f"DELETE FROM {self.name} WHERE {self.FIELD_NAME} < ?")
+        self._nth_latest_sql = (
+            f"SELECT {self.FIELD_NAME} FROM {self.name}"
+            f" ORDER BY {self.FIELD_NAME} DESC LIMIT 1 OFFSET ?")
+        self._insert_sql = (
+            f"INSERT INTO {self.name} ({self.FIELD_NAME}) VALUES (?)")
+        self._select_rate_sql = (
+            f"SELECT rate_factor, decreased_at, blocked_until"
+            f" FROM {self.RATES_TABLE} WHERE name = ?")
+        self._upsert_rate_sql = (
+            f"INSERT OR REPLACE INTO {self.RATES_TABLE}"
+            f" (name, rate_factor, decreased_at, blocked_until)"
+            f" VALUES (?, ?, ?, ?)")
+        self._local = threading.local()
+        # Threads in this process queue here rather than in SQLite's busy
+        # handler, which sleeps with backoff while the DB is locked
+        self._lock = threading.Lock()
         self._initialize_db()
 
     def __enter__(self):
-        self._await_release()
+        self._local.release_at = self._await_release()
 
     def __exit__(self, exc_type, exc_value, traceback):
         pass
 
     def _initialize_db(self):
-        """Create table for tracking request timestamps."""
+        """Create tables for tracking request timestamps and rates."""
         if not self.db_path.exists():
             logger.info(
                 f"Creating throttle SQLite DB file: {self.db_path}"
@@ -96,110 +173,172 @@ class Throttle:
                     {self.FIELD_NAME} INTEGER
                 )
             """)
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS {self.name}_{self.FIELD_NAME}
+                ON {self.name} ({self.FIELD_NAME})
+            """)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.RATES_TABLE} (
+                    name TEXT PRIMARY KEY,
+                    rate_factor REAL,
+                    decreased_at INTEGER,
+                    blocked_until INTEGER
+                )
+            """)
             conn.execute("PRAGMA journal_mode=WAL;")
             conn.commit()
 
-    def _await_release(self):
-        """Query sqlite DB for permission to send a request.
+    def _get_connection(self):
+        """Return a long-lived DB connection for the current thread.
 
-        The DB table keeps track of requests sent across processes by writing
-        a timestamp for each request sent. This is used to determine if we are
-        within the allowed request limits before sendind the next request.
+        Connections are not shared between threads, and are replaced in a
+        forked process.
         """
-        started_waiting = time.time()
-        while True:
-            try:
-                if not self.db_path.exists():
-                    raise FileNotFoundError(
-                        "Throttle SQLite DB file not found:"
-                        f" {self.db_path}"
-                    )
-                with sqlite3.connect(
-                    self.db_path,
-                    isolation_level=None,
-                ) as conn:
-                    try:
-                        # Lock the database for writing
-                        conn.execute("BEGIN IMMEDIATE")
-                        now = int(time.time() * 1000)
-                        if self._within_request_limits(now, conn):
-                            # Insert current timestamp atomically
-                            conn.execute(
-                                f"INSERT INTO {self.name} ({self.FIELD_NAME})"
-                                " VALUES (?)",
-                                (now,)
-                            )
-                            conn.commit()
-                            return
-
-                        # Rollback if the request limit is exceeded
-                        conn.rollback()
-
-                    except sqlite3.OperationalError:
-                        # Handle potential lock contention gracefully
-                        pass
-
-            except sqlite3.OperationalError as e:
-                raise sqlite3.OperationalError(
-                    str(e) + f"\nDB path: {self.db_path}"
-                )
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.conn = sqlite3.connect(
+                self.db_path,
+                isolation_level=None,
+                timeout=self.DB_TIMEOUT_SECONDS,
+            )
+            self._local.pid = pid
+        return self._local.conn
 
-            # Sleep for a random interval to reduce race conditions
-            time.sleep(round(random.uniform(0.1, 2), 3))
-            seconds_waited = int(time.time() - started_waiting)
-            if seconds_waited and seconds_waited % 15 == 0:
-                logger.info(
-                    f"Awaiting throttle release for endpoint {self.name}"
-                    f" for >{seconds_waited} seconds..."
-                )
+    def _await_release(self) -> int:
+        """Reserve the next request slot and sleep until it is released.
+
+        Returns the reserved slot (ms since epoch).
+        """
+        release_at = self._reserve_slot()
+        time.sleep(self._wait_seconds(release_at))
+        return release_at
+
+    def _wait_seconds(self, release_at) -> float:
+        wait_seconds = release_at / 1000 - time.time()
+        if wait_seconds >= 15:
+            logger.info(
+                f"Awaiting throttle release for endpoint {self.name}"
+                f" for {wait_seconds:.0f} seconds..."
+            )
+        return max(0, wait_seconds)
+
+    def _reserve_slot(self, now=None):
+        """Query sqlite DB for the next request slot and reserve it.
 
-    def _within_request_limits(self, now, conn):
-        """Check if the request limits are within the allowed range.
-        This method uses a sliding window of timestamps to determine
-        if the number of requests in the last second or minute exceeds the
-        limits specified for the endpoint.
+        The DB table keeps track of requests granted across processes by
+        writing a timestamp for each request. Timestamps may be in the future
+        for requests that are waiting for their slot. The current time is
+        taken once the DB lock has been acquired, unless given.
         """
-        window_start = now - self.window_length_ms
+        if not self.db_path.exists():
+            raise FileNotFoundError(
+                "Throttle SQLite DB file not found:"
+                f" {self.db_path}"
+            )
+        try:
+            conn = self._get_connection()
+            with self._lock:
+                # Lock the database for writing
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = now or int(time.time() * 1000)
+                    release_at = self._next_slot(now, conn)
+                    conn.execute(self._insert_sql, (release_at,))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            return release_at
+        except sqlite3.OperationalError as e:
+            raise sqlite3.OperationalError(
+                str(e) + f"\nDB path: {self.db_path}"
+            )
+
+    def _next_slot(self, now, conn):
+        """Calculate the earliest time that a request can be sent.
 
+        For each limit, the request must be sent at least one block after the
+        request that used the same token (i.e. the Nth most recent request,
+        where N is the number of requests allowed per block). Blocks are
+        lengthened while the endpoint's rate is reduced, and no slot is
+        granted before a Retry-After pause has passed.
+        """
+        rate_factor, blocked_until = self._current_rate(conn, now)
         # Remove expired timestamps older than window length
         conn.execute(
-            f"DELETE FROM {self.name}"
-            f" WHERE {self.FIELD_NAME} < ?",
-            (window_start,))
+            self._delete_sql,
+            (now - int(self.window_length_ms / rate_factor),))
+        # Slots are granted in order of request
+        slot = max(now, blocked_until, self._nth_latest(conn, 0) or now)
+        for count, block_ms in self.limits:
+            nth_latest = self._nth_latest(conn, count - 1)
+            if nth_latest is not None:
+                slot = max(slot, nth_latest + int(block_ms / rate_factor))
+        return slot
 
-        # Count requests in the window
-        rps_observed = None
-        rpm_observed = None
+    def _nth_latest(self, conn, n):
+        """Return the (n+1)th latest granted timestamp, if any."""
+        row = conn.execute(self._nth_latest_sql, (n,)).fetchone()
+        return row[0] if row else None
 
-        if self.per_second_limit:
-            args = [
-                f"SELECT COUNT(*) FROM {self.name}",
-            ]
-            if self.per_minute_limit:
-                # The window is for rpm, so need to narrow
-                # query to RPS window size
-                args[0] += f" WHERE {self.FIELD_NAME} >= ?"
-                rps_window_start = (
-                    now - self.PER_SECOND_BLOCK_MS
-                )
-                args.append((rps_window_start,))
-            rps_observed = conn.execute(*args).fetchone()[0]
+    def _current_rate(self, conn, now) -> tuple[float, int]:
+        """Return the endpoint's current (rate_factor, blocked_until).
 
-        if self.per_minute_limit:
-            rpm_observed = conn.execute(
-                f"SELECT COUNT(*) FROM {self.name}"
-            ).fetchone()[0]
+        The rate factor recovers linearly from the time of the last decrease,
+        or from the end of the Retry-After pause if that is later.
+        """
+        if not config.THROTTLE_ADAPTIVE:
+            return 1.0, 0
+        row = conn.execute(self._select_rate_sql, (self.name,)).fetchone()
+        if not row:
+            return 1.0, 0
+        rate_factor, decreased_at, blocked_until = row
+        recovering_ms = now - max(decreased_at, blocked_until)
+        if recovering_ms > 0:
+            rate_factor += (
+                self.RATE_RECOVERY_PER_MINUTE * recovering_ms / 60000)
+        return min(rate_factor, 1.0), blocked_until
 
-        within_per_second_limit = (
-            not self.per_second_limit
-            or rps_observed < self.rps
-        )
-        within_per_minute_limit = (
-            not self.per_minute_limit
-            or rpm_observed < self.rpm
-        )
+    def _record_rate_limit(self, sent_at=None, retry_after_seconds=None):
+        """Reduce the endpoint's rate and pause grants after a 429.
 
-        return within_per_second_limit and within_per_minute_limit
+        The rate is only reduced for a request that was sent after the last
+        decrease, so that a burst of 429s from requests already in flight
+        only reduce the rate once.
+        """
+        if retry_after_seconds is None:
+            retry_after_seconds = self.DEFAULT_RETRY_AFTER_SECONDS
+        retry_after_ms = int(
+            min(retry_after_seconds, self.MAX_RETRY_AFTER_SECONDS) * 1000)
+        conn = self._get_connection()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = int(time.time() * 1000)
+                row = conn.execute(
+                    self._select_rate_sql, (self.name,)).fetchone()
+                decreased_at = row[1] if row else 0
+                rate_factor, blocked_until = self._current_rate(conn, now)
+                if sent_at is None or sent_at >= decreased_at:
+                    rate_factor = max(
+                        self.MIN_RATE_FACTOR,
+                        rate_factor * self.RATE_DECREASE_FACTOR,
+                    )
+                    decreased_at = now
+                elif row:
+                    rate_factor = row[0]
+                blocked_until = max(blocked_until, now + retry_after_ms)
+                conn.execute(self._upsert_rate_sql, (
+                    self.name,
+                    rate_factor,
+                    decreased_at,
+                    blocked_until,
+                ))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return rate_factor, blocked_until
 
     def with_retry(self, func, args=[], kwargs={}):
         retries = config.MAX_API_RETRIES
@@ -208,26 +347,172 @@ class Throttle:
                 with self:
                     logger.debug("Throttle released. Sending request to"
                                  f" {self.name}...")
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
             except Exception as exc:
-                sleep_seconds = 1
-                retries -= 1
-                if '429' in str(exc):
-                    sleep_seconds = 600
-                    logger.warning(
-                        "API rate limit exceeded. Waiting 10 minutes before"
-                        " next retry.")
-                    retries = config.MAX_API_RETRIES
-                elif retries <= 0:
-                    raise APIError(
-                        'Failed to fetch data from API after'
-                        f' {config.MAX_API_RETRIES} retries. Please try'
-                        f' resuming this job at a later time.'
-                        f'\nException: {exc}'
-                    )
-                logger.warning(
-                    "Exception encountered in call to endpoint"
-                    f" {self.name} Retrying {retries} more times."
-                    f" Exception: {exc}\n"
-                    f" Args:\n{pformat(args)}")
-                time.sleep(sleep_seconds)
+                retries, delay = self._on_exception(
+                    exc,
+                    retries,
+                    getattr(self._local, 'release_at', None),
+                    args,
+                )
+            else:
+                if not _is_rate_limited_response(result):
+                    return result
+                delay = self._handle_rate_limit(
+                    result, self._local.release_at)
+            time.sleep(delay)
+
+    async def with_retry_async(
+        self,
+        func,
+        args=[],
+        kwargs={},
+        executor=None,
+    ):
+        """Coroutine equivalent of with_retry.
+
+        Throttle waits and retry delays are awaited, so that no thread is
+        held while waiting. The blocking func is run in the given executor.
+        """
+        loop = asyncio.get_running_loop()
+        retries = config.MAX_API_RETRIES
+        while True:
+            release_at = await loop.run_in_executor(
+                executor, self._reserve_slot)
+            await asyncio.sleep(self._wait_seconds(release_at))
+            try:
+                logger.debug("Throttle released. Sending request to"
+                             f" {self.name}...")
+                result = await loop.run_in_executor(
+                    executor, partial(func, *args, **kwargs))
+            except Exception as exc:
+                retries, delay = self._on_exception(
+                    exc, retries, release_at, args)
+            else:
+                if not _is_rate_limited_response(result):
+                    return result
+                delay = self._handle_rate_limit(result, release_at)
+            await asyncio.sleep(delay)
+
+    def _on_exception(self, exc, retries, sent_at, args) -> tuple[int, float]:
+        """Handle an exception raised by a request.
+
+        Returns the number of retries remaining and the delay before the next
+        retry, or raises APIError if there are no retries remaining.
+        """
+        if _is_rate_limit(exc):
+            return (
+                config.MAX_API_RETRIES,
+                self._handle_rate_limit(exc, sent_at),
+            )
+        retries -= 1
+        if retries <= 0:
+            raise APIError(
+                'Failed to fetch data from API after'
+                f' {config.MAX_API_RETRIES} retries. Please try'
+                f' resuming this job at a later time.'
+                f'\nException: {exc}'
+            )
+        logger.warning(
+            "Exception encountered in call to endpoint"
+            f" {self.name} Retrying {retries} more times."
+            f" Exception: {exc}\n"
+            f" Args:\n{pformat(args)}")
+        return retries, self._backoff_seconds(
+            config.MAX_API_RETRIES - retries)
+
+    def _handle_rate_limit(self, exc_or_response, sent_at=None) -> float:
+        """Back off after a rate limit response from the endpoint.
+
+        Returns the delay before the request should be retried. In adaptive
+        mode this is zero, because the throttle will not grant the next slot
+        until the rate limit pause has passed.
+        """
+        if not config.THROTTLE_ADAPTIVE:
+            logger.warning(
+                "API rate limit exceeded. Waiting 10 minutes before"
+                " next retry.")
+            return self.RATE_LIMIT_SLEEP_SECONDS
+        retry_after_seconds = _get_retry_after_seconds(exc_or_response)
+        rate_factor, blocked_until = self._record_rate_limit(
+            sent_at=sent_at,
+            retry_after_seconds=retry_after_seconds,
+        )
+        logger.warning(
+            f"API rate limit exceeded for endpoint {self.name}. Request rate"
+            f" reduced to {rate_factor:.0%} and paused for"
+            f" {max(0, blocked_until / 1000 - time.time()):.0f} seconds"
+            + (
+                " (Retry-After)."
+                if retry_after_seconds is not None
+                else "."
+            )
+        )
+        return 0
+
+    def _backoff_seconds(self, failures: int) -> float:
+        """Return a jittered, exponentially increasing retry delay.
+
+        Half of the delay is random, so that requests that failed together
+        are not retried together.
+        """
+        if not config.THROTTLE_ADAPTIVE:
+            return self.BACKOFF_BASE_SECONDS
+        delay = min(
+            self.BACKOFF_MAX_SECONDS,
+            self.BACKOFF_BASE_SECONDS * 2 ** (failures - 1),
+        )
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _get_status_code(exc_or_response) -> int | None:
+    """Return the HTTP status of a response or HTTP exception, if any.
+
+    Handles requests' Response and HTTPError (as raised by pygbif) and
+    urllib's HTTPError (as raised by Bio.Entrez).
+    """
+    response = getattr(exc_or_response, 'response', None)
+    status_code = getattr(response, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(exc_or_response, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(exc_or_response, 'code', None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def _is_rate_limited_response(result) -> bool:
+    """Return True if a response object was returned with status 429."""
+    return (
+        config.THROTTLE_ADAPTIVE
+        and _get_status_code(result) == HTTP_TOO_MANY_REQUESTS
+    )
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    status_code = _get_status_code(exc)
+    if status_code is not None:
+        return status_code == HTTP_TOO_MANY_REQUESTS
+    return str(HTTP_TOO_MANY_REQUESTS) in str(exc)
+
+
+def _get_retry_after_seconds(exc_or_response) -> float | None:
+    """Parse the Retry-After header, which is either a number of seconds or
+    an HTTP date.
+    """
+    response = getattr(exc_or_response, 'response', None)
+    headers = (
+        getattr(response, 'headers', None)
+        or getattr(exc_or_response, 'headers', None)
+    )
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        logger.debug(f"Could not parse Retry-After header: {value}")
+        return None
@@ -5,15 +5,22 @@ from unittest.mock import MagicMock
 
 from scripts.src.blast.parse_xml import (
     calculate_alignment_length,
+    calculate_btop,
     calculate_hit_bitscore,
     calculate_hit_e_value,
     calculate_hit_identity,
     calculate_hit_query_coverage,
-    parse_blast_xml
+    index_blast_xml,
+    iter_blast_xml,
+    parse_blast_xml,
 )
+from scripts.src.blast.hit_stats import calculate_hit_stats
+from scripts.src.blast.parse_tabular import parse_blast_tabular
 
 DATA_DIR = Path(__file__).parent / 'test-data'
 BLAST_XML_PATH = DATA_DIR / "one_output.xml"
+BLAST_TSV_PATH = DATA_DIR / "one_output.tsv"
+BLAST_TSV_NO_HITS_PATH = DATA_DIR / "no_hits_output.tsv"
 EXPECTED_JSON = DATA_DIR / 'one_hit.json'
 EXPECTED_FASTA = DATA_DIR / 'one_hit.fasta'
 
@@ -131,6 +138,48 @@ class TestBlastParser(unittest.TestCase):
                                         for start, end in merged_regions)
         self.assertEqual(result, expected_alignment_length)
 
+    def test_calculate_hit_stats(self):
+        def mock_hsp(bits, identities, align_length, start, end):
+            hsp = MagicMock()
+            hsp.bits = bits
+            hsp.expect = 1e-5
+            hsp.identities = identities
+            hsp.align_length = align_length
+            hsp.query_start = start
+            hsp.query_end = end
+            return hsp
+
+        hits = [MagicMock(), MagicMock()]
+        hits[0].hsps = [mock_hsp(100.1, 99, 101, 1, 101)]
+        hits[1].hsps = [
+            mock_hsp(150.3, 140, 151, 50, 200),
+            mock_hsp(33.7, 30, 31, 250, 220),
+            mock_hsp(21.9, 20, 23, 180, 202),
+        ]
+        query_length = 300
+        effective_search_space = 1e10
+        results = calculate_hit_stats(
+            hits, query_length, effective_search_space)
+
+        for hit, result in zip(hits, results):
+            alignment_length = calculate_alignment_length(hit.hsps)
+            expected = {
+                "bitscore": calculate_hit_bitscore(hit.hsps),
+                "e_value": calculate_hit_e_value(
+                    hit, effective_search_space),
+                "identity": calculate_hit_identity(hit.hsps),
+                "alignment_length": alignment_length,
+                "query_coverage": calculate_hit_query_coverage(
+                    alignment_length, query_length),
+            }
+            self.assertEqual(repr(result), repr(expected))
+        self.assertEqual(results[1]['alignment_length'], 184)
+
+    def test_calculate_btop(self):
+        self.assertEqual(calculate_btop("ACGTACGT", "ACGTACGT"), "8")
+        self.assertEqual(calculate_btop("ACGTACGT", "ACCTACGA"), "2GC4TA")
+        self.assertEqual(calculate_btop("AC-TACGT", "ACGTA-GT"), "2-G2C-2")
+
     def test_parse_blast_xml(self):
         # Parse the BLAST XML file
         results, fasta_results = parse_blast_xml(BLAST_XML_PATH)
@@ -176,4 +225,61 @@ class TestBlastParser(unittest.TestCase):
         self.assertEqual(hsp['subject_end'], expected_hsp['subject_end'])
         self.assertEqual(hsp['alignment_length'],
                          expected_hsp['alignment_length'])
-        self.assertEqual(hsp['alignment'], expected_hsp['alignment'])
+        self.assertEqual(hsp['btop'], expected_hsp['btop'])
+        self.assertEqual(results[0]['query_seq'], expected_json['query_seq'])
+
+    def test_iter_blast_xml(self):
+        results, fasta_results = parse_blast_xml(BLAST_XML_PATH)
+        records = iter_blast_xml(BLAST_XML_PATH)
+        self.assertNotIsInstance(records, list)
+        for i, (query_record, fastas) in enumerate(records):
+            self.assertEqual(query_record, results[i])
+            self.assertEqual(
+                [(f.id, str(f.seq)) for f in fastas],
+                [(f.id, str(f.seq)) for f in fasta_results[i]],
+            )
+        self.assertEqual(i + 1, len(results))
+
+    def test_iter_blast_xml_byte_range(self):
+        results, _ = parse_blast_xml(BLAST_XML_PATH)
+        offsets, end = index_blast_xml(BLAST_XML_PATH)
+        self.assertEqual(len(offsets), len(results))
+        with open(BLAST_XML_PATH, 'rb') as f:
+            f.seek(offsets[0])
+            self.assertTrue(f.read(11) == b'<Iteration>')
+        records = iter_blast_xml(
+            BLAST_XML_PATH,
+            byte_range=(offsets[0], end),
+            first_query_ix=5,
+        )
+        self.assertEqual([r for r, _ in records], results)
+
+    def test_parse_blast_tabular(self):
+        xml_results, xml_fastas = parse_blast_xml(BLAST_XML_PATH)
+        results, fasta_results = parse_blast_tabular(BLAST_TSV_PATH)
+        self.assertEqual(len(results), len(xml_results))
+
+        # Tabular output reports bitscores with reduced precision
+        for query_record in results + xml_results:
+            for hit in query_record['hits']:
+                hit['bitscore'] = round(hit['bitscore'])
+                for hsp in hit['hsps']:
+                    hsp['bitscore'] = round(hsp['bitscore'])
+        self.assertEqual(results, xml_results)
+        self.assertEqual(
+            [(f.id, str(f.seq)) for f in fasta_results[0]],
+            [(f.id, str(f.seq)) for f in xml_fastas[0]],
+        )
+
+    def test_parse_blast_tabular_no_hits(self):
+        results, fasta_results = parse_blast_tabular(BLAST_TSV_NO_HITS_PATH)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['query_length'], 602)
+        query_record = results[1]
+        self.assertEqual(query_record['query_title'],
+                         'NOHIT_1 Unknown query with no hits')
+        self.assertEqual(query_record['hits'], [])
+        # Same type as XML output, so that hits.json has no null length
+        self.assertEqual(query_record['query_length'], 0)
+        self.assertIsInstance(query_record['query_length'], int)
+        self.assertEqual(fasta_results[1], [])
@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.bold.stats import fetch_bold_records_counts
+
+
+def _response(data):
+    res = MagicMock()
+    res.json.return_value = data
+    return res
+
+
+class TestBoldRecordsCounts(unittest.TestCase):
+
+    @patch('src.bold.stats.aio.gather')
+    def test_malformed_response_fails_one_taxon(self, mock_gather):
+        mock_gather.return_value = [
+            _response({
+                'records_with_species_name': 5,
+                'genus': {'drill_down': {'entity': [
+                    {'name': 'Aus', 'records': '12'},
+                ]}},
+            }),
+            _response({'unexpected': 'payload'}),
+            _response({
+                'records_with_species_name': 3,
+                'genus': {'drill_down': {'entity': [
+                    {'name': 'Cus', 'records': 'many'},
+                ]}},
+            }),
+            _response({'records_with_species_name': 0}),
+        ]
+        results, errors = fetch_bold_records_counts(
+            ['Aus', 'Bus', 'Cus', 'Dus'], rank='genus')
+        self.assertEqual(
+            results,
+            {'Aus': 12, 'Bus': None, 'Cus': None, 'Dus': 0},
+        )
+        self.assertEqual([taxon for taxon, _ in errors], ['Bus', 'Cus'])
+        self.assertIsInstance(errors[0][1], KeyError)
+        self.assertIsInstance(errors[1][1], ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch
+
+from src.coverage.fetch import (
+    SpeciesCounts,
+    get_species_taxids,
+    get_target_coverage,
+)
+from src.utils.locus import Locus
+from src.utils.memo import reset_memo
+
+
+class TestSpeciesCounts(unittest.TestCase):
+
+    LOCUS = Locus('COI', {'non_ambiguous_synonyms': ['coi', 'cox1']})
+
+    @patch('src.coverage.fetch._fetch_gb_records_for_species')
+    def test_shared_species_counted_once(self, mock_fetch):
+        mock_fetch.side_effect = lambda species_names, locus: (
+            {
+                species: len(species)
+                for species in species_names
+                if species != 'Bad species'
+            },
+            [
+                (species, ValueError('Bad request'))
+                for species in species_names
+                if species == 'Bad species'
+            ],
+        )
+        counts = SpeciesCounts()
+        counts.add(['Aus bus', 'Aus cus'], self.LOCUS, False)
+        # Loci are keyed by name, not instance
+        counts.add(['Aus cus', 'Bad species'], self.LOCUS.rename('COI'), False)
+        counts.fetch()
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(
+            sorted(mock_fetch.call_args.args[0]),
+            ['Aus bus', 'Aus cus', 'Bad species'],
+        )
+
+        results, errors = counts.get(
+            ['Aus cus', 'Bad species'], self.LOCUS, False)
+        self.assertEqual(results, {'Aus cus': 7})
+        self.assertEqual([species for species, _ in errors], ['Bad species'])
+        # Only species that have not been counted yet are fetched
+        results, _ = counts.get(['Aus bus', 'Aus dus'], self.LOCUS, False)
+        self.assertEqual(mock_fetch.call_count, 2)
+        self.assertEqual(mock_fetch.call_args.args[0], ['Aus dus'])
+        self.assertEqual(results, {'Aus bus': 7, 'Aus dus': 7})
+
+    @patch('src.coverage.fetch._fetch_gb_records_for_species')
+    def test_failed_batch_raises(self, mock_fetch):
+        mock_fetch.side_effect = OSError('taxonkit failed')
+        counts = SpeciesCounts()
+        counts.add(['Aus bus'], self.LOCUS, False)
+        counts.fetch()
+        with self.assertRaises(OSError):
+            counts.get(['Aus bus'], self.LOCUS, False)
+        self.assertEqual(mock_fetch.call_count, 1)
+
+
+class TestSpeciesTaxids(unittest.TestCase):
+
+    def setUp(self):
+        reset_memo()
+
+    @patch('src.coverage.fetch.extract.taxids')
+    def test_taxids_are_memoized(self, mock_taxids):
+        mock_taxids.side_effect = lambda names: {
+            name: None if name == 'Aus dus' else str(len(name))
+            for name in names
+        }
+        self.assertEqual(
+            get_species_taxids(['Aus bus', 'Aus dus']),
+            {'Aus bus': '7', 'Aus dus': None},
+        )
+        self.assertEqual(
+            get_species_taxids(['Aus dus', 'Aus cuss']),
+            {'Aus dus': None, 'Aus cuss': '8'},
+        )
+        self.assertEqual(mock_taxids.call_count, 2)
+        mock_taxids.assert_called_with(['Aus cuss'])
+
+
+class TestTargetCoverage(unittest.TestCase):
+
+    def setUp(self):
+        reset_memo()
+
+    @patch('src.coverage.fetch._fetch_target_count', return_value=3)
+    def test_target_counts_are_memoized(self, mock_fetch):
+        locus = Locus('COI', {'non_ambiguous_synonyms': ['coi']})
+        for _ in range(2):
+            count = get_target_coverage('123', None, locus.rename('COI'),
+                                        False)
+            self.assertEqual(count, 3)
+        mock_fetch.assert_called_once()
@@ -1,10 +1,16 @@
 import json
 import logging
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch
 
+from src.gbif.density import decode_density_tile, fetch_occurrence_density
 from src.gbif.relatives import RelatedTaxaGBIF
+from src.utils.config import Config
+from src.utils.memo import MEMOS, get_memo, reset_memo
 
 TEST_DATA_DIR = Path(__file__).parent / 'test-data'
 GBIF_NAME_LOOKUP_RESPONSE = TEST_DATA_DIR / 'gbif_related_species.json'
@@ -15,6 +21,16 @@ logging.disable(logging.CRITICAL)
 
 class TestFetchRelatedSpecies(unittest.TestCase):
 
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='cache_')
+        patcher = patch.object(Config, 'CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        reset_memo()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
     @patch('pygbif.species.name_lookup')
     def test_it_can_fetch_the_correct_relatives(self, mock_search):
         mock_search.return_value = json.loads(
@@ -41,6 +57,147 @@ class TestFetchRelatedSpecies(unittest.TestCase):
         )
         self.assertEqual(len(species_for_country), 5)
 
+    @patch.object(
+        RelatedTaxaGBIF,
+        '_get_taxon_record',
+        return_value={'key': 1, 'genusKey': 4732783, 'rank': 'SPECIES'},
+    )
+    @patch('pygbif.species.name_lookup')
+    @patch('pygbif.occurrences.search')
+    def test_relatives_are_cached(
+        self,
+        mock_occurence_search,
+        mock_search,
+        mock_record,
+    ):
+        mock_search.return_value = json.loads(
+            GBIF_NAME_LOOKUP_RESPONSE.read_text())
+        mock_occurence_search.return_value = json.loads(
+            GBIF_OCCURRENCE_RESPONSE.read_text())
+        for _ in range(2):
+            reset_memo()
+            taxon = RelatedTaxaGBIF('Cheiloxena aitori')
+            self.assertEqual(len(taxon.relatives), 8)
+            self.assertEqual(len(taxon.for_country('AU')), 5)
+        mock_search.assert_called_once()
+        mock_occurence_search.assert_called_once()
+        self.assertEqual(len(taxon.for_country('NZ')), 5)
+        self.assertEqual(mock_occurence_search.call_count, 2)
+
+    @patch.object(
+        RelatedTaxaGBIF,
+        '_get_taxon_record',
+        return_value={'key': 1, 'genusKey': 4732783, 'rank': 'SPECIES'},
+    )
+    @patch('pygbif.species.name_lookup')
+    @patch('pygbif.occurrences.search')
+    @patch.object(Config, 'GBIF_CACHE_TTL_DAYS', 0)
+    def test_relatives_are_memoized(
+        self,
+        mock_occurence_search,
+        mock_search,
+        mock_record,
+    ):
+        mock_search.return_value = json.loads(
+            GBIF_NAME_LOOKUP_RESPONSE.read_text())
+        mock_occurence_search.return_value = json.loads(
+            GBIF_OCCURRENCE_RESPONSE.read_text())
+        # Congeneric targets share results within a run
+        for taxon in ('Cheiloxena aitori', 'Cheiloxena blackburni'):
+            target = RelatedTaxaGBIF(taxon)
+            self.assertEqual(len(target.relatives), 8)
+            self.assertEqual(len(target.for_country('AU')), 5)
+        mock_search.assert_called_once()
+        mock_occurence_search.assert_called_once()
+        memo = get_memo()
+        self.assertEqual(memo.hits[MEMOS.GBIF_RELATIVES], 1)
+        self.assertEqual(memo.hits[MEMOS.GBIF_COUNTRY_RELATIVES], 1)
+
+    @patch.object(
+        RelatedTaxaGBIF,
+        '_get_taxon_record',
+        return_value={'key': 1, 'rank': 'GENUS'},
+    )
+    @patch('pygbif.species.name_lookup')
+    def test_relatives_without_genus_not_memoized(
+        self,
+        mock_search,
+        mock_record,
+    ):
+        mock_search.return_value = json.loads(
+            GBIF_NAME_LOOKUP_RESPONSE.read_text())
+        # Targets without a genus key must not share results
+        for taxon in ('Aus', 'Bus'):
+            self.assertEqual(len(RelatedTaxaGBIF(taxon).relatives), 8)
+        self.assertEqual(mock_search.call_count, 2)
+        self.assertEqual(get_memo().hits[MEMOS.GBIF_RELATIVES], 0)
+
+
+def _varint(n):
+    out = b''
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out += bytes([byte | 0x80])
+        else:
+            return out + bytes([byte])
+
+
+def _field(number, value):
+    if isinstance(value, int):
+        return _varint(number << 3) + _varint(value)
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _density_tile(points, extent=512):
+    """Encode (x, y, total) points as a minimal Mapbox Vector Tile."""
+    def zigzag(n):
+        return (n << 1) ^ (n >> 63)
+
+    layer = _field(1, b'occurrence') + _field(3, b'total')
+    for i, (x, y, total) in enumerate(points):
+        layer += _field(4, _field(4, total))  # Value.int_value
+        geometry = (
+            _varint(1 << 3 | 1) + _varint(zigzag(x)) + _varint(zigzag(y)))
+        layer += _field(2, _field(2, _varint(0) + _varint(i)) + _field(3, 1)
+                        + _field(4, geometry))
+    layer += _field(5, extent) + _field(15, 2)
+    return _field(3, layer)
+
+
+class TestOccurrenceDensity(unittest.TestCase):
+
+    def test_decode_density_tile(self):
+        tile = _density_tile([(0, 0, 3), (511, 256, 1000)])
+        self.assertEqual(
+            decode_density_tile(tile),
+            (512, [(0, 0, 3), (511, 256, 1000)]),
+        )
+        self.assertEqual(decode_density_tile(b''), (4096, []))
+
+    @patch('src.gbif.density.aio.http_get')
+    def test_fetch_occurrence_density(self, mock_get):
+        tiles = {
+            # Western tile, with a point in the buffer that is ignored
+            '0/0/0': _density_tile([(0, 0, 3), (-2, 10, 7)]),
+            '0/1/0': _density_tile([(256, 256, 5)]),
+        }
+        mock_get.side_effect = lambda url, **kwargs: SimpleNamespace(
+            status_code=200,
+            content=tiles[url.split('/density/')[1].split('.')[0]],
+            raise_for_status=lambda: None,
+        )
+        lats, lons, counts = fetch_occurrence_density(1234)
+        self.assertEqual(counts, [3, 5])
+        self.assertAlmostEqual(lats[0], 90 - 0.5 * 180 / 512)
+        self.assertAlmostEqual(lons[0], -180 + 0.5 * 180 / 512)
+        self.assertAlmostEqual(lats[1], 0 - 0.5 * 180 / 512)
+        self.assertAlmostEqual(lons[1], 90 + 0.5 * 180 / 512)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(
+            mock_get.call_args.kwargs['params']['taxonKey'], 1234)
+
 
 if __name__ == '__main__':
     unittest.main()
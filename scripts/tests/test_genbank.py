@@ -1,5 +1,8 @@
+import io
 import json
 import os
+import shutil
+import tempfile
 import threading
 import time
 import unittest
@@ -10,7 +13,9 @@ from unittest.mock import patch
 from src.entrez.genbank import (
     GbRecordSource,
     fetch_gb_records,
+    fetch_gb_records_counts,
     fetch_sources,
+    stream_metadata,
 )
 from src.utils import serialize
 from src.utils.config import Config
@@ -26,6 +31,7 @@ EXPECTED_RECORD_COUNT = 62401
 EXPECT_RECORDS_JSON = DATA_DIR / 'genbank_expect_ids.json'
 EXPECT_SINGLE_SOURCE_JSON = DATA_DIR / 'genbank_single_source.json'
 EXPECT_MULTIPLE_SOURCES_JSON = DATA_DIR / 'genbank_multiple_sources.json'
+EFETCH_XML = DATA_DIR / 'genbank_efetch.xml'
 ACCESSIONS_LIST_FILE = DATA_DIR / 'accessions.txt'
 
 ACCESSION_1 = "NM_001126"
@@ -67,6 +73,81 @@ class TestFetchRecords(unittest.TestCase):
         missing_ids = set(MOCK_ENTREZ_IDS['IdList']) - set(result)
         self.assertEqual(len(missing_ids), 0)
 
+    def test_fetch_gb_records_counts(self):
+        cache_dir = tempfile.mkdtemp(prefix='cache_')
+        self.addCleanup(shutil.rmtree, cache_dir)
+        record_counts = {taxid: 0 for taxid in range(100)}
+        record_counts.update({7: 12, 8: 3, 60: 1})
+        group_queries = []
+
+        def fetch_group_count(locus, taxids):
+            group_queries.append(taxids)
+            if 99 in taxids:
+                raise ValueError('Bad request')
+            return sum(record_counts[taxid] for taxid in taxids)
+
+        with (
+            patch.object(Config, 'CACHE_DIR', cache_dir),
+            patch('src.entrez.genbank._fetch_group_count',
+                  side_effect=fetch_group_count),
+        ):
+            counts, errors = fetch_gb_records_counts(
+                self.locus, list(record_counts))
+            n_requests = len(group_queries)
+            self.assertLess(n_requests, len(record_counts) / 3)
+            self.assertEqual(
+                [taxid for taxid, _ in errors],
+                list(range(64, 100)),
+            )
+            self.assertEqual(counts, {
+                taxid: record_counts[taxid]
+                for taxid in range(64)
+            })
+            # Counted taxids are now cached
+            counts, _ = fetch_gb_records_counts(self.locus, list(range(64)))
+            self.assertEqual(len(group_queries), n_requests)
+            self.assertEqual(counts[7], 12)
+
+    @patch("Bio.Entrez._open")
+    def test_fetch_sources_batched(self, mock_open):
+        cache_dir = tempfile.mkdtemp(prefix='cache_')
+        self.addCleanup(shutil.rmtree, cache_dir)
+        mock_open.side_effect = lambda *args, **kwargs: io.BytesIO(
+            EFETCH_XML.read_bytes())
+        accessions = ["XM_006890677", "KR010251"]
+        with patch.object(Config, 'CACHE_DIR', cache_dir):
+            sources = fetch_sources(accessions + accessions[:1])
+            mock_open.assert_called_once()
+            self.assertEqual(set(sources), set(accessions))
+            self.assertTrue(sources["XM_006890677"].is_automated)
+            self.assertFalse(sources["KR010251"].is_automated)
+            self.assertTrue(sources["KR010251"].publications)
+
+            # Sources are now cached
+            cached_sources = fetch_sources(accessions)
+            mock_open.assert_called_once()
+            for accession in accessions:
+                self.assertEqual(
+                    cached_sources[accession].to_json(),
+                    sources[accession].to_json(),
+                )
+            version = sources["KR010251"].accession_version
+            self.assertTrue(version.startswith("KR010251."))
+            self.assertIn(version, fetch_sources([version]))
+            mock_open.assert_called_once()
+
+    @patch("src.entrez.genbank.STREAM_CHUNK_BYTES", 100)
+    def test_stream_metadata(self):
+        handle = io.BytesIO(EFETCH_XML.read_bytes())
+        sources = stream_metadata(handle)
+        self.assertEqual(list(sources), ["XM_006890677", "KR010251"])
+        # Stops reading after the metadata of the expected records
+        handle = io.BytesIO(EFETCH_XML.read_bytes())
+        sources = stream_metadata(handle, n_records=1)
+        self.assertEqual(list(sources), ["XM_006890677"])
+        self.assertLess(handle.tell(), len(EFETCH_XML.read_bytes()) / 2)
+        self.assertTrue(sources["XM_006890677"].is_automated)
+
     def test_fetch_single_source(self):
         result = fetch_sources(SINGLE_ACCESSION)
         expected = EXPECT_SINGLE_SOURCE_JSON.read_text()
@@ -1,12 +1,13 @@
 """Test orientation of query sequences."""
 
-import shutil
 import unittest
 from pathlib import Path
 
 from Bio import SeqIO
+from Bio.Data import CodonTable
+from Bio.Seq import Seq
 
-from scripts.src.utils.orient import orientate
+from scripts.src.utils.orient import orientate, translate_all
 
 TEST_FASTA = Path(__file__).parent / "test-data" / "orient.fasta"
 TEST_FASTA_FWD_INDEXES = (0, 4)
@@ -18,8 +19,6 @@ class TestSequenceOrientation(unittest.TestCase):
 
     def setUp(self):
         """Set up test data."""
-        if not shutil.which("hmmsearch"):
-            self.skipTest("hmmsearch command not found in PATH")
         self.sequences = list(SeqIO.parse(TEST_FASTA, "fasta"))
 
     def test_orientate(self):
@@ -60,3 +59,25 @@ class TestSequenceOrientation(unittest.TestCase):
             self.assertFalse(rev.annotations["oriented"])
             self.assertFalse(fwd.annotations["reverse_complement"])
             self.assertTrue(rev.annotations["reverse_complement"])
+
+    def test_translate_all(self):
+        """Test batch translation against Biopython."""
+        table = CodonTable.ambiguous_dna_by_id[2]
+        raw_seqs = [str(seq.seq) for seq in self.sequences] + [
+            "ATGNNNRYTAA-TGA\nCC",
+            "AC",
+        ]
+        translated = translate_all(raw_seqs)
+        self.assertEqual(len(translated), len(raw_seqs))
+        for raw_seq, frames in zip(raw_seqs, translated):
+            trim_nt = len(raw_seq) % 3
+            trimmed_seq = raw_seq[:-trim_nt] if trim_nt else raw_seq
+            seq = Seq(
+                trimmed_seq.upper().replace("-", "").replace("\n", ""))
+            expected = [
+                strand[frame:].translate(table)
+                for strand in (seq, seq.reverse_complement())
+                for frame in range(3)
+            ]
+            self.assertEqual([str(f) for f in frames],
+                             [str(f) for f in expected])
@@ -1,10 +1,12 @@
+import tempfile
 import unittest
 from pathlib import Path
-from unittest.mock import call, mock_open, patch, MagicMock
+from unittest.mock import call, mock_open, patch
 import p2_extract_taxonomy
-from src.taxonomy import extract
+from src.taxonomy import extract, index
+from src.utils.config import Config
 
-TAXONKIT_STDOUT = Path(__file__).parent / "test-data/taxonkit.stdout"
+TAXDUMP_DIR = Path(__file__).parent / "test-data/taxdump"
 ACCESSION_TAXIDS = {
     'ACC1': '1529436',
     'ACC2': '2711157',
@@ -65,30 +67,85 @@ EXPECTED_WRITE_CALLS = [
 ]
 
 
-def mock_subprocess_run(args, **kwargs):
-    if args[0] == "taxonkit":
-        retval = MagicMock()
-        retval.stdout = TAXONKIT_STDOUT.read_text()
-        retval.returncode = 0
-        return retval
-    raise NotImplementedError(
-        f"Command not implemented for mock: {args[0]}")
+class TaxdumpTestCase(unittest.TestCase):
+    """Read taxonomy from the test taxdump, with the index in a temp dir."""
 
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        for name, value in (
+            ('TAXONKIT_DATA', TAXDUMP_DIR),
+            ('CACHE_DIR', self.cache_dir.name),
+        ):
+            patcher = patch.object(Config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.dict(index._indexes, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
-class TestNcbiTaxonomy(unittest.TestCase):
-    @patch('subprocess.run')
-    def test_it_can_extract_taxonomic_data_for_accessions(self, mock_run):
-        mock_run.side_effect = mock_subprocess_run
+
+class TestNcbiTaxonomy(TaxdumpTestCase):
+    def test_it_can_extract_taxonomic_data_for_accessions(self):
         taxids = sorted(ACCESSION_TAXIDS.values())
         output = extract.taxonomies(taxids)
         self.assertEqual(output, TAXONOMIES_RETURN_VALUE)
 
-    @patch('subprocess.run')
+    def test_it_keys_taxonomies_by_status_code(self):
+        output = extract.taxonomies(['2711158', '2711159', '404'])
+        self.assertEqual(output, {
+            '2711157': TAXONOMIES_RETURN_VALUE['2711157'],
+            '-1': {},
+            '0': {},
+        })
+
+    @patch.object(extract.config, 'get_query_dir')
+    @patch('src.taxonomy.extract.errors.write')
+    def test_it_can_extract_taxids_for_species(self, mock_errors_write, _):
+        output = extract.taxids([
+            'Anneissia japonica',
+            'comanthus japonicus',
+            'Articulata',
+            'Aus bus',
+        ])
+        self.assertEqual(output, {
+            'Anneissia japonica': '1529436',
+            'comanthus japonicus': '1529436',
+            'Articulata': '7602',
+            'Aus bus': None,
+        })
+        mock_errors_write.assert_called_once()
+
+    def test_lookups_are_memoized(self):
+        taxonomy_index = index.get_taxonomy_index(TAXDUMP_DIR)
+        extract.taxids(['Anneissia japonica', 'Anneissia pinguis'])
+        with patch.object(
+            taxonomy_index,
+            '_lookup_names',
+            wraps=taxonomy_index._lookup_names,
+        ) as mock_lookup:
+            output = extract.taxids(
+                ['Anneissia pinguis', 'Anneissia bennetti'])
+        mock_lookup.assert_called_once_with(['Anneissia bennetti'])
+        self.assertEqual(output, {
+            'Anneissia pinguis': '2711157',
+            'Anneissia bennetti': '1529435',
+        })
+
+    def test_index_is_built_once(self):
+        extract.taxonomies(['1529436'])
+        index._indexes.clear()
+        with patch.object(index, '_write_index') as mock_write_index:
+            self.assertEqual(
+                extract.taxonomies(['1529436']),
+                {'1529436': TAXONOMIES_RETURN_VALUE['1529436']},
+            )
+        mock_write_index.assert_not_called()
+
     @patch("p2_extract_taxonomy._parse_args")
     @patch("p2_extract_taxonomy.config")
-    def test_main(self, mock_config, mock_parse_args, mock_run):
+    def test_main(self, mock_config, mock_parse_args):
         """Test main() using mock_open for both read and write operations."""
-        mock_run.side_effect = mock_subprocess_run
 
         # Mock file handling using mock_open
         mock_input_open = mock_open(read_data=INPUT_CSV_DATA)
@@ -106,6 +163,8 @@ class TestNcbiTaxonomy(unittest.TestCase):
         mock_output_dir.open = mock_output_open
         mock_config.output_dir = mock_output_dir
 
+        # Build the index before open() is mocked
+        index.get_taxonomy_index(TAXDUMP_DIR)
         m = mock_open(read_data=INPUT_CSV_DATA)
         with patch("builtins.open", m):
             p2_extract_taxonomy.main()
@@ -1,10 +1,24 @@
 import json
+import os
 import shutil
+import sqlite3
 import tempfile
+import threading
+import time
 import unittest
+from email.utils import formatdate
 from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
+from src.utils import aio
+from src.utils.cache import Cache
+from src.utils.config import Config
 from src.utils.flags import FLAGS, Flag
+from src.utils.memo import LRUMemo, Memo
+from src.utils.throttle import Throttle, _get_retry_after_seconds
+
+TEST_DATA_DIR = Path(__file__).parent / 'test-data'
 
 
 class TestUtils(unittest.TestCase):
@@ -115,3 +129,341 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(data[0]['value'], FLAGS.C)
         self.assertIsNone(data[0]['target'])
         self.assertIsNone(data[0]['target_type'])
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='cache_')
+        patcher = patch.object(Config, 'CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_cache(self):
+        cache = Cache('test_cache', ttl_days=1)
+        self.assertTrue(str(cache.db_path).startswith(self.cache_dir))
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', 0)
+        self.assertEqual(cache.get('key'), 0)
+        cache.set('key', {'count': 5})
+        self.assertEqual(cache.get('key'), {'count': 5})
+        # Persisted for other instances
+        self.assertEqual(Cache('test_cache', ttl_days=1).get('key'),
+                         {'count': 5})
+
+    def test_cache_set_many(self):
+        cache = Cache('test_cache', ttl_days=1, max_size_mb=1)
+        with patch.object(cache, '_evict', wraps=cache._evict) as mock_evict:
+            cache.set_many({'key1': 1, 'key2': [2]})
+        self.assertEqual(cache.get('key1'), 1)
+        self.assertEqual(cache.get('key2'), [2])
+        mock_evict.assert_called_once()
+
+    def test_cache_expiry(self):
+        cache = Cache('test_cache', ttl_days=1)
+        cache.set('key', 5)
+        with patch('time.time', return_value=time.time() + 2 * 86400):
+            self.assertIsNone(cache.get('key'))
+
+    def test_cache_expired_deleted_on_write(self):
+        Cache('test_cache', ttl_days=1).set('old', 5)
+        later = time.time() + 2 * 86400
+        with patch('time.time', return_value=later):
+            Cache('test_cache', ttl_days=1).set('new', 6)
+        with sqlite3.connect(Cache('test_cache', ttl_days=1).db_path) as conn:
+            keys = [row[0] for row in conn.execute(
+                "SELECT key FROM test_cache")]
+        self.assertEqual(keys, ['new'])
+
+    def test_cache_eviction(self):
+        cache = Cache('test_cache', ttl_days=1, max_size_mb=0.001)
+        for i in range(3):
+            cache.set(f'key{i}', 'x' * 400)
+        # 1048 bytes allowed - the oldest entry is evicted
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.get('key1'), 'x' * 400)
+        self.assertEqual(cache.get('key2'), 'x' * 400)
+
+    def test_cache_eviction_not_on_every_write(self):
+        cache = Cache('test_cache', ttl_days=1, max_size_mb=1)
+        with patch.object(cache, '_evict', wraps=cache._evict) as mock_evict:
+            for i in range(10):
+                cache.set(f'key{i}', 'x' * 400)
+        # Only the first write measures the cache size
+        mock_evict.assert_called_once()
+
+    def test_cache_disabled(self):
+        cache = Cache('test_cache', ttl_days=0)
+        cache.set('key', 5)
+        self.assertIsNone(cache.get('key'))
+        self.assertFalse(cache.db_path.exists())
+
+
+class TestTaxonomyStore(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='cache_')
+        self.output_dir = Path(tempfile.mkdtemp(prefix='output_'))
+        shutil.copy(TEST_DATA_DIR / 'taxonomy.csv', self.output_dir)
+        for name, value in (
+            ('CACHE_DIR', self.cache_dir),
+            ('output_dir', self.output_dir),
+        ):
+            patcher = patch.object(Config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.output_dir)
+
+    def test_taxonomy_store(self):
+        config = Config()
+        taxonomies = config.read_taxonomy_file()
+        accessions = ['XM_006890677.1', 'KR010251', 'NOT_AN_ACCESSION']
+        self.assertEqual(
+            config.read_taxonomy_file(accessions),
+            {
+                'XM_006890677': taxonomies['XM_006890677'],
+                'KR010251': taxonomies['KR010251'],
+            },
+        )
+        store_dir = self.output_dir / Config.TAXONOMY_STORE_DIRNAME
+        store_paths = list(store_dir.glob('*.sqlite'))
+        self.assertEqual(len(store_paths), 1)
+        self.assertFalse(
+            Path(self.cache_dir, Config.TAXONOMY_STORE_DIRNAME).exists())
+        self.assertEqual(
+            config.read_taxonomy_file(list(taxonomies)),
+            taxonomies,
+        )
+
+        # A new taxonomy file replaces the old store
+        taxonomy_path = self.output_dir / 'taxonomy.csv'
+        with taxonomy_path.open('a') as f:
+            f.write('\n')
+        os.utime(taxonomy_path, ns=(0, 0))
+        self.assertEqual(
+            config.read_taxonomy_file(accessions)['KR010251'],
+            taxonomies['KR010251'],
+        )
+        new_store_paths = list(store_dir.glob('*.sqlite'))
+        self.assertEqual(len(new_store_paths), 1)
+        self.assertNotEqual(new_store_paths, store_paths)
+
+
+class TestThrottle(unittest.TestCase):
+
+    ENDPOINT = {
+        'requests_per_second': 5,
+        'requests_per_minute': 12,
+        'name': 'test_throttle',
+    }
+
+    def setUp(self):
+        self.throttle = Throttle(self.ENDPOINT)
+        self._drop_table()
+        self.throttle._initialize_db()
+
+    def tearDown(self):
+        self._drop_table()
+
+    def _drop_table(self):
+        with sqlite3.connect(self.throttle.db_path) as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {self.ENDPOINT['name']}")
+            conn.execute(
+                f"DELETE FROM {Throttle.RATES_TABLE} WHERE name = ?",
+                (self.ENDPOINT['name'],),
+            )
+
+    def test_reserve_slot(self):
+        now = 1_000_000
+        slots = [self.throttle._reserve_slot(now) for _ in range(20)]
+        self.assertEqual(slots[:5], [now] * 5)
+        self.assertEqual(slots[5:10], [now + 2000] * 5)
+        self.assertEqual(slots[10:12], [now + 4000] * 2)
+        # Per-minute limit (12 per 12 seconds) takes over
+        self.assertEqual(slots[12:17], [now + 12000] * 5)
+        self.assertEqual(slots, sorted(slots))
+
+    def test_reserve_slot_after_block(self):
+        now = 1_000_000
+        for _ in range(5):
+            self.throttle._reserve_slot(now)
+        self.assertEqual(self.throttle._reserve_slot(now + 2500), now + 2500)
+
+    def test_rate_limit_backoff(self):
+        rate_factor, blocked_until = self.throttle._record_rate_limit(
+            retry_after_seconds=5)
+        self.assertEqual(rate_factor, 0.5)
+        # Requests in flight before the decrease do not reduce it again
+        rate_factor, blocked_until = self.throttle._record_rate_limit(
+            sent_at=blocked_until - 6000, retry_after_seconds=5)
+        self.assertEqual(rate_factor, 0.5)
+        now = int(time.time() * 1000)
+        slots = [self.throttle._reserve_slot(now) for _ in range(10)]
+        self.assertEqual(slots[:5], [blocked_until] * 5)
+        # Blocks are doubled at half rate
+        self.assertEqual(slots[5:], [blocked_until + 4000] * 5)
+
+    def test_rate_limit_recovery(self):
+        _, blocked_until = self.throttle._record_rate_limit(
+            retry_after_seconds=0)
+        conn = self.throttle._get_connection()
+        rate_factor, _ = self.throttle._current_rate(conn, blocked_until)
+        self.assertEqual(rate_factor, 0.5)
+        rate_factor, _ = self.throttle._current_rate(
+            conn, blocked_until + 60000)
+        self.assertAlmostEqual(rate_factor, 0.6)
+        rate_factor, _ = self.throttle._current_rate(
+            conn, blocked_until + 3600000)
+        self.assertEqual(rate_factor, 1.0)
+
+    def test_with_retry_rate_limited_response(self):
+        rate_limited = SimpleNamespace(
+            status_code=429, headers={'Retry-After': '0'})
+        ok = SimpleNamespace(status_code=200, headers={})
+        func = MagicMock(side_effect=[rate_limited, ok])
+        self.assertIs(self.throttle.with_retry(func), ok)
+        self.assertEqual(func.call_count, 2)
+        conn = self.throttle._get_connection()
+        rate_factor, _ = self.throttle._current_rate(
+            conn, int(time.time() * 1000))
+        self.assertLess(rate_factor, 1)
+
+    def test_get_retry_after_seconds(self):
+        def http_error(headers):
+            return SimpleNamespace(
+                response=SimpleNamespace(status_code=429, headers=headers))
+
+        self.assertEqual(
+            _get_retry_after_seconds(http_error({'Retry-After': '120'})), 120)
+        self.assertIsNone(_get_retry_after_seconds(http_error({})))
+        date = formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(
+            _get_retry_after_seconds(http_error({'Retry-After': date})),
+            60,
+            delta=2,
+        )
+        # urllib HTTPError (Bio.Entrez) has headers on the exception
+        exc = SimpleNamespace(code=429, headers={'Retry-After': '3'})
+        self.assertEqual(_get_retry_after_seconds(exc), 3)
+
+
+class TestMemo(unittest.TestCase):
+
+    def test_memo(self):
+        memo = Memo()
+        func = MagicMock(side_effect=[ValueError('Bad request'), 1])
+        with self.assertRaises(ValueError):
+            memo.get('test', 'key', func)
+        # Exceptions are not memoized
+        self.assertEqual(memo.get('test', 'key', func), 1)
+        self.assertEqual(memo.get('test', 'key', func), 1)
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(memo.hits['test'], 1)
+        self.assertEqual(memo.misses['test'], 2)
+        self.assertIn('test 1/3', memo.summary())
+
+    def test_memo_in_flight(self):
+        memo = Memo()
+        started = threading.Event()
+        release = threading.Event()
+        func = MagicMock(side_effect=lambda: (
+            started.set(), release.wait(), 'result')[-1])
+        thread = threading.Thread(target=memo.get, args=('test', 1, func))
+        thread.start()
+        started.wait()
+        results = []
+        waiter = threading.Thread(
+            target=lambda: results.append(memo.get('test', 1, func)))
+        waiter.start()
+        release.set()
+        thread.join()
+        waiter.join()
+        self.assertEqual(results, ['result'])
+        func.assert_called_once()
+
+    def test_memo_get_many(self):
+        memo = Memo()
+        func = MagicMock(side_effect=lambda keys: {
+            key: key.upper() for key in keys if key != 'missing'})
+        self.assertEqual(
+            memo.get_many('test', ['a', 'b', 'missing'], func),
+            {'a': 'A', 'b': 'B', 'missing': None},
+        )
+        self.assertEqual(memo.get_many('test', ['b', 'c'], func),
+                         {'b': 'B', 'c': 'C'})
+        func.assert_called_with(['c'])
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(memo.get('test', 'a', func), 'A')
+        self.assertEqual(memo.hits['test'], 2)
+        self.assertEqual(memo.misses['test'], 4)
+
+
+class TestLRUMemo(unittest.TestCase):
+
+    def test_lru_memo(self):
+        memo = LRUMemo(maxsize=2)
+        func = MagicMock(side_effect=lambda keys: {
+            key: key.upper() for key in keys})
+        self.assertEqual(
+            memo.get_many(['a', 'b', 'a'], func),
+            {'a': 'A', 'b': 'B'},
+        )
+        func.assert_called_once_with(['a', 'b'])
+        # Only missing keys are looked up, and results are in key order
+        self.assertEqual(
+            list(memo.get_many(['c', 'b'], func).items()),
+            [('c', 'C'), ('b', 'B')],
+        )
+        func.assert_called_with(['c'])
+        # 'a' was least recently used, so was evicted
+        memo.get_many(['a'], func)
+        func.assert_called_with(['a'])
+        self.assertEqual(memo.hits, 1)
+        self.assertEqual(memo.misses, 4)
+
+
+class TestAio(unittest.TestCase):
+
+    ENDPOINT = {
+        'requests_per_second': 100,
+        'requests_per_minute': 6000,
+        'max_concurrency': 2,
+        'name': 'test_aio',
+    }
+
+    def tearDown(self):
+        with sqlite3.connect(Config().throttle_sqlite_path) as conn:
+            conn.execute(f"DROP TABLE IF EXISTS {self.ENDPOINT['name']}")
+
+    @patch.object(Throttle, '_backoff_seconds', return_value=0)
+    def test_gather(self, _):
+        lock = threading.Lock()
+        in_flight = []
+        max_in_flight = []
+
+        def call(i):
+            with lock:
+                in_flight.append(i)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.02)
+            with lock:
+                in_flight.remove(i)
+            if i == 3:
+                raise ValueError('Bad request')
+            return i * 10
+
+        results = aio.gather(
+            self.ENDPOINT,
+            [lambda i=i: call(i) for i in range(8)],
+        )
+        self.assertEqual(results[:3], [0, 10, 20])
+        self.assertEqual(results[4:], [40, 50, 60, 70])
+        self.assertIsInstance(results[3], Exception)
+        self.assertEqual(max(max_in_flight), 2)
+        self.assertEqual(aio.gather(self.ENDPOINT, []), [])